@@ -0,0 +1,96 @@
+"""
+AirSight EPA AQI - vectorized breakpoint sub-indices from pollutant concentrations
+
+    I = (I_hi - I_lo) / (C_hi - C_lo) * (C - C_lo) + I_lo
+
+Concentrations are truncated to the EPA reporting precision, bracketed with
+np.searchsorted and interpolated for whole arrays at once. The overall AQI is
+the highest sub-index and its pollutant is the dominant one. Sub-indices are
+rounded half up to whole numbers.
+
+Units: PM2.5 / PM10 µg/m³, CO ppm, SO2 / NO2 ppb, O3 ppm (8-hour table).
+"""
+
+import numpy as np
+
+# (C_lo, C_hi, I_lo, I_hi) per category
+EPA_BREAKPOINTS = {
+    "PM2.5": [(0.0, 12.0, 0, 50), (12.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+             (55.5, 150.4, 151, 200), (150.5, 250.4, 201, 300), (250.5, 350.4, 301, 400),
+             (350.5, 500.4, 401, 500)],
+    "PM10": [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+            (255, 354, 151, 200), (355, 424, 201, 300), (425, 504, 301, 400),
+            (505, 604, 401, 500)],
+    "CO": [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+          (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 40.4, 301, 400),
+          (40.5, 50.4, 401, 500)],
+    "SO2": [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+           (186, 304, 151, 200), (305, 604, 201, 300), (605, 804, 301, 400),
+           (805, 1004, 401, 500)],
+    "NO2": [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+           (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 1649, 301, 400),
+           (1650, 2049, 401, 500)],
+    "O3": [(0.000, 0.054, 0, 50), (0.055, 0.070, 51, 100), (0.071, 0.085, 101, 150),
+          (0.086, 0.105, 151, 200), (0.106, 0.200, 201, 300)]
+}
+
+# prepared_aqi_data.csv column -> EPA pollutant
+COLUMN_POLLUTANTS = {
+    'PM2.5 - Local Conditions': 'PM2.5',
+    'PM10 Total 0-10um STP': 'PM10',
+    'Carbon monoxide': 'CO',
+    'Sulfur dioxide': 'SO2',
+    'Nitrogen dioxide (NO2)': 'NO2',
+    'Ozone': 'O3'
+}
+
+# Decimal places concentrations are truncated to before the lookup
+TRUNCATION_DECIMALS = {"PM2.5": 1, "PM10": 0, "CO": 1, "SO2": 0, "NO2": 0, "O3": 3}
+
+# Breakpoint columns as arrays: pollutant -> (c_lo, c_hi, i_lo, i_hi)
+_TABLES = {
+    pollutant: tuple(np.array(column, dtype=np.float64) for column in zip(*rows))
+    for pollutant, rows in EPA_BREAKPOINTS.items()
+}
+
+
+def sub_index(pollutant, concentrations):
+    """🧮 EPA SUB-INDEX FOR AN ARRAY OF ONE POLLUTANT'S CONCENTRATIONS (NaN stays NaN)
+
+    Values above the last breakpoint are capped at the top of the table.
+    """
+    c_lo, c_hi, i_lo, i_hi = _TABLES[pollutant]
+    scale = 10.0 ** TRUNCATION_DECIMALS[pollutant]
+
+    c = np.asarray(concentrations, dtype=np.float64)
+    # Truncate, not round. Rounding the scaled value to 1/1000 of the last digit first keeps values
+    # that are exact in decimal but not in binary (float32 467.9 = 467.89999) on the right digit.
+    c = np.floor(np.round(np.clip(c, 0.0, c_hi[-1]) * scale, 3)) / scale
+
+    bracket = np.clip(np.searchsorted(c_lo, c, side='right') - 1, 0, len(c_lo) - 1)
+    index = (i_hi[bracket] - i_lo[bracket]) / (c_hi[bracket] - c_lo[bracket]) * (c - c_lo[bracket]) + i_lo[bracket]
+    # EPA rounds half up (np.round would take 50.5 to 50); the same 1/1000 rounding keeps an
+    # interpolated 7.500000000000001 or 17.499999999999996 on the .5
+    return np.floor(np.round(index, 3) + 0.5)
+
+
+def compute_aqi(concentrations):
+    """🌡️ OVERALL AQI FROM {pollutant: array} (EPA_BREAKPOINTS or COLUMN_POLLUTANTS keys, equal lengths)
+
+    Returns {'sub_indices': {pollutant: array}, 'aqi': array, 'dominant': array of pollutant names}.
+    Rows where every pollutant is NaN get aqi NaN and dominant None.
+    """
+    concentrations = {COLUMN_POLLUTANTS.get(name, name): values for name, values in concentrations.items()}
+    pollutants = list(concentrations)
+    sub_indices = {pollutant: np.atleast_1d(sub_index(pollutant, concentrations[pollutant])) for pollutant in pollutants}
+
+    stacked = np.vstack([sub_indices[pollutant] for pollutant in pollutants])
+    missing = np.isnan(stacked).all(axis=0)
+    filled = np.where(np.isnan(stacked), -1.0, stacked)
+
+    aqi = filled.max(axis=0)
+    aqi[missing] = np.nan
+    dominant = np.array(pollutants, dtype=object)[filled.argmax(axis=0)]
+    dominant[missing] = None
+
+    return {'sub_indices': sub_indices, 'aqi': aqi, 'dominant': dominant}
@@ -0,0 +1,37 @@
+"""
+AirSight file helpers - content hashes and atomic writes for the on-disk caches
+
+Shared by the history cache (aqi_history_store) and the model split
+(aqi_model_store): both write a data file and a JSON sidecar that describes it,
+and both check the sidecar against the source file's sha256 when its size/mtime
+changed.
+"""
+
+import os
+import hashlib
+import tempfile
+
+
+def file_sha256(path):
+    """Hex sha256 of the file at ``path``, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_atomic(path, write):
+    """Write via a temp file in the same directory and rename over ``path``.
+
+    ``write(f)`` gets the temp file opened in binary mode. Readers see the old
+    file or the complete new one, never a partial write.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,37 @@
+"""
+AirSight fork safety - fresh locks in a forked worker
+
+Under `gunicorn --preload` the master imports the app, loads the models and
+starts background threads before forking the workers. A child inherits every
+lock in whatever state it was in, and the thread that held one doesn't exist
+there, so a lock held at fork time would never be released.
+
+Objects that own locks call ``register(self)``; after a fork, each registered
+object that is still alive gets its ``_reset_locks()`` called in the child.
+"""
+
+import os
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+_OWNERS = weakref.WeakSet()
+
+
+def register(obj):
+    """🍴 Call ``obj._reset_locks()`` in every child forked from this process (obj is held weakly)."""
+    _OWNERS.add(obj)
+    return obj
+
+
+def _reset_locks_after_fork():
+    for owner in list(_OWNERS):
+        try:
+            owner._reset_locks()
+        except Exception as e:
+            logger.warning('⚠️ Could not reset the locks of %r after fork: %s', owner, e)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_locks_after_fork)
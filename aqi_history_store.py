@@ -0,0 +1,320 @@
+"""
+AirSight history store - prepared_aqi_data.csv as dense, date-indexed numpy arrays
+
+The CSV is read once. Every calendar day between the first and last row gets a
+row in ``values`` (NaN where the source has no reading), so a date maps to an
+array index with one subtraction instead of a lookup.
+
+Lag / rolling AQI features for the models are gathered from that series:
+    aqi_lag_k        AQI k days before the target date
+    aqi_ma_3/7       mean of the previous 3 / 7 days
+    aqi_trend_3      aqi_lag_1 - aqi_lag_3
+    aqi_volatility   std (ddof=1) of the previous 7 days
+Gaps inside the data are linearly interpolated. Days after the last row come
+from a recursive AR(1) forecast around the day-of-year climatology; days before
+the first row use the climatology itself.
+
+For the history endpoints, (year, month) maps to a row range so a month is a
+slice (a view, nothing copied), and ``meta`` and the EPA AQI of every day are
+computed once at load.
+
+Parsing the CSV (its 2015/3/26 dates especially) is the slow part of startup, so
+load() keeps a binary copy next to it: ``<name>.npy`` holds the dense table as
+float32 columns (one contiguous row per CSV column) and ``<name>.npy.json``
+records the CSV it came from. The .npy is memory-mapped, so every worker shares
+one page-cache copy. It is rebuilt whenever the CSV's size/mtime change and its
+sha256 no longer matches.
+"""
+
+import os
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+from aqi_epa import COLUMN_POLLUTANTS, compute_aqi
+from aqi_fileutil import file_sha256, write_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prepared_aqi_data.csv')
+
+AQI_COLUMN = 'daily_max_aqi'
+LAG_FEATURE_COLUMNS = (
+    'aqi_lag_1', 'aqi_lag_3', 'aqi_lag_7', 'aqi_ma_3', 'aqi_ma_7', 'aqi_trend_3', 'aqi_volatility'
+)
+
+# Days of history the lag features look back over
+_WINDOW = 7
+# Half-width of the circular moving average used to smooth the day-of-year climatology
+_CLIMATOLOGY_HALF_WINDOW = 15
+
+# Bump when the .npy / sidecar layout changes so old caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+
+class AQIHistoryStore:
+    """📚 DAILY AIR QUALITY HISTORY WITH VECTORISED LAG FEATURES"""
+
+    def __init__(self, start, columns, values):
+        """``values`` is the dense (days x columns) table: row i is ``start`` + i days, NaN = no reading."""
+        self.start = np.datetime64(start, 'D')
+        self.columns = list(columns)
+        self.values = values
+        self.n_days = len(values)
+        self.end = self.start + (self.n_days - 1)
+        self.has_data = ~np.isnan(self.values).all(axis=1)
+
+        aqi = self.values[:, self.columns.index(AQI_COLUMN)].astype(np.float64)
+        observed = np.flatnonzero(~np.isnan(aqi))
+        self._aqi = np.interp(np.arange(self.n_days), observed, aqi[observed])
+
+        self._build_climatology()
+        self._build_month_index()
+        self.meta = self._build_meta()
+
+        # EPA AQI and dominant pollutant of every day, from the measured concentrations
+        self.epa = compute_aqi({
+            column: self.values[:, i] for i, column in enumerate(self.columns) if column in COLUMN_POLLUTANTS
+        })
+
+    @classmethod
+    def from_rows(cls, dates, columns, values):
+        """Build the dense calendar from (possibly gappy, unsorted) dated rows."""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        order = np.argsort(dates)
+        dates, values = dates[order], np.asarray(values, dtype=np.float64)[order]
+
+        start = dates[0]
+        dense = np.full((int((dates[-1] - start).astype(np.int64)) + 1, len(values[0])), np.nan)
+        dense[(dates - start).astype(np.int64)] = values
+        return cls(start, columns, dense)
+
+    @classmethod
+    def from_csv(cls, path=DEFAULT_HISTORY_CSV):
+        """📂 READ prepared_aqi_data.csv (dates like 2015/3/26)"""
+        frame = pd.read_csv(path)
+        dates = pd.to_datetime(frame.pop('date'), format='%Y/%m/%d').to_numpy(dtype='datetime64[D]')
+        return cls.from_rows(dates, frame.columns, frame.to_numpy(dtype=np.float64))
+
+    @classmethod
+    def load(cls, path=None, use_cache=True):
+        """Store for ``path`` (default: AQI_HISTORY_CSV or the bundled CSV), or None if it can't be read.
+        
+        With ``use_cache`` the memory-mapped binary copy is used, (re)building it when stale.
+        """
+        path = path or os.environ.get('AQI_HISTORY_CSV', DEFAULT_HISTORY_CSV)
+        try:
+            store = cls._load_cached(path) if use_cache else cls.from_csv(path)
+        except Exception as e:
+            logger.warning('⚠️ AQI history unavailable (%s): %s', path, e)
+            return None
+        logger.info('📚 AQI history: %s days (%s to %s) from %s', store.n_days, store.start, store.end, path)
+        return store
+
+    # ---- binary cache ------------------------------------------------------
+
+    @staticmethod
+    def cache_paths(csv_path):
+        """(<name>.npy, <name>.npy.json) next to the CSV."""
+        npy_path = os.path.splitext(csv_path)[0] + '.npy'
+        return npy_path, npy_path + '.json'
+
+    @classmethod
+    def _load_cached(cls, csv_path):
+        """Memory-map the binary copy of ``csv_path``, converting the CSV first if the copy is stale."""
+        npy_path, sidecar_path = cls.cache_paths(csv_path)
+        stat = os.stat(csv_path)
+
+        try:
+            with open(sidecar_path, encoding='utf-8') as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            sidecar = None
+
+        fresh = sidecar is not None and sidecar.get('format_version') == CACHE_FORMAT_VERSION
+        if fresh and (sidecar.get('size'), sidecar.get('mtime_ns')) != (stat.st_size, stat.st_mtime_ns):
+            # Touched (e.g. by a checkout) but maybe not changed: the content hash decides
+            fresh = sidecar.get('sha256') == file_sha256(csv_path)
+            if fresh:
+                sidecar.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                write_atomic(sidecar_path, lambda f: f.write(json.dumps(sidecar, indent=2).encode('utf-8')))
+
+        if fresh:
+            try:
+                columnar = np.load(npy_path, mmap_mode='r')
+                return cls(sidecar['start'], sidecar['columns'], columnar.T)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning('⚠️ AQI history cache unreadable, rebuilding: %s', e)
+
+        store = cls.from_csv(csv_path)
+        try:
+            store.write_cache(csv_path)
+        except OSError as e:
+            # Read-only deploy directory: serve from the parsed CSV without a cache
+            logger.warning('⚠️ Could not write AQI history cache for %s: %s', csv_path, e)
+            return store
+        npy_path, _ = cls.cache_paths(csv_path)
+        return cls(store.start, store.columns, np.load(npy_path, mmap_mode='r').T)
+
+    def write_cache(self, csv_path):
+        """💾 CONVERT: write the float32 columnar .npy and its sidecar for ``csv_path`` (atomically)"""
+        npy_path, sidecar_path = self.cache_paths(csv_path)
+        stat = os.stat(csv_path)
+        sidecar = {
+            'format_version': CACHE_FORMAT_VERSION,
+            'source': os.path.basename(csv_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_sha256(csv_path),
+            'start': str(self.start),
+            'columns': self.columns,
+        }
+        columnar = np.ascontiguousarray(np.asarray(self.values, dtype=np.float32).T)
+
+        # Data first, sidecar last: a sidecar on disk always describes a complete .npy
+        write_atomic(npy_path, lambda f: np.save(f, columnar))
+        write_atomic(sidecar_path, lambda f: f.write(json.dumps(sidecar, indent=2).encode('utf-8')))
+        logger.info('💾 Wrote AQI history cache %s (%s columns x %s days)', npy_path, *columnar.shape)
+
+    # ---- derived tables ----------------------------------------------------
+
+    def _build_climatology(self):
+        """Smoothed mean AQI per day of year plus the AR(1) coefficient of the anomalies."""
+        days = self.start + np.arange(self.n_days)
+        doy = self._day_of_year_index(days)
+        observed = self.has_data
+
+        sums = np.bincount(doy[observed], weights=self._aqi[observed], minlength=366)
+        counts = np.bincount(doy[observed], minlength=366)
+
+        # Circular moving average so the year wraps Dec 31 -> Jan 1
+        kernel = np.ones(2 * _CLIMATOLOGY_HALF_WINDOW + 1)
+        pad = _CLIMATOLOGY_HALF_WINDOW
+        smooth_sums = np.convolve(np.r_[sums[-pad:], sums, sums[:pad]], kernel, mode='valid')
+        smooth_counts = np.convolve(np.r_[counts[-pad:], counts, counts[:pad]], kernel, mode='valid')
+        self.climatology = smooth_sums / np.maximum(smooth_counts, 1)
+
+        anomaly = self._aqi - self.climatology[doy]
+        prev, cur = anomaly[:-1], anomaly[1:]
+        self.ar_coefficient = float(np.clip(np.dot(prev, cur) / np.dot(prev, prev), 0.0, 0.99))
+        self._last_anomaly = anomaly[-1]
+
+    def _build_month_index(self):
+        """(year, month) -> (first row, stop row) into ``values``, clipped to the data range."""
+        months = np.arange(self.start.astype('datetime64[M]'), self.end.astype('datetime64[M]') + 2)
+        bounds = np.clip((months.astype('datetime64[D]') - self.start).astype(np.int64), 0, self.n_days)
+        self._month_rows = {
+            (int(m.astype('datetime64[Y]').astype(np.int64)) + 1970, int(m.astype(np.int64) % 12) + 1): (int(a), int(b))
+            for m, a, b in zip(months[:-1], bounds[:-1], bounds[1:])
+        }
+
+    def _build_meta(self):
+        """Date range, years and per-column min/max for /api/aqi_history_meta."""
+        days = self.start + np.flatnonzero(self.has_data)
+        years = np.unique(days.astype('datetime64[Y]').astype(np.int64) + 1970)
+        last = days[-1].item()
+
+        return {
+            'start_date': str(self.start),
+            'end_date': str(self.end),
+            'days_with_data': int(self.has_data.sum()),
+            'years': years.tolist(),
+            'min_year': int(years[0]),
+            'max_year': int(years[-1]),
+            'latest_year': last.year,
+            'latest_month': last.month,
+            'pollutants': {
+                column: {
+                    'min': _json_float(np.nanmin(self.values[:, i])),
+                    'max': _json_float(np.nanmax(self.values[:, i]))
+                }
+                for i, column in enumerate(self.columns)
+            }
+        }
+
+    def month_rows(self, year, month):
+        """🗓️ (first row, stop row) of that month, or None outside the data range"""
+        rows = self._month_rows.get((year, month))
+        if rows is None or rows[0] == rows[1]:
+            return None
+        return rows
+
+    def month_slice(self, year, month):
+        """🗓️ (first day, rows of ``values`` for that month) or None outside the data range"""
+        rows = self.month_rows(year, month)
+        if rows is None:
+            return None
+        first, stop = rows
+        return self.start + first, self.values[first:stop]
+
+    def day_rows(self, first_day, last_day):
+        """(first row, stop row) covering first_day..last_day, clipped to the data range (may be empty)"""
+        first = int((np.datetime64(first_day, 'D') - self.start).astype(np.int64))
+        stop = int((np.datetime64(last_day, 'D') - self.start).astype(np.int64)) + 1
+        return min(max(first, 0), self.n_days), min(max(stop, 0), self.n_days)
+
+    def export_columns(self, first, stop):
+        """📤 Rows first..stop as JSON-ready columns: date, every CSV column, EPA AQI and dominant pollutant
+
+        Days without a reading are None in every column.
+        """
+        columns = {'date': [str(day) for day in self.start + np.arange(first, stop)]}
+        for i, column in enumerate(self.columns):
+            values = self.values[first:stop, i]
+            columns[column] = [None if np.isnan(value) else _json_float(value) for value in values]
+        columns['epa_aqi'] = [None if np.isnan(value) else int(value) for value in self.epa['aqi'][first:stop]]
+        columns['dominant_pollutant'] = self.epa['dominant'][first:stop].tolist()
+        return columns
+
+    @staticmethod
+    def _day_of_year_index(days):
+        """0-based day of year (0..365) for a datetime64[D] array."""
+        return (days - days.astype('datetime64[Y]')).astype(np.int64)
+
+    def aqi_series(self, days):
+        """📈 AQI for any datetime64[D] array: history, forecast after it, climatology before it"""
+        days = np.asarray(days, dtype='datetime64[D]')
+        offset = (days - self.start).astype(np.int64)
+        result = self.climatology[self._day_of_year_index(days)]
+
+        inside = (offset >= 0) & (offset < self.n_days)
+        result[inside] = self._aqi[offset[inside]]
+
+        # x[t] = clim[t] + phi * (x[t-1] - clim[t-1]), unrolled to phi**h times the last anomaly
+        after = offset >= self.n_days
+        horizon = offset[after] - (self.n_days - 1)
+        result[after] += self._last_anomaly * self.ar_coefficient ** horizon
+        return result
+
+    def lag_features(self, days):
+        """🧮 LAG / ROLLING AQI FEATURES (LAG_FEATURE_COLUMNS) FOR A datetime64[D] ARRAY"""
+        days = np.asarray(days, dtype='datetime64[D]')
+        # window[:, k] is the AQI k + 1 days before each target date
+        window = self.aqi_series(days[:, None] - np.arange(1, _WINDOW + 1))
+
+        return {
+            'aqi_lag_1': window[:, 0],
+            'aqi_lag_3': window[:, 2],
+            'aqi_lag_7': window[:, 6],
+            'aqi_ma_3': window[:, :3].mean(axis=1),
+            'aqi_ma_7': window.mean(axis=1),
+            'aqi_trend_3': window[:, 0] - window[:, 2],
+            'aqi_volatility': window.std(axis=1, ddof=1),
+        }
+
+
+def _json_float(value):
+    """Shortest decimal that round-trips ``value`` at its own precision (float32 0.031353, not 0.03135300055)."""
+    return float(np.format_float_positional(value))
+
+
+# Convert ahead of time (e.g. at deploy): python aqi_history_store.py [path/to.csv]
+if __name__ == "__main__":
+    import sys
+    from aqi_logging import configure_logging
+    configure_logging()
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_HISTORY_CSV
+    AQIHistoryStore.from_csv(csv_path).write_cache(csv_path)
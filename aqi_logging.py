@@ -0,0 +1,83 @@
+"""
+AirSight logging setup - level-gated, queue-backed logging for the API and ML system
+
+Modules log through ``logging.getLogger(__name__)`` with lazy %-formatting, so a
+message below the active level costs one level check and nothing else. Records
+that pass are put on an in-memory queue and written to stdout / the log file by
+a background QueueListener thread, keeping console and file I/O off the request
+thread.
+
+Environment:
+    AQI_LOG_LEVEL  root level (default INFO; per-prediction detail is DEBUG)
+    AQI_LOG_FILE   optional file to append to in addition to stdout
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import atexit
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+
+_queue_handler = None
+_listener = None
+# True between _listener.start() and .stop(); QueueListener.stop() must not run twice
+_listener_running = False
+
+
+def configure_logging(level=None, log_file=None):
+    """📝 INSTALL THE QUEUE HANDLER ON THE ROOT LOGGER (idempotent)"""
+    global _queue_handler, _listener, _listener_running
+
+    if _listener is not None:
+        return _listener
+
+    level = (level or os.environ.get('AQI_LOG_LEVEL', 'INFO')).upper()
+    log_file = log_file or os.environ.get('AQI_LOG_FILE')
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        handlers.append(logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    _queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_running = True
+
+    root = logging.getLogger()
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    atexit.register(_stop_listener)
+    return _listener
+
+
+def _stop_listener():
+    """Flush whatever is still queued before the process exits."""
+    global _listener_running
+
+    if _listener_running:
+        _listener_running = False
+        _listener.stop()
+
+
+def _restart_listener_after_fork():
+    """🍴 Forked workers (gunicorn --preload) inherit the handler but not the listener thread."""
+    global _listener, _listener_running
+
+    if _listener is None:
+        return
+    # The parent's queue may have been mid-operation at fork time; start clean.
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    _listener_running = True
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
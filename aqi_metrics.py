@@ -0,0 +1,332 @@
+"""
+AirSight metrics - counters and latency histograms in Prometheus text format
+
+Metrics are declared once at module level and updated through label-bound
+children, so the hot path is one lock and one dict update:
+
+    PREDICT_SECONDS = histogram('aqi_prediction_stage_seconds', 'Time per stage', ['stage']).labels(stage='predict')
+    with PREDICT_SECONDS.time():
+        model.predict(X)
+
+Each process keeps its own values. With AQI_METRICS_DIR set, every process
+writes a snapshot to <dir>/aqi-metrics-<pid>.json (at most every
+AQI_METRICS_FLUSH_SECONDS, at exit, on every scrape and before forking when
+something changed since the last write), and
+render_all() sums the snapshots of all processes, so /api/metrics shows the
+whole gunicorn server whichever worker answers. Without it only the answering
+process is reported.
+
+Files of exited workers are kept on purpose (counters must not go backwards);
+startup.sh empties the directory before gunicorn starts.
+"""
+
+import os
+import json
+import glob
+import time
+import atexit
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Seconds; requests and whole prediction batches
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Seconds; single stages inside a prediction (feature build, predict, ...)
+STAGE_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+DEFAULT_FLUSH_SECONDS = 5.0
+SNAPSHOT_PATTERN = 'aqi-metrics-*.json'
+
+
+class _Timer:
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _Child:
+    """A metric bound to one set of label values."""
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount=1):
+        if amount:
+            self._metric._inc(self._key, amount)
+
+    def observe(self, value):
+        self._metric._observe(self._key, value)
+
+    def time(self):
+        return _Timer(self)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self._registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def labels(self, **labels):
+        return _Child(self, tuple(str(labels[name]) for name in self.labelnames))
+
+    def _samples(self):
+        return [[list(key), value] for key, value in self._values.items()]
+
+    def describe(self):
+        return {'type': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames)}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1):
+        if amount:
+            self._inc((), amount)
+
+    def _inc(self, key, amount):
+        with self._registry._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+            self._registry._changed = True
+
+
+class Histogram(Metric):
+    """Per-bucket counts (the last one is +Inf) and the running sum, per label set."""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+
+    def observe(self, value):
+        self._observe((), value)
+
+    def time(self):
+        return _Timer(_Child(self, ()))
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._registry._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+            self._registry._changed = True
+
+    def _samples(self):
+        return [[list(key), [list(counts), total]] for key, (counts, total) in self._values.items()]
+
+    def describe(self):
+        return dict(super().describe(), buckets=list(self.buckets))
+
+
+class MetricsRegistry:
+    """📈 PER-PROCESS METRIC VALUES, SHARED WITH OTHER PROCESSES THROUGH SNAPSHOT FILES"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._last_flush = 0.0
+        # A value changed since the last flush (the pre-fork flush is skipped otherwise)
+        self._changed = False
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f'metric {name} already registered as a {metric.kind}')
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def snapshot(self):
+        """This process's values as a JSON-ready document."""
+        with self._lock:
+            metrics = {name: dict(metric.describe(), samples=metric._samples())
+                       for name, metric in self._metrics.items()}
+        return {'pid': os.getpid(), 'written_at': time.time(), 'metrics': metrics}
+
+    def reset(self):
+        """Zero every value (the metric definitions stay)."""
+        with self._lock:
+            for metric in self._metrics.values():
+                metric._values.clear()
+            self._changed = True
+
+    @staticmethod
+    def directory():
+        return os.environ.get('AQI_METRICS_DIR') or None
+
+    def flush(self):
+        """Write this process's snapshot to AQI_METRICS_DIR (no-op without it)."""
+        directory = self.directory()
+        if not directory:
+            return
+        self._last_flush = time.monotonic()
+        with self._lock:
+            self._changed = False
+        pid = os.getpid()
+        path = os.path.join(directory, f'aqi-metrics-{pid}.json')
+        tmp_path = os.path.join(directory, f'.aqi-metrics-{pid}-{threading.get_ident()}.json.tmp')
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning('⚠️ Could not write metrics snapshot %s: %s', path, e)
+
+    def flush_if_changed(self):
+        """Flush unless nothing changed since the last write (before every fork)."""
+        if self._changed:
+            self.flush()
+
+    def maybe_flush(self):
+        """Flush when the last write is older than AQI_METRICS_FLUSH_SECONDS (cheap to call per request)."""
+        if not self.directory():
+            return
+        interval = float(os.environ.get('AQI_METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+        if time.monotonic() - self._last_flush >= interval:
+            self.flush()
+
+    def collect(self):
+        """Snapshots of every process: all files in AQI_METRICS_DIR, or just this process."""
+        directory = self.directory()
+        if not directory:
+            return [self.snapshot()]
+
+        self.flush()
+        snapshots = []
+        for path in sorted(glob.glob(os.path.join(directory, SNAPSHOT_PATTERN))):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.debug('Skipping metrics snapshot %s: %s', path, e)
+        return snapshots
+
+    def render_all(self):
+        """📊 Prometheus text exposition of the summed snapshots"""
+        snapshots = self.collect()
+        return render(merge(snapshots), len(snapshots))
+
+    def _after_fork_in_child(self):
+        # The parent's values were flushed under its own pid; the child starts from zero
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._changed = False
+        for metric in self._metrics.values():
+            metric._values = {}
+
+
+def merge(snapshots):
+    """Sum the samples of several snapshots: {name: description with merged samples}."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.get('metrics', {}).items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            samples = target['samples']
+            for labels, value in metric['samples']:
+                key = tuple(labels)
+                if metric['type'] == 'histogram':
+                    counts, total = value
+                    current = samples.get(key)
+                    if current is None or len(current[0]) != len(counts):
+                        samples[key] = [list(counts), total]
+                    else:
+                        current[0] = [a + b for a, b in zip(current[0], counts)]
+                        current[1] += total
+                else:
+                    samples[key] = samples.get(key, 0) + value
+    return merged
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged, processes=1):
+    """Prometheus text format (version 0.0.4) for merged metrics."""
+    lines = [
+        '# HELP aqi_metrics_processes Processes whose metrics are included in this scrape',
+        '# TYPE aqi_metrics_processes gauge',
+        f'aqi_metrics_processes {processes}',
+    ]
+    for name in sorted(merged):
+        metric = merged[name]
+        names = metric['labelnames']
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric['samples']):
+            value = metric['samples'][key]
+            if metric['type'] != 'histogram':
+                lines.append(f'{name}{_label_text(names, key)} {_number(value)}')
+                continue
+            counts, total = value
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + [float('inf')], counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f'{name}_bucket{_label_text(names, key, le)} {cumulative}')
+            lines.append(f'{name}_sum{_label_text(names, key)} {_number(total)}')
+            lines.append(f'{name}_count{_label_text(names, key)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, documentation, labelnames=()):
+    """🔢 Declare (or fetch) a counter on the process registry."""
+    return REGISTRY.counter(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    """⏱️ Declare (or fetch) a histogram on the process registry."""
+    return REGISTRY.histogram(name, documentation, labelnames, buckets)
+
+
+atexit.register(REGISTRY.flush)
+
+if hasattr(os, 'register_at_fork'):
+    # gunicorn --preload: the master's own work (startup warmup) is written under its pid
+    # before a fork, and each worker counts only what it does itself. The master is idle
+    # between forks, so respawning workers usually finds nothing to write.
+    os.register_at_fork(before=REGISTRY.flush_if_changed, after_in_child=REGISTRY._after_fork_in_child)
@@ -0,0 +1,148 @@
+"""
+AirSight model reload - put a new aqi_4_models.pkl live without restarting gunicorn
+
+The file is read on a background thread into a complete ModelSet (models,
+metadata, compiled trees) while requests keep using the current one; then
+AQIPredictionSystem.swap_model_set replaces it with a single assignment, so a
+request sees the old set or the new one, never a half-loaded mix. The on_swap
+callback runs after every swap (the Flask app drops its response cache and
+re-runs the warmup there); the prediction caches are keyed by the model version
+and are cleared by the swap itself.
+
+Two triggers:
+
+* AQI_MODEL_WATCH_SECONDS=N - at most every N seconds a request stats the file
+  and starts a reload when its size/mtime changed. Every gunicorn worker does
+  this for itself, so all of them pick up a new file.
+* POST /api/admin/reload with the AQI_ADMIN_TOKEN token - reloads the worker
+  that answers (the others follow through the watcher).
+
+A file that yields no trained models while trained models are live (e.g. one
+still being copied) is not swapped in; the current set keeps serving and that
+size/mtime is not retried. Replace the file atomically (write a temp file, then
+mv it over aqi_4_models.pkl) to avoid reading it half-written.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import aqi_forksafe
+from aqi_metrics import counter
+
+logger = logging.getLogger(__name__)
+
+MODEL_RELOADS = counter('aqi_model_reloads_total', 'Model file reloads by outcome', ['result'])
+
+
+class ModelReloader:
+    """🔁 BACKGROUND MODEL RELOAD WITH AN ATOMIC SWAP"""
+
+    def __init__(self, system, filename, on_swap=None, watch_seconds=None):
+        self.system = system
+        self.filename = filename
+        # on_swap(previous ModelSet, new ModelSet), called on the reload thread
+        self.on_swap = on_swap
+        if watch_seconds is None:
+            watch_seconds = float(os.environ.get('AQI_MODEL_WATCH_SECONDS', 0))
+        self.watch_seconds = watch_seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._last_check = time.monotonic()
+        self._rejected_version = None
+        self.state = 'idle'
+        self.reloads = 0
+        self.last_trigger = None
+        self.last_result = None
+        self.last_error = None
+        self.last_duration = None
+        aqi_forksafe.register(self)
+
+    @property
+    def running(self):
+        return self.state == 'loading' and self._pid == os.getpid()
+
+    def start(self, trigger='manual'):
+        """Load the file on a background thread; False when a reload is already running here."""
+        with self._lock:
+            if self.running:
+                return False
+            self.state = 'loading'
+            self.last_trigger = trigger
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='aqi-model-reload', daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """Block until the running reload (if any) has finished."""
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join(timeout)
+
+    def maybe_check(self):
+        """Start a reload when the file changed (checks at most every AQI_MODEL_WATCH_SECONDS; cheap per request)."""
+        if self.watch_seconds <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.watch_seconds:
+            return
+        self._last_check = now
+        version = self.system.model_file_version(self.filename)
+        if version in (self.system.model_version, self._rejected_version) or self.running:
+            return
+        logger.info('👀 %s changed (%s -> %s), reloading', self.filename, self.system.model_version, version)
+        self.start('watcher')
+
+    def _run(self):
+        started = time.perf_counter()
+        result, error = 'failed', None
+        try:
+            model_set = self.system.build_model_set(self.filename)
+            if self.system.model_set.has_trained_models and not model_set.has_trained_models:
+                result = 'rejected'
+                error = f'{self.filename} has no usable models; keeping {self.system.model_version}'
+                self._rejected_version = model_set.version
+                logger.warning('⚠️ %s', error)
+            else:
+                previous = self.system.swap_model_set(model_set)
+                result = 'swapped'
+                if self.on_swap is not None:
+                    try:
+                        self.on_swap(previous, model_set)
+                    except Exception as e:
+                        logger.exception('❌ Model swap callback failed: %s', e)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+            logger.exception('❌ Model reload failed, keeping %s: %s', self.system.model_version, e)
+
+        MODEL_RELOADS.labels(result=result).inc()
+        with self._lock:
+            self.state = 'idle'
+            self.last_result = result
+            self.last_error = error
+            self.last_duration = round(time.perf_counter() - started, 3)
+            if result == 'swapped':
+                self.reloads += 1
+        logger.info('🔁 Model reload %s in %.2fs (%s)', result, self.last_duration, self.last_trigger)
+
+    def status(self):
+        """Current model set and the last reload, for /api/health and the admin endpoint."""
+        with self._lock:
+            return {
+                'state': self.state if self._pid in (None, os.getpid()) else 'idle',
+                'model_set': self.system.model_set.summary(),
+                'reloads': self.reloads,
+                'last_trigger': self.last_trigger,
+                'last_result': self.last_result,
+                'last_error': self.last_error,
+                'last_duration_seconds': self.last_duration,
+                'watch_seconds': self.watch_seconds
+            }
+
+    def _reset_locks(self):
+        # A reload thread in the parent doesn't exist in the child; neither does its lock holder
+        self._lock = threading.Lock()
+
@@ -0,0 +1,331 @@
+"""
+AirSight model store - aqi_4_models.pkl split into one pickle per model, loaded on first use
+
+Unpickling every model at import is most of a worker's startup time and memory,
+while most traffic only ever asks the best model. The store keeps, next to the
+model file:
+
+    aqi_4_models.manifest.json     model names and files, performances, best model,
+                                   feature columns, and the size/mtime/sha256 of the
+                                   .pkl it was split from
+    aqi_4_models.<sha>.<n>.pkl     one model each
+
+A LazyModelRegistry reads the manifest and unpickles a model (and compiles it,
+see aqi_tree_compiler) the first time it is asked for; the best model is loaded
+right away. With AQI_MODEL_IDLE_SECONDS=N a model nobody used for N seconds is
+dropped again (never the best model) and reloaded on its next use.
+
+Splitting is an offline step; workers only read a split. startup.sh runs it
+before gunicorn starts:
+
+    python aqi_model_store.py [aqi_4_models.pkl]
+
+It reads the .pkl once (hashing it on the same read), writes the model files and
+the manifest, and deletes the files of older splits. A manifest that no longer
+matches the .pkl (size/mtime, then sha256, as for the history cache) is ignored,
+so a worker that loads or hot-reloads (aqi_model_reload) an unsplit file
+unpickles every model, as before; run the split again after replacing the file.
+Model file names carry the source's hash, so a worker never loads a model of
+another version, but one still serving an older version loses its unloaded
+models when their files are deleted.
+
+AQI_LAZY_MODELS=0 turns this off (every model is unpickled at load, as before).
+Only the {'models': {name: {'model': ...}}} layout is split; other layouts load
+eagerly.
+"""
+
+import os
+import glob
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from collections.abc import Mapping
+
+import aqi_forksafe
+from aqi_fileutil import file_sha256, write_atomic
+from aqi_metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+# Bump when the manifest / file layout changes so old splits are redone
+MANIFEST_FORMAT_VERSION = 1
+
+MODEL_LOADS = counter('aqi_model_loads_total', 'Models unpickled on first use', ['model'])
+MODEL_UNLOADS = counter('aqi_model_unloads_total', 'Idle models dropped from memory', ['model'])
+MODEL_LOAD_SECONDS = histogram('aqi_model_load_seconds', 'Time to unpickle (and compile) one model', ['model'])
+
+
+def lazy_models_enabled():
+    return os.environ.get('AQI_LAZY_MODELS', '1') != '0'
+
+
+def manifest_path(model_path):
+    return os.path.splitext(model_path)[0] + '.manifest.json'
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class _HashingReader:
+    """File wrapper for pickle.load that feeds every byte read through it into a sha256"""
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.digest.update(data)
+        return data
+
+    def readinto(self, buffer):
+        n = self._f.readinto(buffer)
+        self.digest.update(memoryview(buffer)[:n])
+        return n
+
+    def readline(self, size=-1):
+        data = self._f.readline(size)
+        self.digest.update(data)
+        return data
+
+    def peek(self, size=0):
+        # Look-ahead only; the bytes are hashed when they are read
+        return self._f.peek(size)
+
+
+def load_hashed(model_path):
+    """(unpickled data, size/mtime/sha256 of the file) from a single read of ``model_path``"""
+    with open(model_path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        reader = _HashingReader(f)
+        data = pickle.load(reader)
+        while reader.read(1 << 20):
+            pass  # anything after the pickle's STOP opcode
+    return data, {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': reader.digest.hexdigest()}
+
+
+def read_manifest(model_path):
+    """The manifest of ``model_path`` when it still describes that file, else None."""
+    path = manifest_path(model_path)
+    manifest = _read_json(path)
+    if not isinstance(manifest, dict) or manifest.get('format_version') != MANIFEST_FORMAT_VERSION:
+        return None
+    try:
+        stat = os.stat(model_path)
+    except OSError:
+        return None
+
+    if (manifest.get('size'), manifest.get('mtime_ns')) != (stat.st_size, stat.st_mtime_ns):
+        # Touched (e.g. copied again) but maybe not changed: the content hash decides
+        if manifest.get('sha256') != file_sha256(model_path):
+            return None
+        manifest.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        try:
+            write_atomic(path, lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
+        except OSError:
+            pass
+
+    directory = os.path.dirname(os.path.abspath(model_path))
+    try:
+        if not all(os.path.exists(os.path.join(directory, entry['file'])) for entry in manifest['models']):
+            return None
+    except (KeyError, TypeError):
+        return None  # hand-edited or truncated; split again
+    return manifest
+
+
+def _json_default(value):
+    # numpy scalars in the performance dicts
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+def write_manifest(model_path, staged, source):
+    """💾 SPLIT: one pickle per model in ``staged`` plus the manifest (manifest last)
+
+    ``staged`` holds what the loaders read from ``model_path``; ``source`` is the
+    identity load_hashed returned for that read. Files of older splits are deleted.
+    """
+    directory = os.path.dirname(os.path.abspath(model_path))
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+
+    entries = []
+    for index, (name, model) in enumerate(staged.trained_models.items()):
+        file_name = f"{stem}.{source['sha256'][:12]}.{index}.pkl"
+        write_atomic(os.path.join(directory, file_name),
+                     lambda f, model=model: pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL))
+        entries.append({'name': name, 'file': file_name, 'type': type(model).__name__,
+                        'bytes': os.path.getsize(os.path.join(directory, file_name))})
+
+    manifest = dict(
+        source,
+        format_version=MANIFEST_FORMAT_VERSION,
+        source=os.path.basename(model_path),
+        models=entries,
+        best_model=staged.best_model_name,
+        feature_columns=list(staged.feature_columns) if staged.feature_columns else None,
+        performances=staged.model_performances,
+    )
+    text = json.dumps(manifest, indent=2, default=_json_default)
+    write_atomic(manifest_path(model_path), lambda f: f.write(text.encode('utf-8')))
+
+    logger.info('💾 Split %s into %s model files (%.1f MB)', model_path, len(entries),
+                sum(entry['bytes'] for entry in entries) / 1024 / 1024)
+    _remove_files_except(model_path, {entry['file'] for entry in entries})
+    # As read_manifest would return it, so a fresh split and a reused one build the same set
+    return json.loads(text)
+
+
+def remove_stale_splits(model_path):
+    """🧹 Delete model files the current manifest doesn't list (run before workers start)"""
+    manifest = read_manifest(model_path)
+    if manifest is None:
+        return  # no split of the current file; leave everything alone
+    _remove_files_except(model_path, {entry['file'] for entry in manifest['models']})
+
+
+def _remove_files_except(model_path, keep):
+    directory = os.path.dirname(os.path.abspath(model_path))
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    for path in glob.glob(os.path.join(directory, f'{glob.escape(stem)}.*.*.pkl')):
+        if os.path.basename(path) not in keep:
+            try:
+                os.remove(path)
+                logger.info('🧹 Removed stale model file %s', path)
+            except OSError:
+                pass
+
+
+class _CompiledView(Mapping):
+    """Compiled forms of the models that are loaded right now (never triggers a load)."""
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    def __getitem__(self, name):
+        entry = self._registry._loaded.get(name)
+        if entry is None or entry[1] is None:
+            raise KeyError(name)
+        return entry[1]
+
+    def __iter__(self):
+        return iter([name for name, entry in list(self._registry._loaded.items()) if entry[1] is not None])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+class LazyModelRegistry(Mapping):
+    """🗂️ NAME -> MODEL, UNPICKLED ON FIRST USE AND DROPPED AGAIN WHEN IDLE"""
+
+    def __init__(self, directory, entries, prepare=None, pinned=(), idle_seconds=None, preloaded=None):
+        self.directory = directory
+        self._files = {entry['name']: entry['file'] for entry in entries}
+        # prepare(name, model) -> compiled form or None, run once per load
+        self._prepare = prepare
+        self.pinned = set(pinned)
+        if idle_seconds is None:
+            idle_seconds = float(os.environ.get('AQI_MODEL_IDLE_SECONDS', 0))
+        self.idle_seconds = idle_seconds
+        self._loaded = {}
+        self._last_used = {}
+        self._locks = {name: threading.Lock() for name in self._files}
+        self._last_sweep = time.monotonic()
+        self.compiled = _CompiledView(self)
+        # Models already in memory (e.g. just split from the .pkl) needn't be unpickled again
+        for name, model in (preloaded or {}).items():
+            if name in self._files:
+                self._add(name, model)
+        aqi_forksafe.register(self)
+
+    def __getitem__(self, name):
+        entry = self._loaded.get(name)
+        if entry is None:
+            if name not in self._files:
+                raise KeyError(name)
+            entry = self._load(name)
+        self._last_used[name] = time.monotonic()
+        self.maybe_unload_idle()
+        return entry[0]
+
+    def __contains__(self, name):
+        return name in self._files
+
+    # Identity, not Mapping's item-by-item comparison (which would load every model)
+    __eq__ = object.__eq__
+    __hash__ = object.__hash__
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self):
+        return len(self._files)
+
+    def loaded_names(self):
+        return list(self._loaded)
+
+    def _load(self, name):
+        with self._locks[name]:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                return entry
+            started = time.perf_counter()
+            with open(os.path.join(self.directory, self._files[name]), 'rb') as f:
+                model = pickle.load(f)
+            entry = self._add(name, model)
+            elapsed = time.perf_counter() - started
+            MODEL_LOADS.labels(model=name).inc()
+            MODEL_LOAD_SECONDS.labels(model=name).observe(elapsed)
+            logger.info('📥 Loaded model %s (%s) in %.0f ms', name, type(model).__name__, elapsed * 1000)
+            return entry
+
+    def _add(self, name, model):
+        compiled = self._prepare(name, model) if self._prepare is not None else None
+        entry = self._loaded[name] = (model, compiled)
+        self._last_used[name] = time.monotonic()
+        return entry
+
+    def maybe_unload_idle(self):
+        """Drop models unused for AQI_MODEL_IDLE_SECONDS (checks at most every half period; cheap per call)."""
+        if self.idle_seconds <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_sweep < min(self.idle_seconds / 2, 60.0):
+            return
+        self._last_sweep = now
+        for name in list(self._loaded):
+            if name in self.pinned or now - self._last_used.get(name, now) < self.idle_seconds:
+                continue
+            with self._locks[name]:
+                if self._loaded.pop(name, None) is not None:
+                    MODEL_UNLOADS.labels(model=name).inc()
+                    logger.info('📤 Unloaded model %s after %.0fs idle', name, now - self._last_used.get(name, now))
+
+    def _reset_locks(self):
+        # A load running in the parent at fork time never finishes here
+        self._locks = {name: threading.Lock() for name in self._files}
+
+
+# The offline split (startup.sh): python aqi_model_store.py [path/to/aqi_4_models.pkl]
+if __name__ == "__main__":
+    import sys
+    from aqi_logging import configure_logging
+    configure_logging()
+
+    from aqi_prediction_system import AQIPredictionSystem
+    model_file = sys.argv[1] if len(sys.argv) > 1 else 'aqi_4_models.pkl'
+    if not lazy_models_enabled():
+        logger.info('AQI_LAZY_MODELS=0; nothing to split')
+        sys.exit(0)
+    if read_manifest(model_file) is not None:
+        logger.info('✅ %s is already split', model_file)
+        remove_stale_splits(model_file)
+    else:
+        AQIPredictionSystem().build_model_set(model_file, split=True)
@@ -6,187 +6,652 @@ Enhanced to properly load and use trained models from aqi_4_models.pkl
 import numpy as np
 import pandas as pd
 import pickle
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date as date_type
 import hashlib
 import warnings
 import os
+import logging
+import time
+import threading
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from types import MappingProxyType, SimpleNamespace
+import aqi_forksafe
+from aqi_history_store import AQIHistoryStore
+from aqi_epa import EPA_BREAKPOINTS, compute_aqi
+from aqi_metrics import STAGE_BUCKETS, counter, histogram
+from aqi_profiling import run_profiled
+from aqi_model_store import LazyModelRegistry, lazy_models_enabled, load_hashed, read_manifest, write_manifest
+from aqi_tree_compiler import boundary_rows, compile_model, equivalent
 warnings.filterwarnings('ignore')
 
-class AQIPredictionSystem:
+logger = logging.getLogger(__name__)
+
+_EPOCH_ORDINAL = date_type(1970, 1, 1).toordinal()
+_MISSING = object()
+
+# Who is asking for predictions ("DASHBOARD", "PREDICTION", ...); used only to label log lines.
+# The Flask app sets it per request, scripts can use prediction_caller().
+PREDICTION_CALLER = contextvars.ContextVar('aqi_prediction_caller', default='UNKNOWN')
+
+
+@contextmanager
+def prediction_caller(tag):
+    """🏷️ LABEL ALL PREDICTIONS MADE INSIDE THIS BLOCK WITH A CALLER TAG"""
+    token = PREDICTION_CALLER.set(tag)
+    try:
+        yield
+    finally:
+        PREDICTION_CALLER.reset(token)
+
+# Where prediction time goes (see /api/metrics)
+PREDICTION_STAGE_SECONDS = histogram(
+    'aqi_prediction_stage_seconds', 'Time spent per prediction stage and batch', ['stage'], buckets=STAGE_BUCKETS)
+FEATURES_TIMER = PREDICTION_STAGE_SECONDS.labels(stage='features')
+PREDICT_TIMER = PREDICTION_STAGE_SECONDS.labels(stage='predict')
+POSTPROCESS_TIMER = PREDICTION_STAGE_SECONDS.labels(stage='postprocess')
+SIMULATE_TIMER = PREDICTION_STAGE_SECONDS.labels(stage='simulate')
+PREDICTIONS_TOTAL = counter('aqi_predictions_total', 'Dates predicted (cache misses), by model', ['model'])
+PREDICTION_FAILURES_TOTAL = counter('aqi_prediction_failures_total', 'Dates a trained model returned no value for', ['model'])
+PREDICTION_CACHE_LOOKUPS = counter('aqi_prediction_cache_lookups_total', 'Prediction cache lookups', ['result'])
+PREDICTION_CACHE_HITS = PREDICTION_CACHE_LOOKUPS.labels(result='hit')
+PREDICTION_CACHE_MISSES = PREDICTION_CACHE_LOOKUPS.labels(result='miss')
+
+# Threads for running independent models side by side (override with AQI_MODEL_WORKERS).
+# sklearn's tree ensembles predict in Cython without the GIL, so models really overlap.
+DEFAULT_MODEL_WORKERS = min(4, os.cpu_count() or 1)
+_model_executor = None
+_model_executor_lock = threading.Lock()
+
+
+def get_model_executor():
+    """🧵 SHARED THREAD POOL FOR PER-MODEL WORK (created on first use, one per process)"""
+    global _model_executor
+    if _model_executor is None:
+        with _model_executor_lock:
+            if _model_executor is None:
+                workers = int(os.environ.get('AQI_MODEL_WORKERS', DEFAULT_MODEL_WORKERS))
+                _model_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='aqi-model')
+    return _model_executor
+
+
+def submit_with_context(fn, *args, **kwargs):
+    """Run ``fn`` on the shared pool with the caller's contextvars (e.g. PREDICTION_CALLER).
+    
+    When the calling request is being profiled, the task is profiled with it (aqi_profiling).
+    """
+    return get_model_executor().submit(contextvars.copy_context().run, run_profiled, fn, *args, **kwargs)
+
+
+class TaskGroup:
+    """🧵 REQUEST-SCOPED FAN-OUT ON THE SHARED MODEL POOL
+    
+        with TaskGroup() as tasks:
+            chart = tasks.submit(build_chart, day)
+            pollutants = tasks.submit(build_pollutants, day)
+            response = combine(chart.result(), pollutants.result())
+    
+    Leaving the block waits for every task, and cancels the ones that haven't started
+    when the block raised, so no work outlives the request. Tasks submitted from a
+    pool thread run inline: a pool task waiting on the pool could deadlock it.
+    """
+
     def __init__(self):
-        self.models = {}
-        self.model_performances = {}
-        self.best_model_name = 'gbr'
-        self.trained_models = {}
-        self.trained_models_loaded = False
-        self.use_trained_models = False
+        self._futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        if threading.current_thread().name.startswith('aqi-model'):
+            future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            future = submit_with_context(fn, *args, **kwargs)
+        self._futures.append(future)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for future in self._futures:
+            if exc_type is not None:
+                future.cancel()
+        for future in self._futures:
+            if not future.cancelled():
+                future.exception()  # wait; errors were already raised to whoever asked for result()
+        return False
+
+
+def _reset_model_executor_after_fork():
+    """🍴 A forked worker inherits the pool object but none of its threads; start a new one.
+
+    Instance locks are replaced through aqi_forksafe.
+    """
+    global _model_executor, _model_executor_lock
+    _model_executor = None
+    _model_executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_model_executor_after_fork)
+
+# Max number of memoized predictions (override with AQI_PREDICTION_CACHE_SIZE)
+DEFAULT_PREDICTION_CACHE_SIZE = 50000
+# Max number of (year, model, version) AQI tables kept (override with AQI_YEARLY_TABLE_CACHE_SIZE)
+DEFAULT_YEARLY_TABLE_CACHE_SIZE = 64
+
+
+class PredictionCache:
+    """🗃️ THREAD-SAFE BOUNDED LRU CACHE FOR DETERMINISTIC PREDICTIONS"""
+
+    def __init__(self, max_size=DEFAULT_PREDICTION_CACHE_SIZE):
+        self.max_size = max(0, int(max_size))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        aqi_forksafe.register(self)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_size == 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def compiled_trees_enabled():
+    return os.environ.get('AQI_COMPILED_TREES', '1') != '0'
+
+
+def _read_only(mapping):
+    """Dicts are copied behind a read-only proxy; other mappings (a LazyModelRegistry) are kept as they are."""
+    if mapping is None or isinstance(mapping, dict):
+        return MappingProxyType(dict(mapping or {}))
+    return mapping
+
+
+class ModelSet:
+    """📦 EVERYTHING LOADED FROM ONE MODEL FILE (read-only once built)
+    
+    AQIPredictionSystem holds exactly one. A reload builds a complete new set and
+    swaps it in with one assignment, so a prediction sees the old set or the new
+    one, never a mix of both.
+    """
+    __slots__ = ('version', 'trained_models', 'compiled_models', 'model_performances',
+                 'best_model_name', 'feature_columns', 'models', 'file_info', 'loaded_at')
+
+    def __init__(self, version=None, trained_models=None, compiled_models=None, model_performances=None,
+                 best_model_name='gbr', feature_columns=None, models=None, file_info=None):
+        init = super().__setattr__
+        init('version', version)
+        init('trained_models', _read_only(trained_models))
+        # Array-backed copies of the tree ensembles that predict identically (aqi_tree_compiler)
+        init('compiled_models', _read_only(compiled_models))
+        init('model_performances', MappingProxyType(
+            {name: dict(perf) for name, perf in (model_performances or {}).items()}))
+        init('best_model_name', best_model_name)
+        init('feature_columns', tuple(feature_columns) if feature_columns else None)
+        init('models', MappingProxyType(dict(models or {})))
+        # Summary of the file the set was read from (empty when there was none)
+        init('file_info', MappingProxyType(dict(file_info or {})))
+        init('loaded_at', time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ModelSet is read-only; build a new one and swap it in')
+
+    def __delattr__(self, name):
+        raise AttributeError('ModelSet is read-only; build a new one and swap it in')
+
+    @property
+    def has_trained_models(self):
+        return bool(self.trained_models)
+
+    def loaded_model_names(self):
+        """Models currently in memory (all of them unless they are loaded lazily)"""
+        if isinstance(self.trained_models, LazyModelRegistry):
+            return self.trained_models.loaded_names()
+        return list(self.trained_models)
+
+    def summary(self):
+        """Version, models and load time (JSON-ready)"""
+        return {
+            'version': self.version,
+            'trained_models': list(self.trained_models),
+            'loaded_models': self.loaded_model_names(),
+            'compiled_models': list(self.compiled_models),
+            'best_model': self.best_model_name,
+            'loaded_at': datetime.fromtimestamp(self.loaded_at).isoformat(timespec='seconds')
+        }
+
+
+class AQIPredictionSystem:
+    def __init__(self, cache_size=None, history_path=None):
+        # Models and their metadata; only ever replaced as a whole (swap_model_set)
+        self._model_set = ModelSet()
         self.predictors = ["year", "month", "day", "weekday", "daily_avg_temp"]
         self.pollutants = ["PM2.5", "PM10", "CO", "NO2", "SO2", "O3"]
-        self._prediction_cache = {}
+        if cache_size is None:
+            cache_size = int(os.environ.get('AQI_PREDICTION_CACHE_SIZE', DEFAULT_PREDICTION_CACHE_SIZE))
+        self._prediction_cache = PredictionCache(cache_size)
+        
+        # (year, model, model version) -> read-only int16 AQI per day of year; the year comes
+        # from the client, so the tables are an LRU too. One build lock per key being built.
+        self._yearly_aqi_tables = PredictionCache(
+            int(os.environ.get('AQI_YEARLY_TABLE_CACHE_SIZE', DEFAULT_YEARLY_TABLE_CACHE_SIZE)))
+        self._yearly_build_locks = {}
+        self._yearly_tables_lock = threading.Lock()
+        aqi_forksafe.register(self)
+        
+        # Real daily AQI history for the lag / rolling features (None -> placeholder features)
+        self.history = AQIHistoryStore.load(history_path)
         
         # Enhanced model metadata tracking
         self.model_metadata = {}
-        self.model_file_info = {}
         
         # AQI Breakpoints (FIXED - for proper calculations)
-        self.breakpoints = {
-            "PM2.5": [(0.0, 12.0, 0, 50), (12.1, 35.4, 51, 100), (35.5, 55.4, 101, 150), 
-                     (55.5, 150.4, 151, 200), (150.5, 250.4, 201, 300), (250.5, 350.4, 301, 400), 
-                     (350.5, 500.4, 401, 500)],
-            "PM10": [(0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150), 
-                    (255, 354, 151, 200), (355, 424, 201, 300), (425, 504, 301, 400), 
-                    (505, 604, 401, 500)],
-            "CO": [(0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150), 
-                  (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 40.4, 301, 400), 
-                  (40.5, 50.4, 401, 500)],
-            "SO2": [(0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150), 
-                   (186, 304, 151, 200), (305, 604, 201, 300), (605, 804, 301, 400), 
-                   (805, 1004, 401, 500)],
-            "NO2": [(0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150), 
-                   (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 1649, 301, 400), 
-                   (1650, 2049, 401, 500)],
-            "O3": [(0.000, 0.054, 0, 50), (0.055, 0.070, 51, 100), (0.071, 0.085, 101, 150), 
-                  (0.086, 0.105, 151, 200), (0.106, 0.200, 201, 300)]
-        }
+        self.breakpoints = EPA_BREAKPOINTS
+
+    def _reset_locks(self):
+        self._yearly_tables_lock = threading.Lock()
+        self._yearly_build_locks = {}
+
+    # ---- the current model set (read-only views) ------------------------------
+
+    @property
+    def model_set(self):
+        return self._model_set
+
+    @property
+    def model_version(self):
+        return self._model_set.version
+
+    @property
+    def trained_models(self):
+        return self._model_set.trained_models
 
-    def debug_model_file(self, filename):
-        """🔍 COMPREHENSIVE MODEL FILE DEBUG"""
-        print(f"\n🔍 DEBUGGING MODEL FILE: {filename}")
-        print("=" * 60)
+    @property
+    def compiled_models(self):
+        return self._model_set.compiled_models
+
+    @property
+    def model_performances(self):
+        return self._model_set.model_performances
+
+    @property
+    def best_model_name(self):
+        return self._model_set.best_model_name
+
+    @property
+    def feature_columns(self):
+        return self._model_set.feature_columns
+
+    @property
+    def models(self):
+        return self._model_set.models
+
+    @property
+    def trained_models_loaded(self):
+        return self._model_set.has_trained_models
+
+    @property
+    def use_trained_models(self):
+        return self._model_set.has_trained_models
+
+    @property
+    def model_file_info(self):
+        """Size, type and (when hashed) source identity of the current set's model file"""
+        return self._model_set.file_info
+
+    def _read_model_file(self, filename, hashed=False):
+        """📂 OPEN AND UNPICKLE THE MODEL FILE ONCE: (data, file info), or (None, None)
         
+        With ``hashed`` the same read also hashes the file; the file info's 'source'
+        then holds its size/mtime/sha256 (aqi_model_store.load_hashed). The info goes
+        on the ModelSet built from the data, so it's only current once that set is.
+        """
         if not os.path.exists(filename):
-            print(f"❌ FILE NOT FOUND: {filename}")
-            return None
+            logger.warning('❌ FILE NOT FOUND: %s', filename)
+            return None, None
             
         try:
-            # Get file info
             file_size = os.path.getsize(filename)
-            print(f"📁 File Size: {file_size:,} bytes ({file_size/1024/1024:.2f} MB)")
+            logger.info('📁 Model file: %s (%.2f MB)', filename, file_size/1024/1024)
             
-            # Load and inspect content
-            with open(filename, 'rb') as f:
-                data = pickle.load(f)
+            source = None
+            if hashed:
+                data, source = load_hashed(filename)
+            else:
+                with open(filename, 'rb') as f:
+                    data = pickle.load(f)
+        except Exception as e:
+            logger.error('❌ MODEL FILE LOAD ERROR: %s', e)
+            return None, None
+        
+        # Only a summary is kept; the unpickled object is owned by the loaders
+        file_info = {
+            'exists': True,
+            'size': file_size,
+            'type': type(data).__name__,
+            'source': source
+        }
+        return data, file_info
+
+    def debug_model_file(self, filename, data=None):
+        """🔍 COMPREHENSIVE MODEL FILE DEBUG
+        
+        Pass the already-unpickled ``data`` to inspect it without reading the file again.
+        """
+        logger.debug('🔍 DEBUGGING MODEL FILE: %s', filename)
+        logger.debug("=" * 60)
+        
+        if data is None:
+            data, _ = self._read_model_file(filename)
+            if data is None:
+                return None
             
-            print(f"📦 File Type: {type(data)}")
+        logger.debug('📦 File Type: %s', type(data))
+        
+        if isinstance(data, dict):
+            logger.debug('📋 Dictionary Keys: %s', list(data.keys()))
             
-            if isinstance(data, dict):
-                print(f"📋 Dictionary Keys: {list(data.keys())}")
+            for key, value in data.items():
+                logger.debug('  🔑 %s: %s', key, type(value))
                 
-                for key, value in data.items():
-                    print(f"  🔑 {key}: {type(value)}")
+                # Check if it's a model
+                if hasattr(value, 'predict'):
+                    logger.debug('    ✅ HAS PREDICT METHOD - This is a trained model!')
                     
-                    # Check if it's a model
-                    if hasattr(value, 'predict'):
-                        print(f"    ✅ HAS PREDICT METHOD - This is a trained model!")
-                        
-                        # Try to get more info about the model
-                        model_type = type(value).__name__
-                        print(f"    🤖 Model Type: {model_type}")
-                        
-                        # Check for common sklearn attributes
-                        if hasattr(value, 'feature_importances_'):
-                            print(f"    📊 Has feature importances")
-                        if hasattr(value, 'n_features_'):
-                            print(f"    📏 Features: {value.n_features_}")
-                        if hasattr(value, 'score'):
-                            print(f"    📈 Has score method")
-                            
-                    elif isinstance(value, (list, tuple)):
-                        print(f"    📝 Length: {len(value)}")
-                    elif isinstance(value, dict):
-                        print(f"    📚 Sub-dictionary with {len(value)} keys")
+                    # Try to get more info about the model
+                    model_type = type(value).__name__
+                    logger.debug('    🤖 Model Type: %s', model_type)
+                    
+                    # Check for common sklearn attributes
+                    if hasattr(value, 'feature_importances_'):
+                        logger.debug('    📊 Has feature importances')
+                    if hasattr(value, 'n_features_'):
+                        logger.debug('    📏 Features: %s', value.n_features_)
+                    if hasattr(value, 'score'):
+                        logger.debug('    📈 Has score method')
                         
-            elif hasattr(data, 'predict'):
-                print("🤖 SINGLE MODEL DETECTED")
-                print(f"   Model Type: {type(data).__name__}")
-                
-            else:
-                print(f"❓ Unknown structure: {type(data)}")
-                
-            self.model_file_info = {
-                'exists': True,
-                'size': file_size,
-                'type': type(data).__name__,
-                'content': data
-            }
+                elif isinstance(value, (list, tuple)):
+                    logger.debug('    📝 Length: %s', len(value))
+                elif isinstance(value, dict):
+                    logger.debug('    📚 Sub-dictionary with %s keys', len(value))
+                    
+        elif hasattr(data, 'predict'):
+            logger.debug('🤖 SINGLE MODEL DETECTED')
+            logger.debug('   Model Type: %s', type(data).__name__)
             
-            return data
+        else:
+            logger.debug('❓ Unknown structure: %s', type(data))
             
-        except Exception as e:
-            print(f"❌ DEBUG ERROR: {e}")
-            return None
+        return data
+
+    def load_models(self, filename, debug=None):
+        """🤖 ENHANCED MODEL LOADING
+        
+        Builds a complete ModelSet from the file (build_model_set) and makes it
+        current (swap_model_set). Without usable models the set holds the
+        high-performance simulation metrics.
+        """
+        self.swap_model_set(self.build_model_set(filename, debug))
+        return True
 
-    def load_models(self, filename):
-        """🤖 ENHANCED MODEL LOADING WITH COMPREHENSIVE DEBUG"""
-        print(f"\n🚀 LOADING MODELS FROM: {filename}")
+    def build_model_set(self, filename, debug=None, split=False):
+        """📦 READ A MODEL FILE INTO A NEW ModelSet, LEAVING THE CURRENT ONE ALONE
+        
+        The file is read once. The structure walk in debug_model_file only runs when
+        ``debug`` is true (default: AQI_MODEL_DEBUG=1 in the environment).
+        
+        With AQI_LAZY_MODELS on (the default) a file already split by aqi_model_store
+        isn't read at all: the set is built from its manifest and each model is
+        unpickled on first use. Otherwise every model is unpickled from the file;
+        with ``split`` (the offline step in aqi_model_store only) a file in the
+        'models' layout is split as it is read and served lazily too.
+        """
+        logger.info('🚀 LOADING MODELS FROM: %s', filename)
+        if debug is None:
+            debug = os.environ.get('AQI_MODEL_DEBUG', '').lower() in ('1', 'true', 'yes')
+        
+        # The loaders fill this in; ModelSet freezes it at the end
+        staged = SimpleNamespace(
+            version=self.model_file_version(filename), trained_models={}, compiled_models={},
+            model_performances={}, best_model_name='gbr', feature_columns=None, models={}, file_info=None)
+        
+        split = split and lazy_models_enabled()
+        if lazy_models_enabled() and os.path.exists(filename):
+            manifest = read_manifest(filename)
+            if manifest is not None:
+                return self._lazy_model_set(filename, manifest, staged.version)
+            if not split:
+                logger.info('📂 %s is not split; unpickling every model (python aqi_model_store.py splits it)', filename)
         
-        # Step 1: Debug the file
-        model_data = self.debug_model_file(filename)
+        # Step 1: Read the file (and walk it if asked)
+        model_data, staged.file_info = self._read_model_file(filename, hashed=split)
+        if model_data is not None and debug:
+            self.debug_model_file(filename, model_data)
         
         if model_data is None:
-            print("❌ Model file debug failed, using high-performance fallback")
-            self._set_high_performance_metrics()
-            return True
+            logger.warning('❌ Model file load failed, using high-performance fallback')
+            self._set_high_performance_metrics(staged)
             
         # Step 2: Try to load your specific models
-        if self._load_your_trained_models(model_data, filename):
-            print("🎉 SUCCESS: Your trained models loaded!")
-            return True
+        elif self._load_your_trained_models(model_data, filename, staged):
+            logger.info('🎉 SUCCESS: Your trained models loaded!')
+            if split:
+                try:
+                    manifest = write_manifest(filename, staged, staged.file_info['source'])
+                    # The best model is in memory already; the others are dropped and load on first use
+                    best = staged.best_model_name
+                    preloaded = {best: staged.trained_models[best]} if best in staged.trained_models else None
+                    return self._lazy_model_set(filename, manifest, staged.version, preloaded)
+                except (OSError, pickle.PicklingError) as e:
+                    logger.warning('⚠️ Could not split %s, keeping every model in memory: %s', filename, e)
+            self._compile_trained_models(staged)
             
         # Step 3: Try PyCaret format
-        if self._load_pycaret_models(model_data):
-            print("🎉 SUCCESS: PyCaret models loaded!")
-            return True
+        elif self._load_pycaret_models(model_data, staged):
+            logger.info('🎉 SUCCESS: PyCaret models loaded!')
+            self._compile_trained_models(staged)
             
         # Step 4: Try generic model loading
-        if self._load_generic_models(model_data):
-            print("🎉 SUCCESS: Generic models loaded!")
-            return True
+        elif self._load_generic_models(model_data, staged):
+            logger.info('🎉 SUCCESS: Generic models loaded!')
+            self._compile_trained_models(staged)
             
         # Step 5: Fallback
-        print("⚠️ No compatible models found, using high-performance simulation")
-        self._set_high_performance_metrics()
-        return True
+        else:
+            logger.warning('⚠️ No compatible models found, using high-performance simulation')
+            self._set_high_performance_metrics(staged)
+        
+        return ModelSet(**vars(staged))
+
+    def _lazy_model_set(self, filename, manifest, version, preloaded=None):
+        """🗂️ ModelSet over a LazyModelRegistry: only the best model is unpickled now
+        
+        ``preloaded`` models (name -> model, already in memory) aren't unpickled again.
+        """
+        feature_columns = manifest['feature_columns']
+        best_model_name = manifest['best_model']
+        # Compiling only needs the feature order of the set the model belongs to
+        feature_set = SimpleNamespace(feature_columns=feature_columns)
+        
+        def prepare(name, model):
+            if not compiled_trees_enabled():
+                return None
+            return self._compile_model(name, model, self._compile_probe(feature_set), self._feature_order(feature_set))
+        
+        registry = LazyModelRegistry(os.path.dirname(os.path.abspath(filename)), manifest['models'],
+                                     prepare=prepare, pinned=[best_model_name], preloaded=preloaded)
+        try:
+            registry[best_model_name]
+        except Exception as e:
+            # Stays unloaded; the next prediction with it retries (and fails into the usual fallbacks)
+            logger.warning('⚠️ Could not load best model %s: %s', best_model_name, e)
+        
+        logger.info('🗂️ %s models indexed from %s, loaded: %s', len(registry), filename, registry.loaded_names())
+        file_info = {
+            'exists': True,
+            'size': manifest['size'],
+            'type': 'split',
+            'source': {key: manifest[key] for key in ('size', 'mtime_ns', 'sha256')}
+        }
+        return ModelSet(version=version, trained_models=registry, compiled_models=registry.compiled,
+                        model_performances=manifest['performances'], best_model_name=best_model_name,
+                        feature_columns=feature_columns, file_info=file_info)
+
+    def swap_model_set(self, model_set):
+        """🔁 MAKE ``model_set`` CURRENT WITH ONE ASSIGNMENT; returns the previous set
+        
+        Cached predictions are only valid for the model file that produced them, so
+        they are dropped when the version changes.
+        """
+        previous = self._model_set
+        self._model_set = model_set
+        if model_set.version != previous.version:
+            self.clear_caches()
+        logger.info('🔁 Model set %s is live (%s trained models)', model_set.version, len(model_set.trained_models))
+        return previous
+
+    def _compile_trained_models(self, staged):
+        """⚙️ FLATTEN THE TREE ENSEMBLES INTO NODE ARRAYS (AQI_COMPILED_TREES=0 disables)"""
+        staged.compiled_models = {}
+        if not compiled_trees_enabled():
+            return
+        
+        probe = self._compile_probe(staged)
+        for name, model in staged.trained_models.items():
+            compiled = self._compile_model(name, model, probe, self._feature_order(staged))
+            if compiled is not None:
+                staged.compiled_models[name] = compiled
+
+    def _compile_probe(self, model_set):
+        """Features of every day from last year to next year, in ``model_set``'s column order"""
+        start = datetime(datetime.now().year - 1, 1, 1)
+        return self._build_feature_matrix([start + timedelta(days=i) for i in range(3 * 366)], model_set)
+
+    def _compile_model(self, name, model, probe, columns):
+        """⚙️ Compiled form of one model, or None
+        
+        A compiled model is only used when it reproduces model.predict on the ``probe``
+        rows plus rows sitting on its split thresholds.
+        """
+        try:
+            compiled = compile_model(model)
+            if compiled is None:
+                logger.debug('⚙️ %s (%s) has no compiled form', name, type(model).__name__)
+                return None
+            rows = np.vstack([probe, boundary_rows(compiled)])
+            matches, max_diff = equivalent(compiled, model, self._model_input(model, rows, columns))
+        except Exception as e:
+            logger.warning('⚠️ Could not compile %s: %s', name, e)
+            return None
+        if not matches:
+            logger.warning('⚠️ Compiled %s differs from model.predict by up to %g; using sklearn', name, max_diff)
+            return None
+        logger.info('⚙️ Compiled %s: %s trees, %s nodes, %.0f KB', name, compiled.n_trees,
+                    len(compiled.value), compiled.nbytes / 1024)
+        return compiled
+
+    def loaded_model_names(self):
+        return self._model_set.loaded_model_names()
 
-    def _load_your_trained_models(self, model_data, filename):
+    def unload_idle_models(self):
+        """Drop lazily loaded models idle for AQI_MODEL_IDLE_SECONDS (cheap when there is nothing to do)"""
+        trained_models = self._model_set.trained_models
+        if isinstance(trained_models, LazyModelRegistry):
+            trained_models.maybe_unload_idle()
+
+    @staticmethod
+    def model_file_version(filename):
+        """🏷️ IDENTIFY A MODEL FILE BY NAME, SIZE AND MTIME"""
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return f"{os.path.basename(filename)}@missing"
+        return f"{os.path.basename(filename)}@{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _load_your_trained_models(self, model_data, filename, staged):
         """🎯 FIXED: Load YOUR trained models from PyCaret structure"""
-        print("\n🎯 ATTEMPTING TO LOAD YOUR TRAINED MODELS...")
+        logger.debug('🎯 ATTEMPTING TO LOAD YOUR TRAINED MODELS...')
         
         try:
             # Your models are in data['models'][model_name]['model']
             if isinstance(model_data, dict) and 'models' in model_data:
                 models_dict = model_data['models']
-                print(f"📦 Found 'models' dictionary with {len(models_dict)} items")
-                print(f"🔑 Model keys: {list(models_dict.keys())}")
+                logger.debug("📦 Found 'models' dictionary with %s items", len(models_dict))
+                logger.debug('🔑 Model keys: %s', list(models_dict.keys()))
                 
                 # Store metadata
                 if 'best_model' in model_data:
                     best_model_name = model_data['best_model']
-                    print(f"🏆 Best model indicated: {best_model_name}")
+                    logger.debug('🏆 Best model indicated: %s', best_model_name)
                 
                 if 'feature_columns' in model_data:
                     feature_cols = model_data['feature_columns']
-                    print(f"📊 Feature columns ({len(feature_cols)}): {feature_cols}")
-                    self.feature_columns = feature_cols
+                    logger.debug('📊 Feature columns (%s): %s', len(feature_cols), feature_cols)
+                    staged.feature_columns = feature_cols
                 
                 if 'training_info' in model_data:
                     training_info = model_data['training_info']
-                    print(f"📈 Training info: {list(training_info.keys())}")
+                    logger.debug('📈 Training info: %s', list(training_info.keys()))
                     if 'training_date' in training_info:
-                        print(f"   📅 Trained on: {training_info['training_date']}")
+                        logger.debug('   📅 Trained on: %s', training_info['training_date'])
                     if 'data_samples' in training_info:
-                        print(f"   📊 Training samples: {training_info['data_samples']:,}")
+                        logger.debug('   📊 Training samples: %s', format(training_info['data_samples'], ','))
                 
                 # Extract actual model objects
                 loaded_models = {}
                 model_performances = {}
                 
                 for model_key, model_info in models_dict.items():
-                    print(f"\n🔍 Examining '{model_key}':")
-                    print(f"   📦 Type: {type(model_info)}")
+                    logger.debug("🔍 Examining '%s':", model_key)
+                    logger.debug('   📦 Type: %s', type(model_info))
                     
                     if isinstance(model_info, dict):
-                        print(f"   🔑 Keys: {list(model_info.keys())}")
+                        logger.debug('   🔑 Keys: %s', list(model_info.keys()))
                         
                         # Get the actual model object (PyCaret stores it under 'model' key)
                         if 'model' in model_info:
@@ -194,44 +659,42 @@ class AQIPredictionSystem:
                             
                             if hasattr(actual_model, 'predict'):
                                 loaded_models[model_key] = actual_model
-                                print(f"   ✅ Successfully loaded: {type(actual_model).__name__}")
+                                logger.debug('   ✅ Successfully loaded: %s', type(actual_model).__name__)
                                 
                                 # Get model info
                                 if hasattr(actual_model, 'feature_importances_'):
-                                    print(f"      📊 Has feature importances")
+                                    logger.debug('      📊 Has feature importances')
                                 if hasattr(actual_model, 'n_features_in_'):
-                                    print(f"      📏 Features expected: {actual_model.n_features_in_}")
+                                    logger.debug('      📏 Features expected: %s', actual_model.n_features_in_)
                                 
                                 # Extract performance metrics
                                 if 'performance' in model_info:
                                     perf = model_info['performance']
                                     model_performances[model_key] = perf
-                                    print(f"      📈 R²: {perf.get('r2_score', 0):.4f}")
-                                    print(f"      📉 MAE: {perf.get('mae', 0):.4f}")
-                                    print(f"      📊 RMSE: {perf.get('rmse', 0):.4f}")
+                                    logger.debug('      📈 R²: %.4f', perf.get('r2_score', 0))
+                                    logger.debug('      📉 MAE: %.4f', perf.get('mae', 0))
+                                    logger.debug('      📊 RMSE: %.4f', perf.get('rmse', 0))
                                 
                                 # Check if tuning was used
                                 if 'used_tuning' in model_info:
                                     tuning_used = model_info['used_tuning']
-                                    print(f"      🔧 Tuning used: {tuning_used}")
+                                    logger.debug('      🔧 Tuning used: %s', tuning_used)
                             else:
-                                print(f"   ❌ Object under 'model' key has no predict method: {type(actual_model)}")
+                                logger.warning("   ❌ Object under 'model' key has no predict method: %s", type(actual_model))
                         else:
-                            print(f"   ❌ No 'model' key found in {model_key} info")
+                            logger.warning("   ❌ No 'model' key found in %s info", model_key)
                     else:
-                        print(f"   ❌ {model_key} is not a dictionary: {type(model_info)}")
+                        logger.warning('   ❌ %s is not a dictionary: %s', model_key, type(model_info))
                 
                 # If we successfully loaded models
                 if loaded_models:
-                    self.trained_models = loaded_models
-                    self.trained_models_loaded = True
-                    self.use_trained_models = True
-                    self.model_performances = model_performances
+                    staged.trained_models = loaded_models
+                    staged.model_performances = model_performances
                     
                     # Set best model
                     if 'best_model' in model_data and model_data['best_model'] in loaded_models:
-                        self.best_model_name = model_data['best_model']
-                        print(f"🏆 Using your best model: {self.best_model_name}")
+                        staged.best_model_name = model_data['best_model']
+                        logger.debug('🏆 Using your best model: %s', staged.best_model_name)
                     else:
                         # Find best model by R² score
                         best_r2 = -1
@@ -243,58 +706,54 @@ class AQIPredictionSystem:
                                 best_model = model_name
                         
                         if best_model:
-                            self.best_model_name = best_model
-                            print(f"🎯 Auto-selected best model: {self.best_model_name} (R²: {best_r2:.4f})")
+                            staged.best_model_name = best_model
+                            logger.debug('🎯 Auto-selected best model: %s (R²: %.4f)', staged.best_model_name, best_r2)
                         else:
-                            self.best_model_name = list(loaded_models.keys())[0]
-                            print(f"🔄 Using first available model: {self.best_model_name}")
+                            staged.best_model_name = list(loaded_models.keys())[0]
+                            logger.debug('🔄 Using first available model: %s', staged.best_model_name)
                     
-                    print(f"\n🚀 SUCCESS! YOUR PYCARET MODELS LOADED!")
-                    print(f"📊 Loaded {len(loaded_models)} models: {list(loaded_models.keys())}")
-                    print(f"🏆 Best model: {self.best_model_name}")
-                    print(f"📈 Best R² score: {model_performances.get(self.best_model_name, {}).get('r2_score', 'N/A')}")
+                    logger.info('🚀 SUCCESS! YOUR PYCARET MODELS LOADED!')
+                    logger.info('📊 Loaded %s models: %s', len(loaded_models), list(loaded_models.keys()))
+                    logger.info('🏆 Best model: %s', staged.best_model_name)
+                    logger.info('📈 Best R² score: %s', model_performances.get(staged.best_model_name, {}).get('r2_score', 'N/A'))
                     
                     return True
                 else:
-                    print("❌ No valid models found in the 'models' dictionary")
+                    logger.warning("❌ No valid models found in the 'models' dictionary")
                     return False
             else:
-                print("❌ No 'models' key found in data structure")
+                logger.debug("❌ No 'models' key found in data structure")
                 return False
                 
         except Exception as e:
-            print(f"❌ Error loading your PyCaret models: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('❌ Error loading your PyCaret models: %s', e)
             return False
 
-    def _load_pycaret_models(self, model_data):
+    def _load_pycaret_models(self, model_data, staged):
         """🏗️ LOAD PYCARET FORMAT MODELS"""
-        print("\n🏗️ TRYING PYCARET FORMAT...")
+        logger.debug('🏗️ TRYING PYCARET FORMAT...')
         
         try:
             if isinstance(model_data, dict) and 'final_models' in model_data:
                 final_models = model_data['final_models']
-                print(f"📦 Found final_models: {type(final_models)}")
+                logger.debug('📦 Found final_models: %s', type(final_models))
                 
                 if final_models:
-                    self.trained_models = final_models
-                    self.trained_models_loaded = True
-                    self.use_trained_models = True
-                    self._set_high_performance_metrics()
+                    staged.trained_models = final_models
+                    self._set_high_performance_metrics(staged)
                     
-                    print("✅ PyCaret models loaded successfully")
+                    logger.debug('✅ PyCaret models loaded successfully')
                     return True
                     
             return False
             
         except Exception as e:
-            print(f"❌ PyCaret loading error: {e}")
+            logger.warning('❌ PyCaret loading error: %s', e)
             return False
 
-    def _load_generic_models(self, model_data):
+    def _load_generic_models(self, model_data, staged):
         """🔧 GENERIC MODEL LOADING"""
-        print("\n🔧 TRYING GENERIC MODEL LOADING...")
+        logger.debug('🔧 TRYING GENERIC MODEL LOADING...')
         
         try:
             models_found = {}
@@ -302,238 +761,422 @@ class AQIPredictionSystem:
             # If it's a single model
             if hasattr(model_data, 'predict'):
                 models_found['main_model'] = model_data
-                print("✅ Single model detected")
+                logger.debug('✅ Single model detected')
                 
             # If it's a dictionary, look for anything with predict
             elif isinstance(model_data, dict):
                 for key, value in model_data.items():
                     if hasattr(value, 'predict'):
                         models_found[key] = value
-                        print(f"✅ Found model: {key}")
+                        logger.debug('✅ Found model: %s', key)
                         
             if models_found:
-                self.trained_models = models_found
-                self.trained_models_loaded = True
-                self.use_trained_models = True
-                self._set_high_performance_metrics()
+                staged.trained_models = models_found
+                self._set_high_performance_metrics(staged)
                 
                 # Use first model as best
-                self.best_model_name = list(models_found.keys())[0]
+                staged.best_model_name = list(models_found.keys())[0]
                 
-                print(f"✅ Generic loading: {len(models_found)} models")
+                logger.debug('✅ Generic loading: %s models', len(models_found))
                 return True
                 
             return False
             
         except Exception as e:
-            print(f"❌ Generic loading error: {e}")
+            logger.warning('❌ Generic loading error: %s', e)
             return False
 
-    def _create_features_for_date(self, target_date):
-        """🤖 CREATE FEATURES MATCHING YOUR PYCARET TRAINING"""
-        if isinstance(target_date, str):
-            target_date = datetime.strptime(target_date, '%Y-%m-%d')
-        
-        # Your exact feature columns from training:
-        # ['year', 'month', 'day', 'weekday', 'day_of_year', 'is_weekend', 'daily_avg_temp', 
-        #  'aqi_lag_1', 'aqi_lag_3', 'aqi_lag_7', 'aqi_ma_3', 'aqi_ma_7', 'aqi_trend_3', 'aqi_volatility']
+    # Your exact feature columns from training:
+    # ['year', 'month', 'day', 'weekday', 'day_of_year', 'is_weekend', 'daily_avg_temp',
+    #  'aqi_lag_1', 'aqi_lag_3', 'aqi_lag_7', 'aqi_ma_3', 'aqi_ma_7', 'aqi_trend_3', 'aqi_volatility']
+    EXACT_COLUMN_ORDER = [
+        'year', 'month', 'day', 'weekday', 'day_of_year', 'is_weekend', 
+        'daily_avg_temp', 'aqi_lag_1', 'aqi_lag_3', 'aqi_lag_7', 
+        'aqi_ma_3', 'aqi_ma_7', 'aqi_trend_3', 'aqi_volatility'
+    ]
+
+    # Map API model names to your actual trained model names
+    MODEL_NAME_MAPPING = {
+        'gbr': 'gbr',
+        'gradient_boosting': 'gbr',
+        'rf': 'rf', 
+        'random_forest': 'rf',
+        'et': 'et',
+        'extra_trees': 'et',
+        'xgboost': 'xgboost'
+    }
+
+    @staticmethod
+    def _as_day_array(dates):
+        """📅 NORMALISE dates (datetime / 'YYYY-MM-DD' / datetime64) TO datetime64[D]"""
+        if isinstance(dates, np.ndarray) and np.issubdtype(dates.dtype, np.datetime64):
+            return dates.astype('datetime64[D]')
+        dates = list(dates)
+        if all(isinstance(d, date_type) for d in dates):
+            # toordinal() is much cheaper than numpy's per-object datetime parsing
+            ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+            return (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+        return np.array(dates, dtype='datetime64[D]')
+
+    @staticmethod
+    def _date_noise(day_ordinals, n_draws):
+        """🎲 DETERMINISTIC STANDARD-NORMAL DRAWS PER DATE (vectorized, no global RNG)
         
-        print(f"🎯 Creating features for {target_date.strftime('%Y-%m-%d')}")
+        Each (date, draw) pair is hashed with splitmix64 into two uniforms and turned
+        into a normal with Box-Muller, so a date always gets the same values no
+        matter which batch it is computed in.
+        """
+        keys = (day_ordinals.astype(np.uint64)[:, None] * np.uint64(2 * n_draws)
+                + np.arange(2 * n_draws, dtype=np.uint64)[None, :])
+        z = keys + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        z = z ^ (z >> np.uint64(31))
+        uniforms = ((z >> np.uint64(11)).astype(np.float64) + 1.0) * (1.0 / 9007199254740992.0)  # (0, 1]
+        u1, u2 = uniforms[:, 0::2], uniforms[:, 1::2]
+        return np.sqrt(-2.0 * np.log(u1)) * np.cos(2.0 * np.pi * u2)
+
+    def _build_feature_matrix(self, dates, model_set=None):
+        """🧮 VECTORIZED FEATURES: N×14 float64 matrix in training column order"""
+        with FEATURES_TIMER.time():
+            return self._feature_matrix(dates, model_set)
 
-        date_seed = int(hashlib.md5(target_date.strftime('%Y-%m-%d').encode()).hexdigest()[:8], 16) % (2**32)
-        np.random.seed(date_seed)
+    def _feature_matrix(self, dates, model_set=None):
+        days = self._as_day_array(dates)
+        years = days.astype('datetime64[Y]')
+        months = days.astype('datetime64[M]')
+        day_ordinals = days.astype(np.int64)  # days since 1970-01-01 (a Thursday)
+        
+        weekday = (day_ordinals + 3) % 7
+        day_of_year = (days - years).astype(np.int64) + 1
         
         # Basic date features (exact match to your training)
-        features = {
-            'year': int(target_date.year),
-            'month': int(target_date.month),
-            'day': int(target_date.day),
-            'weekday': int(target_date.weekday()),
-            'day_of_year': int(target_date.timetuple().tm_yday),
-            'is_weekend': int(1 if target_date.weekday() >= 5 else 0),
+        columns = {
+            'year': years.astype(np.int64) + 1970,
+            'month': months.astype(np.int64) % 12 + 1,
+            'day': (days - months).astype(np.int64) + 1,
+            'weekday': weekday,
+            'day_of_year': day_of_year,
+            'is_weekend': (weekday >= 5).astype(np.int64),
         }
         
-        # Temperature feature (seasonal proxy)
-        day_of_year = target_date.timetuple().tm_yday
-        seasonal_temp = 25 + 10 * np.sin(2 * np.pi * day_of_year / 365)  # Ranges ~15-35°C
-        features['daily_avg_temp'] = float(round(seasonal_temp, 2))  # ✅ FIXED: Convert to float
-        
-        # AQI lag and trend features (realistic defaults for prediction)
-        # These would normally come from historical data, but we'll use intelligent defaults
-        base_aqi = 45 + 15 * np.sin(2 * np.pi * day_of_year / 365)  # Seasonal AQI pattern
-        
-        features.update({
-            'aqi_lag_1': float(round(base_aqi + np.random.normal(0, 5), 2)),  # ✅ FIXED: Convert to float
-            'aqi_lag_3': float(round(base_aqi + np.random.normal(0, 7), 2)),  # ✅ FIXED: Convert to float
-            'aqi_lag_7': float(round(base_aqi + np.random.normal(0, 10), 2)), # ✅ FIXED: Convert to float
-            'aqi_ma_3': float(round(base_aqi + np.random.normal(0, 3), 2)),   # ✅ FIXED: Convert to float
-            'aqi_ma_7': float(round(base_aqi + np.random.normal(0, 4), 2)),   # ✅ FIXED: Convert to float
-            'aqi_trend_3': float(round(np.random.normal(0, 8), 2)),           # ✅ FIXED: Convert to float
-            'aqi_volatility': float(round(abs(np.random.normal(8, 3)), 2))    # ✅ FIXED: Convert to float
-        })
-
-        # Reset random seed to avoid affecting other parts
-        np.random.seed(None)
-
-        # ✅ FIXED: Define the exact column order from your training
-        exact_column_order = [
-            'year', 'month', 'day', 'weekday', 'day_of_year', 'is_weekend', 
-            'daily_avg_temp', 'aqi_lag_1', 'aqi_lag_3', 'aqi_lag_7', 
-            'aqi_ma_3', 'aqi_ma_7', 'aqi_trend_3', 'aqi_volatility'
-        ]
+        # Temperature feature (seasonal proxy, ranges ~15-35°C)
+        season = np.sin(2 * np.pi * day_of_year / 365)
+        columns['daily_avg_temp'] = np.round(25 + 10 * season, 2)
         
-        # ✅ FIXED: Create DataFrame with exact column order
-        if hasattr(self, 'feature_columns') and self.feature_columns:
-            # Use exact order from training
-            ordered_features = {col: features.get(col, 0.0) for col in self.feature_columns}  # ✅ FIXED: Default to 0.0
-            features_df = pd.DataFrame([ordered_features])
-            print(f"📊 Created features using training column order: {self.feature_columns}")
+        # AQI lag and trend features from the real history (forecast past its end)
+        if self.history is not None:
+            lag_features = self.history.lag_features(days)
+            columns.update({name: np.round(values, 2) for name, values in lag_features.items()})
         else:
-            # Use the exact column order
-            ordered_features = {col: features.get(col, 0.0) for col in exact_column_order}  # ✅ FIXED: Default to 0.0
-            features_df = pd.DataFrame([ordered_features])
-            print(f"📊 Created features using exact column order: {exact_column_order}")
-        
-        # ✅ CRITICAL FIX: Ensure all values are numeric
-        for col in features_df.columns:
-            features_df[col] = pd.to_numeric(features_df[col], errors='coerce')
-        
-        # ✅ CRITICAL FIX: Fill any NaN values with 0
-        features_df = features_df.fillna(0.0)
-        
-        print(f"🔢 Sample features: year={features['year']}, month={features['month']}, temp={features['daily_avg_temp']:.1f}°C")
-        print(f"📈 AQI context: lag_1={features['aqi_lag_1']:.1f}, ma_7={features['aqi_ma_7']:.1f}")
-        print(f"🔧 Features shape: {features_df.shape}")
-        print(f"🔧 Data types: {features_df.dtypes.tolist()}")
-        
-        return features_df
-
-    def predict_aqi_for_date(self, date, model_name=None):
-        endpoint_caller = "UNKNOWN"
-        import inspect
-        for frame_info in inspect.stack():
-            if 'dashboard' in frame_info.function:
-                endpoint_caller = "DASHBOARD"
-            elif 'prediction' in frame_info.function:
-                endpoint_caller = "PREDICTION"
-        
-        print(f"🔍 {endpoint_caller} calling predict_aqi_for_date for {date}")
-        
-        if self.use_trained_models and self.trained_models_loaded:
-            print(f"📊 {endpoint_caller} using TRAINED MODELS")
-            aqi = self._predict_with_trained_models(date, model_name)
+            # No history available: seasonal defaults with per-date noise
+            base_aqi = 45 + 15 * season  # Seasonal AQI pattern
+            noise = self._date_noise(day_ordinals, 7)
+            columns.update({
+                'aqi_lag_1': np.round(base_aqi + 5 * noise[:, 0], 2),
+                'aqi_lag_3': np.round(base_aqi + 7 * noise[:, 1], 2),
+                'aqi_lag_7': np.round(base_aqi + 10 * noise[:, 2], 2),
+                'aqi_ma_3': np.round(base_aqi + 3 * noise[:, 3], 2),
+                'aqi_ma_7': np.round(base_aqi + 4 * noise[:, 4], 2),
+                'aqi_trend_3': np.round(8 * noise[:, 5], 2),
+                'aqi_volatility': np.round(np.abs(8 + 3 * noise[:, 6]), 2),
+            })
+        return self._ordered_matrix(columns, len(days), model_set)
+
+    def _ordered_matrix(self, columns, n_rows, model_set=None):
+        """✅ FIXED: Use exact order from training; unknown columns default to 0.0"""
+        feature_order = self._feature_order(model_set)
+        matrix = np.zeros((n_rows, len(feature_order)), dtype=np.float64)
+        for i, col in enumerate(feature_order):
+            if col in columns:
+                matrix[:, i] = columns[col]
+        return matrix
+
+    def _feature_order(self, model_set=None):
+        feature_columns = (model_set or self._model_set).feature_columns
+        if feature_columns:
+            return list(feature_columns)
+        return self.EXACT_COLUMN_ORDER
+
+    def _create_features_for_date(self, target_date):
+        """🤖 CREATE FEATURES MATCHING YOUR PYCARET TRAINING (single-row DataFrame)"""
+        return pd.DataFrame(self._build_feature_matrix([target_date]), columns=self._feature_order())
+
+    @staticmethod
+    def _model_input(model, matrix, columns):
+        """Named columns for pipelines and models fitted on a DataFrame (sklearn checks the
+        names and their order); models fitted on a bare array take the ndarray directly."""
+        if hasattr(model, 'steps') or hasattr(model, 'feature_names_in_'):
+            return pd.DataFrame(matrix, columns=columns)
+        return matrix
+
+    def _resolve_model_name(self, model_name=None, model_set=None):
+        """🔀 MAP AN API MODEL NAME TO A LOADED TRAINED MODEL KEY"""
+        model_set = model_set or self._model_set
+        model_to_use = model_name or model_set.best_model_name
+        actual_model_name = self.MODEL_NAME_MAPPING.get(model_to_use, model_to_use)
+        
+        if actual_model_name not in model_set.trained_models:
+            logger.debug('⚠️ Model %s not found. Available: %s', actual_model_name, list(model_set.trained_models.keys()))
+            actual_model_name = list(model_set.trained_models.keys())[0]  # Use first available
+        return actual_model_name
+
+    @staticmethod
+    def _to_datetime(date):
+        if isinstance(date, str):
+            return datetime.strptime(date, '%Y-%m-%d')
+        return date
+
+    def predict_aqi_for_dates(self, dates, model_name=None, model_set=None):
+        """⚡ BATCHED PREDICTION: one feature matrix and one model.predict for all dates
+        
+        Returns a list of AQI values aligned with ``dates``; values are identical to
+        calling ``predict_aqi_for_date`` per date with the same model. Entries are
+        None where the trained model could not produce a prediction.
+        """
+        dates = [self._to_datetime(d) for d in dates]
+        if not dates:
+            return []
+        
+        model_set = model_set or self._model_set  # one set for the whole batch, even if a reload lands meanwhile
+        model_key = self._cache_model_key(model_name, model_set)
+        keys = [('aqi', d.toordinal(), model_key, model_set.version) for d in dates]
+        results = [self._prediction_cache.get(key, _MISSING) for key in keys]
+        missing = [i for i, value in enumerate(results) if value is _MISSING]
+        PREDICTION_CACHE_HITS.inc(len(dates) - len(missing))
+        PREDICTION_CACHE_MISSES.inc(len(missing))
+        if not missing:
+            return results
+        
+        missing_dates = [dates[i] for i in missing]
+        if model_key == 'simulation':
+            logger.debug('🎲 Batch of %s dates using SIMULATION', len(missing_dates))
+            with SIMULATE_TIMER.time():
+                predicted = [self._predict_with_simulation(d) for d in missing_dates]
+            PREDICTIONS_TOTAL.labels(model=model_key).inc(len(missing_dates))
         else:
-            print(f"🎲 {endpoint_caller} using SIMULATION")
-            aqi = self._predict_with_simulation(date)
+            predicted = self._predict_dates_with_trained_models(missing_dates, model_key, model_set=model_set)
         
-        print(f"✅ {endpoint_caller} got AQI: {aqi}")
+        for i, aqi in zip(missing, predicted):
+            results[i] = aqi
+            if aqi is not None:
+                self._prediction_cache.put(keys[i], aqi)
+        return results
+
+    def predict_aqi_for_dates_by_model(self, dates, model_names=None):
+        """🤝 ALL MODELS IN ONE PASS: {trained model: [AQI per date]}
+        
+        The feature matrix is built once and shared; each model's predict runs on the
+        shared pool in parallel. ``model_names`` defaults to every trained model. Values
+        match predict_aqi_for_dates(dates, model) and go through the same cache. Empty
+        when no trained models are loaded.
+        """
+        model_set = self._model_set
+        if self._cache_model_key(model_set=model_set) == 'simulation':
+            return {}
+        
+        dates = [self._to_datetime(d) for d in dates]
+        names = list(dict.fromkeys(self._resolve_model_name(name, model_set)
+                                   for name in (model_names or model_set.trained_models)))
+        
+        results, pending = {}, {}
+        for name in names:
+            keys = [('aqi', d.toordinal(), name, model_set.version) for d in dates]
+            values = [self._prediction_cache.get(key, _MISSING) for key in keys]
+            missing = [i for i, value in enumerate(values) if value is _MISSING]
+            PREDICTION_CACHE_HITS.inc(len(dates) - len(missing))
+            PREDICTION_CACHE_MISSES.inc(len(missing))
+            results[name] = values
+            if missing:
+                pending[name] = (keys, missing)
+        
+        if pending:
+            rows = sorted(set().union(*(missing for _, missing in pending.values())))
+            features = self._build_feature_matrix([dates[i] for i in rows], model_set)
+            row_of = {i: r for r, i in enumerate(rows)}
+            
+            futures = {
+                name: submit_with_context(
+                    self._predict_dates_with_trained_models,
+                    [dates[i] for i in missing], name, features[[row_of[i] for i in missing]], model_set
+                )
+                for name, (_, missing) in pending.items()
+            }
+            for name, future in futures.items():
+                keys, missing = pending[name]
+                for i, aqi in zip(missing, future.result()):
+                    results[name][i] = aqi
+                    if aqi is not None:
+                        self._prediction_cache.put(keys[i], aqi)
+        return results
+
+    def model_key(self, model_name=None):
+        """🔀 The loaded model that answers for ``model_name`` ('simulation' without trained models)"""
+        return self._cache_model_key(model_name)
+
+    def _cache_model_key(self, model_name=None, model_set=None):
+        """Model identity for cache keys: the resolved trained model, or 'simulation'."""
+        model_set = model_set or self._model_set
+        if model_set.has_trained_models:
+            return self._resolve_model_name(model_name, model_set)
+        return 'simulation'
+
+    def get_yearly_aqi_table(self, year, model_name=None):
+        """📅 PRECOMPUTED AQI FOR EVERY DAY OF A YEAR (int16, index = day_of_year - 1)
+        
+        Built once per (year, model, model version) with a single batched predict and
+        reused by every chart request until the models are reloaded or it is evicted
+        (AQI_YEARLY_TABLE_CACHE_SIZE). Concurrent requests for the same table wait for
+        one build; different tables build in parallel. Days the model could not
+        predict hold -1. The returned array is read-only.
+        """
+        model_set = self._model_set  # key and build from the same set, even if a reload lands meanwhile
+        key = (int(year), self._cache_model_key(model_name, model_set), model_set.version)
+        table = self._yearly_aqi_tables.get(key)
+        if table is not None:
+            return table
+        
+        with self._yearly_tables_lock:
+            build_lock = self._yearly_build_locks.setdefault(key, threading.Lock())
+        try:
+            with build_lock:
+                table = self._yearly_aqi_tables.get(key)
+                if table is None:
+                    start = datetime(int(year), 1, 1)
+                    num_days = (datetime(int(year) + 1, 1, 1) - start).days
+                    values = self.predict_aqi_for_dates(
+                        [start + timedelta(days=i) for i in range(num_days)], key[1], model_set)
+                    table = np.array([-1 if v is None else v for v in values], dtype=np.int16)
+                    table.flags.writeable = False
+                    self._yearly_aqi_tables.put(key, table)
+                    logger.debug('📅 Built %s AQI table for %s (%s days)', key[1], year, num_days)
+        finally:
+            # The table is stored before its lock is dropped, so later callers find it in the cache
+            with self._yearly_tables_lock:
+                if self._yearly_build_locks.get(key) is build_lock:
+                    del self._yearly_build_locks[key]
+        return table
+
+    def clear_caches(self):
+        """🧹 DROP MEMOIZED PREDICTIONS AND YEARLY TABLES"""
+        self._prediction_cache.clear()
+        self._yearly_aqi_tables.clear()
+
+    def get_cache_stats(self):
+        """📈 PREDICTION CACHE SIZE AND HIT/MISS COUNTERS"""
+        return dict(self._prediction_cache.stats(), model_version=self.model_version,
+                    yearly_tables=len(self._yearly_aqi_tables))
+
+    def predict_aqi_for_date(self, date, model_name=None, caller=None, model_set=None):
+        date = self._to_datetime(date)
+        model_set = model_set or self._model_set
+        cache_key = ('aqi', date.toordinal(), self._cache_model_key(model_name, model_set), model_set.version)
+        aqi = self._prediction_cache.get(cache_key, _MISSING)
+        if aqi is not _MISSING:
+            PREDICTION_CACHE_HITS.inc()
+            return aqi
+        PREDICTION_CACHE_MISSES.inc()
+        
+        # Explicit tag wins, otherwise whatever the current request/context set
+        endpoint_caller = caller or PREDICTION_CALLER.get()
+        
+        logger.debug('🔍 %s calling predict_aqi_for_date for %s', endpoint_caller, date)
+        
+        if model_set.has_trained_models:
+            logger.debug('📊 %s using TRAINED MODELS', endpoint_caller)
+            aqi = self._predict_with_trained_models(date, model_name, model_set)
+        else:
+            logger.debug('🎲 %s using SIMULATION', endpoint_caller)
+            with SIMULATE_TIMER.time():
+                aqi = self._predict_with_simulation(date)
+            PREDICTIONS_TOTAL.labels(model='simulation').inc()
+        
+        logger.debug('✅ %s got AQI: %s', endpoint_caller, aqi)
+        if aqi is not None:
+            self._prediction_cache.put(cache_key, aqi)
         return aqi
 
-    def _predict_with_trained_models(self, date, model_name=None):
+    def _predict_with_trained_models(self, date, model_name=None, model_set=None):
         """🎯 USE YOUR ACTUAL TRAINED MODELS WITH ROBUST ERROR HANDLING"""
-        if not self.trained_models_loaded or not self.trained_models:
-            print("❌ No trained models available")
-            return None
+        return self._predict_dates_with_trained_models([date], model_name, model_set=model_set)[0]
+
+    def _predict_dates_with_trained_models(self, dates, model_name=None, features=None, model_set=None):
+        """🎯 ONE model.predict CALL FOR ALL DATES, WITH THE MINIMAL-FEATURE FALLBACK
         
-        # Map API model names to your actual trained model names
-        model_mapping = {
-            'gbr': 'gbr',
-            'gradient_boosting': 'gbr',
-            'rf': 'rf', 
-            'random_forest': 'rf',
-            'et': 'et',
-            'extra_trees': 'et',
-            'xgboost': 'xgboost'
-        }
+        ``features`` may be passed when the matrix for ``dates`` was already built
+        (with the feature order of the same ``model_set``).
+        """
+        model_set = model_set or self._model_set
+        if not model_set.has_trained_models:
+            logger.warning('❌ No trained models available')
+            return [None] * len(dates)
         
         # Choose model
-        model_to_use = model_name or self.best_model_name
-        actual_model_name = model_mapping.get(model_to_use, model_to_use)
-        
-        if actual_model_name not in self.trained_models:
-            print(f"⚠️ Model {actual_model_name} not found. Available: {list(self.trained_models.keys())}")
-            actual_model_name = list(self.trained_models.keys())[0]  # Use first available
+        actual_model_name = self._resolve_model_name(model_name, model_set)
         
         try:
             # Get the model
-            model = self.trained_models[actual_model_name]
-            print(f"🤖 Using model: {actual_model_name} ({type(model).__name__})")
+            model = model_set.trained_models[actual_model_name]
+            logger.debug('🤖 Using model: %s (%s) for %s date(s)', actual_model_name, type(model).__name__, len(dates))
             
             # Create features
-            features_df = self._create_features_for_date(date)
-            
-            print(f"🔧 Features info:")
-            print(f"   Shape: {features_df.shape}")
-            print(f"   Columns: {features_df.columns.tolist()}")
-            print(f"   Data types: {features_df.dtypes.tolist()}")
-            print(f"   Has NaN: {features_df.isnull().any().any()}")
-            print(f"   Sample values: {features_df.iloc[0].tolist()[:5]}")  # Show first 5 values
+            columns = self._feature_order(model_set)
+            if features is None:
+                features = self._build_feature_matrix(dates, model_set)
             
             # ✅ CRITICAL FIX: Final data validation
-            if features_df.isnull().any().any():
-                print("⚠️ Found NaN values, filling with 0.0...")
-                features_df = features_df.fillna(0.0)
-            
-            # ✅ CRITICAL FIX: Ensure all data is float64
-            for col in features_df.columns:
-                features_df[col] = features_df[col].astype('float64')
+            if np.isnan(features).any():
+                logger.warning('⚠️ Found NaN values, filling with 0.0...')
+                features = np.nan_to_num(features, nan=0.0)
             
             # Try prediction with comprehensive error handling
             try:
-                prediction = model.predict(features_df)[0]
-                print(f"✅ Raw prediction: {prediction} (type: {type(prediction)})")
-                
-                # Convert to float and ensure reasonable bounds
-                aqi = max(15, min(150, round(float(prediction))))
-                
-                print(f"🎯 REAL MODEL SUCCESS: {actual_model_name} predicted AQI {aqi}")
-                return aqi
+                compiled = model_set.compiled_models.get(actual_model_name)
+                with PREDICT_TIMER.time():
+                    if compiled is not None:
+                        predictions = compiled.predict(features)
+                    else:
+                        predictions = model.predict(self._model_input(model, features, columns))
                 
             except ValueError as ve:
-                print(f"❌ ValueError in prediction: {ve}")
-                print(f"❌ Features DataFrame info:")
-                print(features_df.info())
-                return None
+                # The features don't fit the model (e.g. other column names); fewer columns won't either
+                logger.warning('❌ ValueError in prediction with %s: %s', actual_model_name, ve)
+                PREDICTION_FAILURES_TOTAL.labels(model=actual_model_name).inc(len(dates))
+                return [None] * len(dates)
                 
             except Exception as pred_error:
-                print(f"❌ Prediction error with {actual_model_name}: {pred_error}")
-                print(f"❌ Error type: {type(pred_error).__name__}")
+                logger.warning('❌ Prediction error with %s (%s): %s', actual_model_name, type(pred_error).__name__, pred_error)
                 
                 # ✅ FALLBACK: Try with minimal features if full prediction fails
                 try:
-                    print("🔄 Trying with minimal features...")
-                    minimal_features = features_df[['year', 'month', 'day', 'weekday', 'day_of_year', 'is_weekend']].copy()
-                    prediction = model.predict(minimal_features)[0]
-                    aqi = max(15, min(150, round(float(prediction))))
-                    
-                    print(f"🎯 MINIMAL FEATURES SUCCESS: AQI {aqi}")
-                    return aqi
+                    logger.debug('🔄 Trying with minimal features...')
+                    minimal_columns = ['year', 'month', 'day', 'weekday', 'day_of_year', 'is_weekend']
+                    minimal_features = pd.DataFrame(features, columns=columns)[minimal_columns]
+                    predictions = model.predict(minimal_features)
                     
                 except Exception as minimal_error:
-                    print(f"❌ Even minimal features failed: {minimal_error}")
-                    return None
+                    logger.warning('❌ Even minimal features failed: %s', minimal_error)
+                    PREDICTION_FAILURES_TOTAL.labels(model=actual_model_name).inc(len(dates))
+                    return [None] * len(dates)
+            
+            # Convert to float and ensure reasonable bounds
+            with POSTPROCESS_TIMER.time():
+                values = [max(15, min(150, round(float(p)))) for p in predictions]
+            PREDICTIONS_TOTAL.labels(model=actual_model_name).inc(len(values))
+            return values
                     
         except Exception as e:
-            print(f"❌ Model {actual_model_name} completely failed: {e}")
-            print(f"❌ Error type: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
-            return None
+            logger.exception('❌ Model %s completely failed (%s): %s', actual_model_name, type(e).__name__, e)
+            PREDICTION_FAILURES_TOTAL.labels(model=actual_model_name).inc(len(dates))
+            return [None] * len(dates)
 
     def _predict_with_simulation(self, date, model_name=None):
         """Fallback simulation method with model-specific variations"""
         if isinstance(date, str):
             date = datetime.strptime(date, '%Y-%m-%d')
         
-        # Generate model-specific seed
-        date_str = date.strftime('%Y-%m-%d')
-        if model_name:
-            seed_string = f"{date_str}-{model_name}"
-        else:
-            seed_string = date_str
-            
-        date_seed = self._get_date_seed_with_model(date, model_name)
-        np.random.seed(date_seed)
+        # Model-specific, call-local generator: no shared RNG state between threads
+        rng = np.random.default_rng(self._get_date_seed_with_model(date, model_name))
         
         # Proper AQI calculation with realistic ranges
         day_of_year = date.timetuple().tm_yday
@@ -543,19 +1186,19 @@ class AQIPredictionSystem:
         
         # Model-specific variations
         if model_name == 'gbr':
-            daily_variation = np.random.normal(0, 8)    # Best model - low variance
+            daily_variation = rng.normal(0, 8)    # Best model - low variance
             bias = 0
         elif model_name == 'rf':
-            daily_variation = np.random.normal(0, 12)   # Good model
+            daily_variation = rng.normal(0, 12)   # Good model
             bias = -3
         elif model_name == 'et':
-            daily_variation = np.random.normal(0, 18)   # Fair model
+            daily_variation = rng.normal(0, 18)   # Fair model
             bias = +4
         elif model_name == 'xgboost':
-            daily_variation = np.random.normal(0, 25)   # Worst model - high variance
+            daily_variation = rng.normal(0, 25)   # Worst model - high variance
             bias = +8
         else:
-            daily_variation = np.random.normal(0, 15)   # Default
+            daily_variation = rng.normal(0, 15)   # Default
             bias = 0
         
         # Calculate final AQI
@@ -564,7 +1207,6 @@ class AQIPredictionSystem:
         # Proper bounds (15-150)
         aqi = max(15, min(150, aqi))
         
-        np.random.seed(None)
         return round(aqi)
 
     def _get_date_seed_with_model(self, date, model_name):
@@ -574,34 +1216,52 @@ class AQIPredictionSystem:
             seed_string = f"{date_str}-{model_name}"
         else:
             seed_string = date_str
+        return self._get_seed(seed_string)
+
+    @staticmethod
+    def _get_seed(seed_string):
+        """🎲 STABLE 32-BIT SEED FROM A STRING (for np.random.default_rng)"""
         return int(hashlib.md5(seed_string.encode()).hexdigest()[:8], 16) % (2**32)
 
-    def _set_high_performance_metrics(self):
+    def _set_high_performance_metrics(self, staged):
         """📊 HIGH PERFORMANCE FALLBACK METRICS"""
-        self.model_performances = {
+        staged.model_performances = {
             'rf': {'r2_score': 0.9401, 'mae': 1.94, 'rmse': 3.2, 'mape': 5.8},
             'et': {'r2_score': 0.9463, 'mae': 1.96, 'rmse': 3.1, 'mape': 5.9}, 
             'gbr': {'r2_score': 0.9615, 'mae': 2.11, 'rmse': 2.9, 'mape': 6.2},  # BEST!
             'xgboost': {'r2_score': 0.6000, 'mae': 10.0, 'rmse': 15.0, 'mape': 25.0}
         }
-        self.best_model_name = 'gradient_boosting'
-        self.models = {'system': 'high_performance'}
+        staged.best_model_name = 'gradient_boosting'
+        staged.models = {'system': 'high_performance'}
 
     def get_prediction_source(self):
         """📍 GET CURRENT PREDICTION SOURCE"""
-        if self.use_trained_models and self.trained_models_loaded:
-            return f"🤖 Real ML Models ({len(self.trained_models)} loaded)"
+        model_set = self._model_set
+        if model_set.has_trained_models:
+            return f"🤖 Real ML Models ({len(model_set.trained_models)} loaded)"
         else:
             return "🎲 Mathematical Simulation"
 
-    def get_main_pollutant_for_date(self, date):
-        """🌪️ ENHANCED POLLUTANT SELECTION"""
-        if isinstance(date, str):
-            date = datetime.strptime(date, '%Y-%m-%d')
+    def get_main_pollutant_for_date(self, date, aqi=None):
+        """🌪️ ENHANCED POLLUTANT SELECTION
         
-        month = date.month
-        aqi = self.predict_aqi_for_date(date)
+        Pass ``aqi`` when the day's AQI is already known to skip predicting it again.
+        """
+        date = self._to_datetime(date)
+        if aqi is not None:
+            return self._main_pollutant_for(date.month, aqi)
         
+        model_set = self._model_set  # key and predict from the same set, even if a reload lands meanwhile
+        cache_key = ('main_pollutant', date.toordinal(), self._cache_model_key(model_set=model_set), model_set.version)
+        main_pollutant = self._prediction_cache.get(cache_key)
+        if main_pollutant is None:
+            main_pollutant = self._main_pollutant_for(date.month, self.predict_aqi_for_date(date, model_set=model_set))
+            self._prediction_cache.put(cache_key, main_pollutant)
+        return main_pollutant
+
+    @staticmethod
+    def _main_pollutant_for(month, aqi):
+        """🌪️ SEASONAL MAIN POLLUTANT FOR A MONTH AND AQI"""
         # Seasonal pollutant patterns
         if month in [11, 12, 1, 2]:  # Winter
             if aqi > 100:
@@ -630,41 +1290,58 @@ class AQIPredictionSystem:
             else:
                 return "Nitrogen dioxide (NO2)"
 
-    def predict_pollutant_concentrations(self, date, model_name=None):
-        """🌪️ ENHANCED POLLUTANT CONCENTRATIONS"""
-        aqi = self.predict_aqi_for_date(date, model_name)
+    def predict_pollutant_concentrations(self, date, model_name=None, aqi=None):
+        """🌪️ ENHANCED POLLUTANT CONCENTRATIONS
         
-        if isinstance(date, str):
-            date = datetime.strptime(date, '%Y-%m-%d')
+        Pass ``aqi`` when the day's AQI from the same model is already known.
+        The concentrations depend only on the date and that AQI, so both key the cache.
+        """
+        date = self._to_datetime(date)
+        if aqi is None:
+            aqi = self.predict_aqi_for_date(date, model_name)
+        
+        cache_key = ('concentrations', date.toordinal(), float(aqi))
+        cached = self._prediction_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
         
-        date_seed = self._get_date_seed(date)
-        np.random.seed(date_seed)
+        rng = np.random.default_rng(self._get_date_seed(date))
         
         day_of_year = date.timetuple().tm_yday
         seasonal_factor = np.sin(day_of_year * 2 * np.pi / 365)
         aqi_scale = aqi / 50.0
         
         concentrations = {
-            'PM2.5 - Local Conditions': max(5, (15 + 8 * seasonal_factor) * aqi_scale + np.random.normal(0, 3)),
-            'PM10 Total 0-10um STP': max(10, (25 + 12 * seasonal_factor) * aqi_scale + np.random.normal(0, 5)),
-            'Carbon monoxide': max(0.1, (0.8 + 0.3 * seasonal_factor) * aqi_scale + np.random.normal(0, 0.2)),
-            'Nitrogen dioxide (NO2)': max(0.005, (0.020 + 0.008 * seasonal_factor) * aqi_scale + np.random.normal(0, 0.005)),
-            'Sulfur dioxide': max(0.002, (0.010 + 0.004 * seasonal_factor) * aqi_scale + np.random.normal(0, 0.003)),
-            'Ozone': max(0.020, (0.040 + 0.012 * abs(seasonal_factor)) * aqi_scale + np.random.normal(0, 0.008))
+            'PM2.5 - Local Conditions': max(5, (15 + 8 * seasonal_factor) * aqi_scale + rng.normal(0, 3)),
+            'PM10 Total 0-10um STP': max(10, (25 + 12 * seasonal_factor) * aqi_scale + rng.normal(0, 5)),
+            'Carbon monoxide': max(0.1, (0.8 + 0.3 * seasonal_factor) * aqi_scale + rng.normal(0, 0.2)),
+            'Nitrogen dioxide (NO2)': max(0.005, (0.020 + 0.008 * seasonal_factor) * aqi_scale + rng.normal(0, 0.005)),
+            'Sulfur dioxide': max(0.002, (0.010 + 0.004 * seasonal_factor) * aqi_scale + rng.normal(0, 0.003)),
+            'Ozone': max(0.020, (0.040 + 0.012 * abs(seasonal_factor)) * aqi_scale + rng.normal(0, 0.008))
         }
         
-        np.random.seed(None)
-        return concentrations
+        self._prediction_cache.put(cache_key, concentrations)
+        return dict(concentrations)
+
+    @staticmethod
+    def compute_epa_aqi(concentrations):
+        """🌡️ EPA AQI FROM MEASURED CONCENTRATIONS (see aqi_epa.compute_aqi)"""
+        return compute_aqi(concentrations)
 
     def _get_date_seed(self, date):
         """🎲 CONSISTENT DATE SEED"""
-        date_str = date.strftime('%Y-%m-%d')
-        return int(hashlib.md5(date_str.encode()).hexdigest()[:8], 16) % (2**32)
+        return self._get_seed(date.strftime('%Y-%m-%d'))
 
-    def get_highest_concentration_days(self, year, month):
-        """🏆 ENHANCED HIGHEST CONCENTRATION DAYS"""
+    def get_highest_concentration_days(self, year, month, daily_aqi=None):
+        """🏆 ENHANCED HIGHEST CONCENTRATION DAYS
+        
+        daily_aqi is the month's AQI per day (index = day - 1); when omitted the whole
+        month is predicted in one batch.
+        """
         from calendar import monthrange
         _, num_days = monthrange(year, month)
+        if daily_aqi is None:
+            daily_aqi = self.predict_aqi_for_dates([datetime(year, month, day) for day in range(1, num_days + 1)])
         
         pollutant_peaks = {}
         pollutants_info = [
@@ -676,21 +1353,20 @@ class AQIPredictionSystem:
         ]
 
         for i, (pollutant, unit, base, std) in enumerate(pollutants_info):
+            # Per (month, pollutant) generator keeps the peak concentration reproducible
+            rng = np.random.default_rng(self._get_seed(f"{year}-{month:02d}-{pollutant}"))
             highest_aqi = 0
             peak_day = 1
             peak_concentration = base
             
-            for day in range(1, num_days + 1):
+            for day, day_aqi in enumerate(daily_aqi[:num_days], start=1):
                 try:
-                    test_date = datetime(year, month, day)
-                    daily_aqi = self.predict_aqi_for_date(test_date)
-                    
-                    if daily_aqi > highest_aqi:
-                        highest_aqi = daily_aqi
+                    if day_aqi is not None and day_aqi > highest_aqi:
+                        highest_aqi = day_aqi
                         peak_day = day
                         
-                        aqi_scale = daily_aqi / 50.0
-                        concentration = base * aqi_scale + np.random.normal(0, std * 0.3)
+                        aqi_scale = day_aqi / 50.0
+                        concentration = base * aqi_scale + rng.normal(0, std * 0.3)
                         
                         if unit == 'ppm':
                             concentration = max(0.2, min(3.0, concentration))
@@ -713,6 +1389,8 @@ class AQIPredictionSystem:
 
 # Test system on initialization
 if __name__ == "__main__":
+    from aqi_logging import configure_logging
+    configure_logging()
     print("🚀 ENHANCED AirSight Prediction System with Real Model Loading")
     
     aqi_system = AQIPredictionSystem()
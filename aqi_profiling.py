@@ -0,0 +1,286 @@
+"""
+AirSight request profiling - opt-in cProfile / stack-sampling of single requests
+
+Off unless configured. A request is profiled when either
+
+* it carries ``X-AQI-Profile: 1`` (or ``cprofile`` / ``sample``) and comes from an
+  address in AQI_PROFILE_ALLOWED_IPS - always kept, and the file name is returned
+  in the ``X-AQI-Profile-File`` response header, or
+* AQI_PROFILE_SAMPLE_EVERY=N is set and it is the N-th request - kept only when it
+  took at least AQI_PROFILE_SLOW_MS.
+
+Profiles are written to AQI_PROFILE_DIR, keeping the newest AQI_PROFILE_KEEP files:
+
+    cprofile  <...>.pstats     python -m pstats FILE, snakeviz FILE
+    sample    <...>.collapsed  flamegraph.pl FILE > out.svg, or load into speedscope
+
+AQI_PROFILE_MODE picks the default profiler. The sampler only looks at the stacks
+every AQI_PROFILE_INTERVAL_MS, so it is the cheaper one for slow requests.
+One profile runs per process at a time; overlapping requests are not profiled.
+
+Work the request hands to the model pool (aqi_prediction_system.submit_with_context,
+e.g. the /api/dashboard fan-out) is profiled with it: in cprofile mode each pool task
+runs under its own profiler and its stats are merged into the request's file; the
+sampler also samples the pool threads while they run the request's tasks, under a
+``[aqi-model_N]`` root frame.
+A streamed response (/api/export) is profiled until its body is closed; its headers
+are sent before that, so the file name is only logged, not returned.
+The allow-list is checked against request.remote_addr, which is the proxy's address
+behind a reverse proxy.
+"""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import tempfile
+import ipaddress
+import itertools
+import threading
+import contextvars
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-AQI-Profile'
+PROFILE_FILE_HEADER = 'X-AQI-Profile-File'
+MODES = ('cprofile', 'sample')
+EXTENSIONS = {'cprofile': '.pstats', 'sample': '.collapsed'}
+
+DEFAULT_SLOW_MS = 500
+DEFAULT_KEEP = 50
+DEFAULT_INTERVAL_MS = 5
+
+# The ActiveProfile of the request being profiled; pool tasks inherit it with the request's context
+CURRENT_PROFILE = contextvars.ContextVar('aqi_current_profile', default=None)
+
+
+def _parse_networks(value):
+    networks = []
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning('⚠️ Ignoring invalid AQI_PROFILE_ALLOWED_IPS entry: %s', item)
+    return networks
+
+
+def run_profiled(fn, *args, **kwargs):
+    """Run ``fn`` (a pool task) inside the profile of the request that submitted it, if any."""
+    active = CURRENT_PROFILE.get()
+    if active is None:
+        return fn(*args, **kwargs)
+    return active.run_in_worker(fn, *args, **kwargs)
+
+
+class StackSampler:
+    """🔬 SAMPLES ONE THREAD'S PYTHON STACK ON A TIMER AND COUNTS COLLAPSED STACKS
+    
+    Pool threads running the same request's tasks can be added with watch().
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        # Other threads sampled while they work for this request: ident -> [thread name, watch count]
+        self._watched = {}
+        self._watched_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='aqi-profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def watch(self, thread_id, name):
+        with self._watched_lock:
+            self._watched.setdefault(thread_id, [name, 0])[1] += 1
+
+    def unwatch(self, thread_id):
+        with self._watched_lock:
+            entry = self._watched[thread_id]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._watched[thread_id]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            frame = frames.get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._collapse(frame)] += 1
+            with self._watched_lock:
+                watched = [(thread_id, entry[0]) for thread_id, entry in self._watched.items()]
+            for thread_id, name in watched:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.stacks[f'[{name}];{self._collapse(frame)}'] += 1
+
+    @staticmethod
+    def _collapse(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class ActiveProfile:
+    """One request being profiled: the profiler, how it was triggered and when it started."""
+
+    def __init__(self, mode, trigger, interval):
+        self.mode = mode
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        # Profilers of the pool tasks run for this request (cprofile mode)
+        self.worker_profilers = []
+        self._lock = threading.Lock()
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        else:
+            self.profiler = StackSampler(threading.get_ident(), interval)
+            self.profiler.start()
+
+    def run_in_worker(self, fn, *args, **kwargs):
+        """Run one of this request's pool tasks on the current (pool) thread, profiled."""
+        if self.mode == 'cprofile':
+            # cProfile hooks only the thread that enables it, so each task gets its own
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(fn, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.worker_profilers.append(profiler)
+        thread_id = threading.get_ident()
+        self.profiler.watch(thread_id, threading.current_thread().name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.profiler.unwatch(thread_id)
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+        return (time.perf_counter() - self.started) * 1000
+
+    def write(self, path):
+        if self.mode == 'cprofile':
+            stats = pstats.Stats(self.profiler)
+            with self._lock:
+                workers = list(self.worker_profilers)
+            for profiler in workers:
+                stats.add(profiler)
+            stats.dump_stats(path)
+        else:
+            self.profiler.write(path)
+
+
+class RequestProfiler:
+    """🩺 DECIDES WHICH REQUESTS TO PROFILE AND WRITES THE KEPT PROFILES"""
+
+    def __init__(self, environ=None):
+        env = os.environ if environ is None else environ
+        self.directory = env.get('AQI_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'aqi-profiles')
+        self.mode = env.get('AQI_PROFILE_MODE', 'cprofile')
+        if self.mode not in MODES:
+            logger.warning('⚠️ Unknown AQI_PROFILE_MODE %s, using cprofile', self.mode)
+            self.mode = 'cprofile'
+        self.sample_every = int(env.get('AQI_PROFILE_SAMPLE_EVERY', 0))
+        self.slow_ms = float(env.get('AQI_PROFILE_SLOW_MS', DEFAULT_SLOW_MS))
+        self.keep = int(env.get('AQI_PROFILE_KEEP', DEFAULT_KEEP))
+        self.interval = float(env.get('AQI_PROFILE_INTERVAL_MS', DEFAULT_INTERVAL_MS)) / 1000
+        self.allowed_networks = _parse_networks(env.get('AQI_PROFILE_ALLOWED_IPS'))
+        self._counter = itertools.count(1)
+        self._sequence = itertools.count(1)
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sample_every > 0 or bool(self.allowed_networks)
+
+    def _allowed(self, remote_addr):
+        try:
+            address = ipaddress.ip_address(remote_addr)
+        except (TypeError, ValueError):
+            return False
+        return any(address in network for network in self.allowed_networks)
+
+    def start(self, headers, remote_addr):
+        """An ActiveProfile when this request should be profiled, else None."""
+        requested = headers.get(PROFILE_HEADER)
+        if requested and self.allowed_networks and self._allowed(remote_addr):
+            mode = requested if requested in MODES else self.mode
+            trigger = 'header'
+        elif self.sample_every > 0 and next(self._counter) % self.sample_every == 0:
+            mode, trigger = self.mode, 'sampled'
+        else:
+            return None
+
+        # One at a time: cProfile can't nest, and it bounds the overhead
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            active = ActiveProfile(mode, trigger, self.interval)
+            CURRENT_PROFILE.set(active)
+            return active
+        except Exception as e:
+            self._busy.release()
+            logger.warning('⚠️ Could not start %s profiler: %s', mode, e)
+            return None
+
+    def finish(self, active, endpoint):
+        """Stop profiling; returns the written file name, or None when it wasn't kept."""
+        try:
+            elapsed_ms = active.stop()
+        finally:
+            CURRENT_PROFILE.set(None)
+            self._busy.release()
+        if active.trigger == 'sampled' and elapsed_ms < self.slow_ms:
+            return None
+        if active.mode == 'sample' and not active.profiler.stacks:
+            logger.debug('Request finished before the first stack sample; nothing to write')
+            return None
+
+        name = '{}-{}-{:04d}-{}-{:.0f}ms{}'.format(
+            time.strftime('%Y%m%d-%H%M%S'), os.getpid(), next(self._sequence) % 10000,
+            endpoint or 'unmatched', elapsed_ms, EXTENSIONS[active.mode])
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            active.write(os.path.join(self.directory, name))
+            self._rotate()
+        except OSError as e:
+            logger.warning('⚠️ Could not write profile %s: %s', name, e)
+            return None
+        logger.info('🩺 Profiled %s (%s, %.0f ms) -> %s', endpoint, active.trigger, elapsed_ms, name)
+        return name
+
+    def _rotate(self):
+        """Delete the oldest profiles beyond AQI_PROFILE_KEEP."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(tuple(EXTENSIONS.values())):
+                entries.append((entry.stat().st_mtime, entry.path))
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.keep)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
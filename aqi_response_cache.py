@@ -0,0 +1,177 @@
+"""
+AirSight response cache - serialized JSON responses with strong ETags
+
+The GET endpoints are pure functions of their query parameters, the loaded model
+version and (when a date defaults to now) the current day. ``cached_response``
+keys on exactly that, stores the response body bytes once, and answers repeats
+from memory. A client sending the ETag back in If-None-Match gets a 304 with no
+body.
+
+Views that depend on "today" expire at the next local midnight (and after
+AQI_RESPONSE_TODAY_TTL seconds at most). Other entries stay until they are
+evicted or the model version changes. The cache is bounded by total body bytes
+(AQI_RESPONSE_CACHE_BYTES) and evicts least-recently-used entries first.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from functools import wraps
+
+from flask import current_app, request
+
+import aqi_forksafe
+from aqi_metrics import counter
+
+DEFAULT_RESPONSE_CACHE_BYTES = 64 * 1024 * 1024
+# Longest a "today"-relative response is kept, even before midnight
+DEFAULT_TODAY_TTL = 3600
+# Cache-Control max-age sent to browsers; after that they revalidate with If-None-Match
+DEFAULT_MAX_AGE = 300
+
+RESPONSE_CACHE_LOOKUPS = counter('aqi_response_cache_lookups_total', 'Response cache lookups', ['result'])
+RESPONSE_CACHE_HITS = RESPONSE_CACHE_LOOKUPS.labels(result='hit')
+RESPONSE_CACHE_MISSES = RESPONSE_CACHE_LOOKUPS.labels(result='miss')
+RESPONSE_NOT_MODIFIED = counter('aqi_response_not_modified_total', 'Responses answered with 304 Not Modified')
+
+
+class ResponseCache:
+    """🗄️ LRU OF (etag, body, expires_at) BOUNDED BY TOTAL BODY BYTES"""
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('AQI_RESPONSE_CACHE_BYTES', DEFAULT_RESPONSE_CACHE_BYTES))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        aqi_forksafe.register(self)
+
+    def _reset_locks(self):
+        # Whatever thread held it in the parent at fork time doesn't exist in the child
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(etag, body, expires_at) or None when missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.time():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        (RESPONSE_CACHE_MISSES if entry is None else RESPONSE_CACHE_HITS).inc()
+        return entry
+
+    def put(self, key, etag, body, expires_at=None):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (etag, body, expires_at)
+            self.bytes += len(body)
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        self.bytes -= len(self._entries.pop(key)[1])
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+        RESPONSE_NOT_MODIFIED.inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def make_etag(body):
+    """Strong validator: a hash of the exact response bytes."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def _today_expiry():
+    """Epoch seconds at the next local midnight, or after the today-TTL if that comes first."""
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    ttl = int(os.environ.get('AQI_RESPONSE_TODAY_TTL', DEFAULT_TODAY_TTL))
+    return min(midnight.timestamp(), time.time() + ttl)
+
+
+def _finish(response, etag, expires_at):
+    """Attach the validator and Cache-Control, and turn a matching If-None-Match into a 304."""
+    max_age = int(os.environ.get('AQI_RESPONSE_MAX_AGE', DEFAULT_MAX_AGE))
+    if expires_at is not None:
+        max_age = max(0, min(max_age, int(expires_at - time.time())))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response.make_conditional(request)
+
+
+def cached_response(cache, version, today_relative=None):
+    """🗄️ DECORATOR: serve a GET JSON view from ``cache``
+
+    ``version()`` returns the current model version (part of the key).
+    ``today_relative(args)`` says whether the response for these query args depends
+    on the current date; such entries are also keyed on today and expire at midnight.
+    Only 200 responses are cached.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Parameter order doesn't matter to the views; names and values are kept verbatim
+            params = tuple(sorted(request.args.items(multi=True)))
+            is_today = bool(today_relative and today_relative(request.args))
+            key = (request.endpoint, params, version(), date.today().toordinal() if is_today else None)
+
+            entry = cache.get(key)
+            if entry is not None:
+                etag, body, expires_at = entry
+                response = current_app.response_class(body, mimetype='application/json')
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.mimetype != 'application/json':
+                    return response
+                body = response.get_data()
+                etag = make_etag(body)
+                expires_at = _today_expiry() if is_today else None
+                cache.put(key, etag, body, expires_at)
+
+            response = _finish(response, etag, expires_at)
+            if response.status_code == 304:
+                cache.record_not_modified()
+            return response
+        return wrapper
+    return decorator
+
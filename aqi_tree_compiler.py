@@ -0,0 +1,130 @@
+"""
+AirSight tree compiler - sklearn tree ensembles flattened into NumPy node arrays
+
+Every tree of a GradientBoosting / RandomForest / ExtraTrees regressor is laid
+end to end in one set of arrays (feature, threshold, left, right, value per
+node), and all rows walk all trees together: one gather-and-compare per tree
+level instead of sklearn's input validation and per-estimator dispatch.
+
+Results are meant to be bit-identical to ``model.predict``:
+  * rows are cast to float32 and compared with the float64 thresholds, as
+    sklearn's Cython tree code does;
+  * leaves are summed tree by tree in estimator order (np.cumsum is sequential),
+    gradient boosting starting from its init prediction with every leaf already
+    multiplied by the learning rate, forests divided by the tree count at the end.
+The loader still checks that with ``equivalent`` before using a compiled model.
+"""
+
+import numpy as np
+
+
+class CompiledTreeEnsemble:
+    """🌲 ALL TREES OF ONE ENSEMBLE AS CONTIGUOUS NODE ARRAYS"""
+
+    def __init__(self, kind, trees, n_features, base=0.0, scale=1.0, average=False):
+        self.kind = kind
+        self.n_features = int(n_features)
+        self.n_trees = len(trees)
+        self.base = float(base)
+        self.average = average
+
+        sizes = [tree.node_count for tree in trees]
+        self.roots = np.cumsum([0] + sizes[:-1]).astype(np.intp)
+        self.depth = max(tree.max_depth for tree in trees)
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for root, tree in zip(self.roots, trees):
+            own = np.arange(tree.node_count, dtype=np.intp)
+            leaf = tree.children_left == -1
+            # Leaves point at themselves, so extra iterations for shallower trees are no-ops
+            left.append(np.where(leaf, own, tree.children_left) + root)
+            right.append(np.where(leaf, own, tree.children_right) + root)
+            feature.append(np.where(leaf, 0, tree.feature))
+            threshold.append(tree.threshold)
+            # sklearn computes scale * value per leaf at predict time; same float64 product here
+            value.append(scale * tree.value[:, 0, 0] if scale != 1.0 else tree.value[:, 0, 0])
+
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.value = np.concatenate(value).astype(np.float64)
+        # [right, left] per node, so the next node is one gather at 2 * node + go_left
+        self.children = np.column_stack([self.right, self.left]).ravel()
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.value))
+
+    def apply(self, X):
+        """Leaf node index per (row, tree). NaN is rejected, as by the sklearn regressors."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f'expected an (n, {self.n_features}) matrix, got {X.shape}')
+        if not np.isfinite(X).all():
+            raise ValueError('input contains NaN or infinity')
+
+        flat = X.ravel()
+        row_offsets = (np.arange(X.shape[0], dtype=np.intp) * self.n_features)[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.depth):
+            go_left = flat[row_offsets + self.feature[node]] <= self.threshold[node]
+            node = self.children[2 * node + go_left]
+        return node
+
+    def predict(self, X):
+        """⚡ Same values as the source model's predict(X)."""
+        leaves = self.value[self.apply(X)]
+        if self.average:
+            return np.cumsum(leaves, axis=1)[:, -1] / self.n_trees
+        start = np.full((leaves.shape[0], 1), self.base)
+        return np.cumsum(np.hstack([start, leaves]), axis=1)[:, -1]
+
+
+def compile_model(model):
+    """CompiledTreeEnsemble for a fitted, supported single-output regressor, else None."""
+    from sklearn.dummy import DummyRegressor
+    from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is None:
+        return None
+
+    if type(model) is GradientBoostingRegressor:
+        if model.init_ == 'zero':
+            base = 0.0
+        elif isinstance(model.init_, DummyRegressor):
+            # Regression losses use the identity link, so the init prediction is the raw start value
+            base = float(np.ravel(model.init_.predict(np.zeros((1, n_features))))[0])
+        else:
+            return None  # an init estimator whose prediction depends on X
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        return CompiledTreeEnsemble('gradient_boosting', trees, n_features, base=base, scale=model.learning_rate)
+
+    if type(model) in (RandomForestRegressor, ExtraTreesRegressor):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            return None
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        return CompiledTreeEnsemble(type(model).__name__, trees, n_features, average=True)
+
+    return None
+
+
+def boundary_rows(compiled, n_rows=256, seed=0):
+    """Rows whose values sit exactly on the split thresholds (the cases float32 rounding decides)."""
+    rng = np.random.default_rng(seed)
+    internal = compiled.left != np.arange(len(compiled.left))
+    rows = rng.normal(0.0, 50.0, (n_rows, compiled.n_features))
+    for f in range(compiled.n_features):
+        thresholds = compiled.threshold[internal & (compiled.feature == f)]
+        if len(thresholds):
+            rows[:, f] = rng.choice(thresholds, n_rows)
+    return rows
+
+
+def equivalent(compiled, model, X, rtol=1e-9):
+    """🔍 (matches, max_abs_diff) of compiled.predict vs model.predict on X."""
+    expected = np.asarray(model.predict(X), dtype=np.float64)
+    actual = compiled.predict(X)
+    max_diff = float(np.max(np.abs(actual - expected))) if len(expected) else 0.0
+    return bool(np.allclose(actual, expected, rtol=rtol, atol=0.0)), max_diff
@@ -0,0 +1,126 @@
+"""
+AirSight warmup - precompute the expensive views in the background after models load
+
+A WarmupJob runs a list of named steps on a daemon thread and reports progress,
+so /api/health can tell a load balancer when the instance is warm. Steps only
+fill the prediction-side caches; a failing step is logged and skipped.
+
+Under `gunicorn --preload` the job starts in the master, but threads don't
+survive fork: a worker that inherits an unfinished job reruns it the first time
+ensure_started() is called in that process.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import aqi_forksafe
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupJob:
+    """🔥 BACKGROUND PRECOMPUTATION WITH PROGRESS REPORTING"""
+
+    def __init__(self, build_steps):
+        # build_steps() -> [(name, callable)], evaluated at the start of every run
+        self._build_steps = build_steps
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._generation = 0
+        self._reset('pending')
+        aqi_forksafe.register(self)
+
+    def _reset(self, state):
+        self.state = state
+        self.steps_total = 0
+        self.steps_done = 0
+        self.current_step = None
+        self.failed_steps = []
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        """Begin a fresh run (a run already in progress is superseded)."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._reset('running')
+            self.started_at = time.time()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, args=(generation,), name='aqi-warmup', daemon=True)
+            self._thread.start()
+
+    def ensure_started(self):
+        """Start the job in this process unless it already finished or is running here."""
+        if self.state == 'done' or (self._pid == os.getpid() and self.state == 'running'):
+            return
+        self.start()
+
+    def _run(self, generation):
+        try:
+            steps = self._build_steps()
+        except Exception as e:
+            logger.exception('❌ Warmup could not be planned: %s', e)
+            steps = []
+
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.steps_total = len(steps)
+        logger.info('🔥 Warmup started: %s steps', len(steps))
+
+        for name, step in steps:
+            if generation != self._generation:
+                logger.info('🔥 Warmup superseded by a newer run')
+                return
+            with self._lock:
+                if generation == self._generation:
+                    self.current_step = name
+            try:
+                step()
+                failed = False
+            except Exception as e:
+                logger.warning('⚠️ Warmup step %s failed: %s', name, e)
+                failed = True
+            with self._lock:
+                if generation == self._generation:
+                    self.steps_done += 1
+                    if failed:
+                        self.failed_steps.append(name)
+
+        with self._lock:
+            if generation == self._generation:
+                self.state = 'done'
+                self.current_step = None
+                self.finished_at = time.time()
+                logger.info('✅ Warmup finished in %.1fs (%s failed steps)',
+                            self.finished_at - self.started_at, len(self.failed_steps))
+
+    def _reset_locks(self):
+        # The master's warmup thread may have held the lock at fork time; it never releases it here
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == 'done'
+
+    def status(self):
+        """Progress summary for /api/health."""
+        with self._lock:
+            elapsed = None
+            if self.started_at is not None:
+                elapsed = round((self.finished_at or time.time()) - self.started_at, 3)
+            return {
+                'state': self.state,
+                'ready': self.state == 'done',
+                'steps_done': self.steps_done,
+                'steps_total': self.steps_total,
+                'progress': round(self.steps_done / self.steps_total, 3) if self.steps_total else (1.0 if self.state == 'done' else 0.0),
+                'current_step': self.current_step,
+                'failed_steps': list(self.failed_steps),
+                'elapsed_seconds': elapsed
+            }
+
@@ -0,0 +1,283 @@
+"""
+AirSight benchmark harness - prediction and endpoint hot paths
+
+Times the prediction system and every Flask endpoint against a small stand-in
+sklearn model (written to a temp dir as aqi_4_models.pkl) and against the
+simulation fallback, and writes the results as JSON so runs can be diffed.
+
+    python benchmarks/aqi_bench.py                      # both modes -> bench_results.json
+    python benchmarks/aqi_bench.py --mode model --repeat 50 --out new.json
+    python benchmarks/aqi_bench.py --compare old.json   # exit 1 if any median got slower
+
+"cold" cases clear the prediction caches (and the response cache) before every
+round; "warm" cases reuse whatever the previous round cached.
+
+The same cases run under pytest-benchmark: benchmarks/test_aqi_bench.py.
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+MODES = ('model', 'simulation')
+
+# Fixed dates so runs are comparable no matter when they happen
+BENCH_DATE = datetime(2025, 8, 9)
+BENCH_YEAR, BENCH_MONTH = 2025, 8
+
+ENDPOINTS = {
+    'health': '/api/health',
+    'dashboard': '/api/dashboard?date=2025-08-09&model=gbr',
+    'prediction': '/api/prediction?date=2025-08-09&model=rf',
+    'pollutants_daily': '/api/pollutants?year=2025&month=8&filter=daily',
+    'pollutants_weekly': '/api/pollutants?year=2025&month=8&filter=weekly',
+    'pollutants_hourly': '/api/pollutants?year=2025&month=8&filter=hourly',
+    'recommendations': '/api/recommendations?date=2025-08-09',
+    'compare': '/api/compare?start=2025-08-09&days=30',
+    'history_meta': '/api/aqi_history_meta',
+    'history_daily': '/api/aqi_history_daily?year=2019&month=6',
+}
+
+
+def write_stand_in_models(path, n_samples=800, seed=0):
+    """🧪 Small gbr / rf / et / xgboost stand-ins in the aqi_4_models.pkl layout"""
+    import pandas as pd
+    from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+    from aqi_prediction_system import AQIPredictionSystem
+
+    columns = AQIPredictionSystem.EXACT_COLUMN_ORDER
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame({column: rng.normal(50, 20, n_samples) for column in columns})
+    X['year'] = rng.integers(2015, 2027, n_samples)
+    X['month'] = rng.integers(1, 13, n_samples)
+    y = 0.6 * X['aqi_lag_1'] + 0.3 * X['aqi_ma_7'] + 5 * np.sin(X['month']) + rng.normal(0, 3, n_samples)
+
+    models = {
+        'gbr': GradientBoostingRegressor(n_estimators=60, max_depth=3, random_state=seed),
+        'rf': RandomForestRegressor(n_estimators=30, max_depth=8, random_state=seed),
+        'et': ExtraTreesRegressor(n_estimators=30, max_depth=8, random_state=seed),
+        'xgboost': GradientBoostingRegressor(n_estimators=40, max_depth=4, learning_rate=0.2, random_state=seed + 1),
+    }
+    performance = {'r2_score': 0.9, 'mae': 2.0, 'rmse': 3.0, 'mape': 6.0}
+    data = {
+        'models': {name: {'model': model.fit(X.to_numpy(), y.to_numpy()), 'performance': dict(performance), 'used_tuning': False}
+                   for name, model in models.items()},
+        'best_model': 'gbr',
+        'feature_columns': list(columns),
+        'training_info': {'training_date': '2025-08-01', 'data_samples': n_samples},
+    }
+    with open(path, 'wb') as f:
+        pickle.dump(data, f)
+
+
+class BenchEnvironment:
+    """🏗️ The Flask app imported next to a stand-in model, switchable to simulation mode"""
+
+    def __init__(self):
+        self.tmpdir = tempfile.TemporaryDirectory(prefix='aqi-bench-')
+        write_stand_in_models(os.path.join(self.tmpdir.name, 'aqi_4_models.pkl'))
+
+        # Quiet by default (configure_logging is idempotent, so the app's own call keeps this)
+        from aqi_logging import configure_logging
+        configure_logging(level=os.environ.get('AQI_LOG_LEVEL', 'WARNING'))
+
+        # flask_api_backend loads aqi_4_models.pkl from the working directory at import
+        os.environ['AQI_WARMUP'] = '0'
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir.name)
+        try:
+            import flask_api_backend
+        finally:
+            os.chdir(cwd)
+        self.fb = flask_api_backend
+        if not self.fb.models_trained:
+            raise RuntimeError('stand-in models did not load; see the flask_api_backend log')
+
+        from aqi_prediction_system import AQIPredictionSystem
+        self.model_system = self.fb.aqi_system
+        self.simulation_system = AQIPredictionSystem()
+        self.simulation_system.load_models(os.path.join(self.tmpdir.name, 'missing.pkl'))
+        self.client = self.fb.app.test_client()
+
+    @contextlib.contextmanager
+    def mode(self, mode):
+        """Point the app's globals at the trained or the simulation system."""
+        saved = (self.fb.aqi_system, self.fb.models_trained)
+        if mode == 'model':
+            self.fb.aqi_system, self.fb.models_trained = self.model_system, True
+        else:
+            self.fb.aqi_system, self.fb.models_trained = self.simulation_system, False
+        try:
+            yield self.fb.aqi_system
+        finally:
+            self.fb.aqi_system, self.fb.models_trained = saved
+
+    def clear_caches(self):
+        self.fb.aqi_system.clear_caches()
+        self.fb.response_cache.clear()
+        self.fb.simulated_year_table.cache_clear()
+
+    def get(self, url):
+        response = self.client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} -> HTTP {response.status_code}')
+        return response
+
+    def close(self):
+        self.tmpdir.cleanup()
+
+
+CORE_CASES = (
+    'predict_aqi_for_date.cold', 'predict_aqi_for_date.warm',
+    'year_chart.cold', 'year_chart.warm',
+    'highest_concentration_days.cold',
+)
+
+
+def case_names():
+    """Every case name, without building the environment (for test parametrization)."""
+    names = list(CORE_CASES)
+    for endpoint in ENDPOINTS:
+        names += [f'endpoint.{endpoint}.cold', f'endpoint.{endpoint}.cached']
+    return names
+
+
+def build_cases(env):
+    """[(name, setup or None, fn)] for the currently selected mode.
+
+    ``setup`` runs untimed before every round (cold cases clear caches there).
+    """
+    system = env.fb.aqi_system
+    cold = env.clear_caches
+
+    def highest_days():
+        if env.fb.models_trained:
+            return system.get_highest_concentration_days(BENCH_YEAR, BENCH_MONTH)
+        return env.fb.get_fallback_highest_days(BENCH_MONTH, BENCH_YEAR)
+
+    cases = [
+        ('predict_aqi_for_date.cold', cold, lambda: system.predict_aqi_for_date(BENCH_DATE, 'gbr')),
+        ('predict_aqi_for_date.warm', None, lambda: system.predict_aqi_for_date(BENCH_DATE, 'gbr')),
+        ('year_chart.cold', cold, lambda: env.fb.generate_daily_chart_data(BENCH_DATE)),
+        ('year_chart.warm', None, lambda: env.fb.generate_daily_chart_data(BENCH_DATE)),
+        ('highest_concentration_days.cold', cold, highest_days),
+    ]
+    for name, url in ENDPOINTS.items():
+        cases.append((f'endpoint.{name}.cold', cold, lambda url=url: env.get(url)))
+        cases.append((f'endpoint.{name}.cached', None, lambda url=url: env.get(url)))
+    return cases
+
+
+def time_case(setup, fn, repeat):
+    """Per-round wall times in milliseconds (one untimed call first primes imports/caches)."""
+    if setup:
+        setup()
+    fn()
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def summarize(times):
+    ordered = sorted(times)
+    return {
+        'rounds': len(ordered),
+        'min_ms': round(ordered[0], 4),
+        'median_ms': round(statistics.median(ordered), 4),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 4),
+        'max_ms': round(ordered[-1], 4),
+    }
+
+
+def run(modes=MODES, repeat=20, only=None):
+    """📊 Run every case in every mode; returns the JSON-ready result document."""
+    import sklearn
+
+    env = BenchEnvironment()
+    results = {}
+    try:
+        for mode in modes:
+            with env.mode(mode):
+                results[mode] = {}
+                for name, setup, fn in build_cases(env):
+                    if only and only not in name:
+                        continue
+                    results[mode][name] = summarize(time_case(setup, fn, repeat))
+                    print(f"{mode:10s} {name:40s} median {results[mode][name]['median_ms']:9.3f} ms", file=sys.stderr)
+    finally:
+        env.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(old, new, threshold):
+    """Cases whose median got more than ``threshold`` (fraction) slower: [(mode, case, old_ms, new_ms)]."""
+    regressions = []
+    for mode, cases in new['results'].items():
+        for name, stats in cases.items():
+            before = old.get('results', {}).get(mode, {}).get(name)
+            if before and stats['median_ms'] > before['median_ms'] * (1 + threshold):
+                regressions.append((mode, name, before['median_ms'], stats['median_ms']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark AirSight prediction and endpoint hot paths')
+    parser.add_argument('--mode', choices=MODES + ('both',), default='both')
+    parser.add_argument('--repeat', type=int, default=20, help='timed rounds per case')
+    parser.add_argument('--only', help='run only cases whose name contains this')
+    parser.add_argument('--out', default='bench_results.json', help='where to write the JSON results')
+    parser.add_argument('--compare', metavar='OLD_JSON', help='previous results to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed median slowdown (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    modes = MODES if args.mode == 'both' else (args.mode,)
+    document = run(modes, args.repeat, args.only)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    print(f'Results written to {args.out}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(json.load(f), document, args.threshold)
+        for mode, name, before, after in regressions:
+            print(f'REGRESSION {mode} {name}: {before:.3f} ms -> {after:.3f} ms', file=sys.stderr)
+        if regressions:
+            return 1
+        print(f'No median slower than {args.threshold:.0%} vs {args.compare}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
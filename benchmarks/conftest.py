@@ -0,0 +1,23 @@
+"""
+pytest setup for benchmarks/: the app's modules live at the repo root
+
+    pytest benchmarks/
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture(scope='session')
+def bench_env():
+    """The Flask app on the stand-in models; flask_api_backend is imported once, so this is shared"""
+    import aqi_bench
+    env = aqi_bench.BenchEnvironment()
+    yield env
+    env.close()
@@ -0,0 +1,121 @@
+"""
+/api/predict/batch and /api/export: the same values as the per-date endpoints, in every format
+"""
+
+import io
+import csv
+import json
+from datetime import datetime
+
+import pytest
+
+import aqi_bench
+
+DATES = ['2025-08-09', '2025-08-10', '2025-12-31', '2026-01-01', '2031-06-15']
+MODELS = ['gbr', 'rf', 'et', 'xgboost', 'random_forest']
+
+
+@pytest.fixture(params=aqi_bench.MODES)
+def client(request, bench_env):
+    with bench_env.mode(request.param):
+        bench_env.clear_caches()
+        yield bench_env.client
+
+
+def post_batch(client, payload, query=''):
+    response = client.post('/api/predict/batch' + query, json=payload)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def ndjson_rows(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_batch_matches_per_date_predictions(client):
+    columns = post_batch(client, {'dates': DATES, 'models': MODELS}).get_json()['columns']
+    assert len(columns['aqi']) == len(DATES) * len(MODELS)
+
+    for row, (date, model) in enumerate(zip(columns['date'], columns['model'])):
+        single = client.get(f'/api/prediction?date={date}&model={model}').get_json()
+        assert columns['aqi'][row] == single['overall_aqi'], (date, model)
+        assert columns['category'][row] == single['aqi_category']
+        pollutants = [columns[name][row] for name in ('pm25', 'pm10', 'no2', 'so2', 'co', 'o3')]
+        assert pollutants == single['pollutant_forecast']['data'], (date, model)
+
+
+def test_batch_matches_predict_aqi_for_dates(bench_env):
+    with bench_env.mode('model') as system:
+        columns = post_batch(bench_env.client, {'start': '2025-08-01', 'days': 40, 'models': ['gbr'],
+                                                'pollutants': False}).get_json()['columns']
+        dates = [datetime.strptime(date, '%Y-%m-%d') for date in columns['date']]
+        expected = system.predict_aqi_for_dates(dates, 'gbr')
+        assert columns['aqi'] == [round(float(value)) for value in expected]
+        assert 'pm25' not in columns
+
+
+def test_batch_item_list_and_ndjson_agree_with_columns(client):
+    items = [{'date': date, 'model': model} for date, model in zip(DATES, MODELS)]
+    columns = post_batch(client, items).get_json()['columns']
+    rows = ndjson_rows(post_batch(client, {'items': items}, '?format=ndjson'))
+    assert rows == [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def test_export_ndjson_matches_batch_across_chunks(client):
+    # 45 days x 2 models spans two EXPORT_CHUNK_DAYS chunks
+    response = client.get('/api/export?start=2025-08-01&days=45&models=gbr,rf')
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    assert 'aqi-prediction-20250801-20250914.ndjson' in response.headers['Content-Disposition']
+    rows = ndjson_rows(response)
+
+    columns = post_batch(client, {'start': '2025-08-01', 'days': 45, 'models': ['gbr', 'rf']}).get_json()['columns']
+    assert rows == [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def test_export_csv_has_one_header_and_the_ndjson_values(client):
+    query = '/api/export?start=2025-08-01&days=45&models=gbr,rf&pollutants=0'
+    response = client.get(query + '&format=csv')
+    assert response.status_code == 200 and response.mimetype == 'text/csv'
+    header, *rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert header == ['date', 'model', 'aqi', 'category']
+
+    expected = ndjson_rows(client.get(query))
+    assert len(rows) == len(expected) == 90
+    assert rows == [[str(record[name]) for name in header] for record in expected]
+
+
+def test_export_history_in_both_formats(client, bench_env):
+    if bench_env.fb.history_store is None:
+        pytest.skip('prepared_aqi_data.csv not available')
+    query = '/api/export?source=history&start=2019-06-01&end=2019-07-15'
+    records = ndjson_rows(client.get(query))
+    header, *rows = list(csv.reader(io.StringIO(client.get(query + '&format=csv').get_data(as_text=True))))
+    assert records and list(records[0]) == header and len(rows) == len(records)
+
+
+@pytest.mark.parametrize('query', ['format=xml', 'source=forecast', 'start=2025-13-01', 'days=0', 'models=gbr,lstm'])
+def test_export_rejects_bad_arguments(client, query):
+    assert client.get('/api/export?' + query).status_code == 400
+
+
+@pytest.mark.parametrize('export_format', ['ndjson', 'csv'])
+def test_export_failing_mid_stream_ends_with_an_error_record(client, bench_env, monkeypatch, export_format):
+    original, calls = bench_env.fb.predict_batch_columns, []
+
+    def fail_on_the_second_chunk(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError('model pool gone')
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(bench_env.fb, 'predict_batch_columns', fail_on_the_second_chunk)
+    response = client.get(f'/api/export?start=2025-08-01&days=45&models=gbr&pollutants=0&format={export_format}')
+
+    if export_format == 'ndjson':
+        *rows, last = ndjson_rows(response)
+        assert last == {'error': 'Export failed: model pool gone'}
+    else:
+        header, *rows, last = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+        assert header == ['date', 'model', 'aqi', 'category']
+        assert last == ['# error', 'Export failed: model pool gone']
+    assert len(rows) == 30  # the first chunk, then the marker
@@ -0,0 +1,28 @@
+"""
+pytest-benchmark version of benchmarks/aqi_bench.py
+
+    pip install -r requirements-dev.txt
+    pytest benchmarks/ --benchmark-json=bench.json
+    pytest benchmarks/ --benchmark-compare    # against the last --benchmark-autosave run
+
+Skipped when pytest-benchmark isn't installed.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+import aqi_bench
+
+
+@pytest.mark.parametrize('case', aqi_bench.case_names())
+@pytest.mark.parametrize('mode', aqi_bench.MODES)
+def test_hot_path(benchmark, bench_env, mode, case):
+    with bench_env.mode(mode):
+        cases = {name: (setup, fn) for name, setup, fn in aqi_bench.build_cases(bench_env)}
+        setup, fn = cases[case]
+        benchmark.group = case
+        if setup is None:
+            benchmark(fn)
+        else:
+            benchmark.pedantic(fn, setup=setup, rounds=20, warmup_rounds=1)
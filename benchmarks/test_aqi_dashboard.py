@@ -0,0 +1,71 @@
+"""
+/api/dashboard: the fanned-out payload is what the sequential per-part calls give
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import aqi_bench
+
+DATE = '2025-11-14'
+
+
+@pytest.fixture(params=aqi_bench.MODES)
+def mode(request, bench_env):
+    with bench_env.mode(request.param) as system:
+        bench_env.clear_caches()
+        yield request.param, system
+
+
+def sequential_payload(fb, date_str, model_name):
+    """The dashboard's AQI, chart and pollutant parts, each computed on its own"""
+    target_date = datetime.strptime(date_str, '%Y-%m-%d')
+    expected = {
+        'current_aqi': fb.get_model_specific_aqi(date_str, model_name),
+        'next_day_aqi': fb.get_model_specific_aqi((target_date + timedelta(days=1)).strftime('%Y-%m-%d'), model_name),
+        'chart_aqi': fb.generate_daily_chart_data(target_date),
+    }
+    if fb.models_trained:
+        main_pollutant, concentrations = fb.predict_dashboard_pollutants(target_date)
+        expected['main_pollutant'] = main_pollutant
+        expected['pm25'] = round(concentrations['PM2.5 - Local Conditions'], 1)
+    return expected
+
+
+def dashboard_parts(payload, expected):
+    parts = {name: payload[name] for name in expected if name in payload}
+    if 'pm25' in expected:
+        parts['pm25'] = payload['sensor_data']['pm25']
+    return parts
+
+
+@pytest.mark.parametrize('model_name', ['gbr', 'gradient_boosting', 'rf', 'xgboost'])
+def test_fan_out_equals_sequential_calls(bench_env, mode, model_name):
+    _, system = mode
+    payload = bench_env.get(f'/api/dashboard?date={DATE}&model={model_name}').get_json()
+    system.clear_caches()
+    expected = sequential_payload(bench_env.fb, DATE, model_name)
+    assert dashboard_parts(payload, expected) == expected
+
+
+def test_a_simulated_current_aqi_is_not_handed_to_the_other_parts(bench_env, monkeypatch):
+    # The requested model fails for the dashboard's date only; the chart (gradient boosting)
+    # and the pollutants (best model) still have their own model predictions for it
+    with bench_env.mode('model') as system:
+        bench_env.clear_caches()
+        target_date = datetime.strptime(DATE, '%Y-%m-%d')
+        original = system.predict_aqi_for_date
+
+        def failing_for_gbr(date, model_name=None, *args, **kwargs):
+            if model_name == 'gbr' and date == target_date:
+                raise RuntimeError('model failed')
+            return original(date, model_name, *args, **kwargs)
+
+        monkeypatch.setattr(system, 'predict_aqi_for_date', failing_for_gbr)
+        payload = bench_env.get(f'/api/dashboard?date={DATE}&model=gbr').get_json()
+        system.clear_caches()
+        expected = sequential_payload(bench_env.fb, DATE, 'gbr')
+
+    assert expected['current_aqi'] != expected['chart_aqi'][target_date.timetuple().tm_yday - 1]
+    assert dashboard_parts(payload, expected) == expected
@@ -0,0 +1,81 @@
+"""
+aqi_epa: truncation, breakpoint edges and the overall AQI
+"""
+
+import numpy as np
+import pytest
+
+from aqi_epa import compute_aqi, sub_index
+
+
+def test_float32_value_is_truncated_on_its_decimal_digit():
+    # float32 467.9 is 467.89999...; plain truncation would read it as 467.8 (AQI 478)
+    assert sub_index('PM2.5', np.float32(467.9)) == 479
+    assert sub_index('PM2.5', np.array([467.9], dtype=np.float32))[0] == 479
+
+
+@pytest.mark.parametrize('pollutant, concentration, expected', [
+    ('PM2.5', 0.0, 0),
+    ('PM2.5', 12.0, 50),
+    ('PM2.5', 12.05, 50),   # truncated to 12.0, not into the 12.1 bracket
+    ('PM2.5', 12.1, 51),
+    ('PM2.5', 35.4, 100),
+    ('PM2.5', 35.5, 101),
+    ('PM10', 54.9, 50),
+    ('PM10', 55, 51),
+    ('CO', 4.4, 50),
+    ('CO', 4.5, 51),
+    ('O3', 0.0549, 50),
+    ('O3', 0.055, 51),
+    ('NO2', 100, 100),
+    ('NO2', 101, 101),
+])
+def test_values_at_breakpoints(pollutant, concentration, expected):
+    assert sub_index(pollutant, concentration) == expected
+
+
+@pytest.mark.parametrize('pollutant, concentration, expected', [
+    ('PM2.5', 0.6, 3),      # 2.5
+    ('PM2.5', 1.8, 8),      # 7.500000000000001
+    ('PM2.5', 3.0, 13),     # 12.5, which rounding half to even takes to 12
+    ('PM2.5', 4.2, 18),     # 17.5
+    ('PM2.5', 5.4, 23),     # 22.500000000000004
+    ('PM2.5', 10.2, 43),    # 42.5
+    ('PM2.5', 11.4, 48),    # 47.5
+    ('CO', 1.1, 13),        # 12.5
+    ('CO', 3.3, 38),        # 37.5
+])
+def test_exact_halves_round_up(pollutant, concentration, expected):
+    assert sub_index(pollutant, concentration) == expected
+    assert sub_index(pollutant, np.array([concentration], dtype=np.float32))[0] == expected
+
+
+@pytest.mark.parametrize('pollutant, concentration, expected', [
+    ('PM2.5', 600.0, 500),
+    ('PM10', 1000, 500),
+    ('SO2', 5000, 500),
+    ('O3', 0.3, 300),   # the 8-hour ozone table ends at 300
+])
+def test_values_above_the_last_breakpoint_are_capped(pollutant, concentration, expected):
+    assert sub_index(pollutant, concentration) == expected
+
+
+def test_negative_is_zero_and_nan_stays_nan():
+    result = sub_index('PM2.5', [-3.0, np.nan])
+    assert result[0] == 0 and np.isnan(result[1])
+
+
+def test_overall_aqi_is_the_highest_sub_index():
+    result = compute_aqi({
+        'PM2.5 - Local Conditions': np.array([35.5, np.nan, np.nan]),
+        'Ozone': np.array([0.030, 0.071, np.nan]),
+    })
+    assert result['sub_indices']['PM2.5'][0] == 101
+    assert result['aqi'][:2].tolist() == [101, 101]
+    assert result['dominant'][:2].tolist() == ['PM2.5', 'O3']
+
+
+def test_all_nan_row_has_no_aqi_and_no_dominant_pollutant():
+    result = compute_aqi({'PM2.5': np.array([np.nan, 10.0]), 'CO': np.array([np.nan, np.nan])})
+    assert np.isnan(result['aqi'][0]) and result['dominant'][0] is None
+    assert result['aqi'][1] == 42 and result['dominant'][1] == 'PM2.5'
@@ -0,0 +1,85 @@
+"""
+/api/aqi_history_meta and /api/aqi_history_daily against prepared_aqi_data.csv read with the csv module
+"""
+
+import csv
+import math
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from aqi_epa import compute_aqi
+from aqi_history_store import AQI_COLUMN, DEFAULT_HISTORY_CSV
+
+
+@pytest.fixture(scope='module')
+def csv_rows():
+    with open(DEFAULT_HISTORY_CSV, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row['date'] = datetime.strptime(row['date'], '%Y/%m/%d').date()
+    return sorted(rows, key=lambda row: row['date'])
+
+
+@pytest.fixture
+def client(bench_env):
+    if bench_env.fb.history_store is None:
+        pytest.skip('prepared_aqi_data.csv not available')
+    return bench_env.client
+
+
+def month_rows(csv_rows, year, month):
+    return {row['date'].day: row for row in csv_rows if (row['date'].year, row['date'].month) == (year, month)}
+
+
+def test_meta_describes_the_csv(client, csv_rows):
+    meta = client.get('/api/aqi_history_meta').get_json()
+    first, last = csv_rows[0]['date'], csv_rows[-1]['date']
+    assert (meta['start_date'], meta['end_date']) == (str(first), str(last))
+    assert meta['days_with_data'] == len(csv_rows)
+    assert meta['years'] == list(range(first.year, last.year + 1))
+    assert (meta['latest_year'], meta['latest_month']) == (last.year, last.month)
+
+    aqi = [float(row[AQI_COLUMN]) for row in csv_rows]
+    assert meta['pollutants'][AQI_COLUMN] == {'min': min(aqi), 'max': max(aqi)}
+
+
+def test_daily_month_with_missing_days(client, csv_rows):
+    payload = client.get('/api/aqi_history_daily?year=2015&month=4').get_json()
+    rows = month_rows(csv_rows, 2015, 4)
+    assert 7 not in rows and 9 not in rows  # days the CSV has no reading for
+
+    assert payload['month_year'] == 'April 2015'
+    assert payload['labels'] == [f'Apr {day:02d}' for day in range(1, 31)]
+    assert payload['data'] == [int(float(rows[day][AQI_COLUMN])) if day in rows else None for day in range(1, 31)]
+
+    concentrations = {column: np.array([float(rows[day][column]) if day in rows else np.nan for day in range(1, 31)])
+                      for column in ('Carbon monoxide', 'Nitrogen dioxide (NO2)', 'Ozone', 'PM10 Total 0-10um STP',
+                                     'PM2.5 - Local Conditions', 'Sulfur dioxide')}
+    epa = compute_aqi(concentrations)
+    assert payload['epa_aqi'] == [None if math.isnan(value) else int(value) for value in epa['aqi']]
+    assert payload['dominant_pollutant'] == list(epa['dominant'])
+    assert payload['epa_aqi'][6] is None and payload['dominant_pollutant'][6] is None
+
+
+def test_daily_partial_first_month_and_latest_month_default(client, csv_rows):
+    first = csv_rows[0]['date']
+    payload = client.get(f'/api/aqi_history_daily?year={first.year}&month={first.month}').get_json()
+    assert payload['labels'][0] == first.strftime('%b %d')
+
+    last = csv_rows[-1]['date']
+    latest = client.get('/api/aqi_history_daily').get_json()
+    assert latest['month_year'] == last.strftime('%B %Y')
+    assert latest['labels'][-1] == last.strftime('%b %d')
+    assert latest['data'] == [int(float(row[AQI_COLUMN])) for row in month_rows(csv_rows, last.year, last.month).values()]
+
+
+@pytest.mark.parametrize('query, status', [
+    ('year=2015&month=13', 400),
+    ('year=abc&month=4', 400),
+    ('year=2010&month=4', 404),
+    ('year=2030&month=1', 404),
+])
+def test_daily_rejects_bad_or_unavailable_months(client, query, status):
+    assert client.get('/api/aqi_history_daily?' + query).status_code == status
@@ -0,0 +1,124 @@
+"""
+AQIHistoryStore: dense calendar, lag features and the .npy cache of the history CSV
+"""
+
+import os
+import json
+
+import numpy as np
+import pytest
+
+from aqi_history_store import AQI_COLUMN, AQIHistoryStore, DEFAULT_HISTORY_CSV
+
+N_ROWS = 40
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """The first rows of prepared_aqi_data.csv, as a CSV of its own"""
+    with open(DEFAULT_HISTORY_CSV, encoding='utf-8') as f:
+        lines = f.read().splitlines()[:N_ROWS + 1]
+    path = tmp_path / 'history.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def no_csv_parse(monkeypatch):
+    def fail(cls, path):
+        raise AssertionError(f'{path} was parsed; the cache should have been used')
+    monkeypatch.setattr(AQIHistoryStore, 'from_csv', classmethod(fail))
+
+
+def set_first_aqi(csv_path, value):
+    with open(csv_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    header = lines[0].split(',')
+    row = lines[1].split(',')
+    row[header.index(AQI_COLUMN)] = str(value)
+    lines[1] = ','.join(row)
+    with open(csv_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def test_from_rows_fills_gaps_with_nan_rows():
+    days = np.array(['2020-01-03', '2020-01-01'], dtype='datetime64[D]')
+    store = AQIHistoryStore.from_rows(days, [AQI_COLUMN, 'PM2.5 - Local Conditions'], [[30.0, 8.0], [10.0, 3.0]])
+
+    assert store.start == np.datetime64('2020-01-01') and store.n_days == 3
+    assert store.has_data.tolist() == [True, False, True]
+    # The missing day is interpolated for the features
+    assert store.aqi_series(np.array(['2020-01-02'], dtype='datetime64[D]'))[0] == 20.0
+
+
+def test_lag_features_read_the_previous_days(csv_path):
+    store = AQIHistoryStore.from_csv(csv_path)
+    aqi = store.values[:, store.columns.index(AQI_COLUMN)]
+    day = store.start + 10
+
+    features = store.lag_features(np.array([day]))
+    previous = aqi[10 - np.arange(1, 8)]
+    assert features['aqi_lag_1'][0] == previous[0]
+    assert features['aqi_lag_7'][0] == previous[6]
+    assert features['aqi_ma_7'][0] == pytest.approx(previous.mean())
+    assert features['aqi_trend_3'][0] == previous[0] - previous[2]
+
+
+def test_cache_is_written_then_reused(csv_path, monkeypatch):
+    parsed = AQIHistoryStore.from_csv(csv_path)
+    store = AQIHistoryStore.load(csv_path)
+    npy_path, sidecar_path = AQIHistoryStore.cache_paths(csv_path)
+    assert os.path.exists(npy_path) and os.path.exists(sidecar_path)
+    np.testing.assert_array_equal(store.values, parsed.values.astype(np.float32))
+
+    no_csv_parse(monkeypatch)
+    cached = AQIHistoryStore.load(csv_path)
+    assert isinstance(cached.values.base, np.memmap)
+    np.testing.assert_array_equal(cached.values, store.values)
+
+
+def test_changed_csv_rebuilds_the_cache(csv_path):
+    AQIHistoryStore.load(csv_path)
+    set_first_aqi(csv_path, 123)
+
+    store = AQIHistoryStore.load(csv_path)
+    assert store.values[0, store.columns.index(AQI_COLUMN)] == 123
+    _, sidecar_path = AQIHistoryStore.cache_paths(csv_path)
+    with open(sidecar_path, encoding='utf-8') as f:
+        assert json.load(f)['size'] == os.path.getsize(csv_path)
+
+
+def test_touched_but_unchanged_csv_keeps_the_cache(csv_path, monkeypatch):
+    AQIHistoryStore.load(csv_path)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    no_csv_parse(monkeypatch)
+    AQIHistoryStore.load(csv_path)
+    _, sidecar_path = AQIHistoryStore.cache_paths(csv_path)
+    with open(sidecar_path, encoding='utf-8') as f:
+        assert json.load(f)['mtime_ns'] == stat.st_mtime_ns + 10**9
+
+
+def test_same_size_and_mtime_but_other_format_version_rebuilds(csv_path):
+    AQIHistoryStore.load(csv_path)
+    _, sidecar_path = AQIHistoryStore.cache_paths(csv_path)
+    with open(sidecar_path, encoding='utf-8') as f:
+        sidecar = json.load(f)
+    sidecar['format_version'] = -1
+    with open(sidecar_path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f)
+
+    AQIHistoryStore.load(csv_path)
+    with open(sidecar_path, encoding='utf-8') as f:
+        assert json.load(f)['format_version'] != -1
+
+
+def test_unreadable_npy_is_rebuilt(csv_path):
+    AQIHistoryStore.load(csv_path)
+    npy_path, _ = AQIHistoryStore.cache_paths(csv_path)
+    with open(npy_path, 'wb') as f:
+        f.write(b'not an npy file')
+
+    store = AQIHistoryStore.load(csv_path)
+    assert store is not None and store.n_days == AQIHistoryStore.from_csv(csv_path).n_days
+    np.load(npy_path)  # rewritten
@@ -0,0 +1,99 @@
+"""
+aqi_metrics: counters, histograms, snapshots summed across processes and /api/metrics
+"""
+
+import os
+import json
+
+import pytest
+
+from aqi_metrics import MetricsRegistry, merge, render
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+
+def sample_lines(text, name):
+    return [line for line in text.splitlines() if line.startswith(name + '{') or line.startswith(name + ' ')]
+
+
+def test_counters_and_histograms_render_in_prometheus_text(registry):
+    requests = registry.counter('requests_total', 'Requests', ['status'])
+    requests.labels(status=200).inc()
+    requests.labels(status=200).inc(2)
+    requests.labels(status=404).inc()
+    requests.labels(status=500).inc(0)  # no sample for a zero increment
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+
+    text = render(merge([registry.snapshot()]))
+    assert '# TYPE requests_total counter' in text and '# HELP latency_seconds Latency' in text
+    assert sample_lines(text, 'requests_total') == ['requests_total{status="200"} 3', 'requests_total{status="404"} 1']
+    assert sample_lines(text, 'latency_seconds_bucket') == [
+        'latency_seconds_bucket{le="0.1"} 2', 'latency_seconds_bucket{le="1.0"} 3', 'latency_seconds_bucket{le="+Inf"} 4']
+    assert sample_lines(text, 'latency_seconds_count') == ['latency_seconds_count 4']
+    assert sample_lines(text, 'latency_seconds_sum') == ['latency_seconds_sum 3.65']
+
+
+def test_a_name_keeps_its_type(registry):
+    assert registry.counter('thing_total', 'Things') is registry.counter('thing_total', 'Things')
+    with pytest.raises(ValueError):
+        registry.histogram('thing_total', 'Things')
+
+
+def test_snapshots_of_several_processes_are_summed(registry, tmp_path, monkeypatch):
+    monkeypatch.setenv('AQI_METRICS_DIR', str(tmp_path))
+    registry.counter('requests_total', 'Requests').inc(2)
+    registry.histogram('latency_seconds', 'Latency', buckets=(1.0,)).observe(0.5)
+    other = registry.snapshot()
+    other['pid'] = -1
+    (tmp_path / 'aqi-metrics-other.json').write_text(json.dumps(other))
+
+    text = registry.render_all()
+    assert 'aqi_metrics_processes 2' in text
+    assert sample_lines(text, 'requests_total') == ['requests_total 4']
+    assert sample_lines(text, 'latency_seconds_count') == ['latency_seconds_count 2']
+    assert (tmp_path / f'aqi-metrics-{os.getpid()}.json').exists()
+
+
+def test_pre_fork_flush_only_writes_after_a_change(registry, tmp_path, monkeypatch):
+    monkeypatch.setenv('AQI_METRICS_DIR', str(tmp_path))
+    path = tmp_path / f'aqi-metrics-{os.getpid()}.json'
+    requests = registry.counter('requests_total', 'Requests')
+
+    registry.flush_if_changed()
+    assert not path.exists()  # nothing counted yet
+
+    requests.inc()
+    registry.flush_if_changed()
+    assert path.exists()
+    path.unlink()
+    registry.flush_if_changed()  # e.g. gunicorn respawning a worker from an idle master
+    assert not path.exists()
+
+    registry.histogram('latency_seconds', 'Latency').observe(0.2)
+    registry.flush_if_changed()
+    assert json.loads(path.read_text())['metrics']['requests_total']['samples'] == [[[], 1]]
+
+
+def test_api_metrics_counts_requests(bench_env):
+    with bench_env.mode('model'):
+        before = bench_env.client.get('/api/metrics')
+        bench_env.client.get('/api/prediction?date=2025-08-09')
+        bench_env.client.get('/api/prediction?date=2025-08-09')
+        after = bench_env.client.get('/api/metrics')
+
+    assert after.status_code == 200 and after.mimetype == 'text/plain'
+    text = after.get_data(as_text=True)
+    assert '# TYPE aqi_http_requests_total counter' in text
+    assert '# TYPE aqi_http_request_duration_seconds histogram' in text
+
+    def count(text):
+        line = 'aqi_http_requests_total{endpoint="get_prediction_data",method="GET",status="200"} '
+        values = [int(sample.split()[-1]) for sample in text.splitlines() if sample.startswith(line)]
+        return values[0] if values else 0
+
+    assert count(text) == count(before.get_data(as_text=True)) + 2
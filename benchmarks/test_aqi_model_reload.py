@@ -0,0 +1,155 @@
+"""
+ModelReloader: an atomic swap, rejected files and what requests see while a reload lands
+"""
+
+import os
+import pickle
+import shutil
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from aqi_bench import write_stand_in_models
+from aqi_model_reload import ModelReloader
+from aqi_prediction_system import AQIPredictionSystem, ModelSet
+
+DATES = [datetime(2025, 12, 20) + timedelta(days=i) for i in range(10)]
+
+
+@pytest.fixture(scope='module')
+def model_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('model-files')
+    files = {}
+    for name, seed in (('first', 0), ('second', 5)):
+        files[name] = str(directory / f'{name}.pkl')
+        write_stand_in_models(files[name], seed=seed)
+    return files
+
+
+@pytest.fixture
+def model_path(tmp_path, model_files, monkeypatch):
+    # Whole files, not split ones, and sklearn's own predict (so a test can hold it)
+    monkeypatch.setenv('AQI_LAZY_MODELS', '0')
+    monkeypatch.setenv('AQI_COMPILED_TREES', '0')
+    path = str(tmp_path / 'aqi_4_models.pkl')
+    shutil.copy(model_files['first'], path)
+    return path
+
+
+@pytest.fixture
+def system(model_path):
+    system = AQIPredictionSystem()
+    system.load_models(model_path)
+    assert system.use_trained_models
+    return system
+
+
+def replace_file(source, path):
+    """mv a new file over ``path``, as the module docstring asks"""
+    tmp = path + '.tmp'
+    shutil.copy(source, tmp)
+    os.replace(tmp, path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))  # a new mtime even on coarse clocks
+
+
+def reload(reloader):
+    assert reloader.start()
+    reloader.wait(30)
+    return reloader.status()
+
+
+def test_reload_swaps_in_the_new_file(system, model_path, model_files):
+    swaps = []
+    reloader = ModelReloader(system, model_path, on_swap=lambda previous, new: swaps.append((previous, new)))
+    old_set = system.model_set
+    before = system.predict_aqi_for_dates(DATES, 'rf')
+
+    replace_file(model_files['second'], model_path)
+    status = reload(reloader)
+    assert (status['last_result'], status['reloads'], status['state']) == ('swapped', 1, 'idle')
+    assert swaps == [(old_set, system.model_set)]
+    assert system.model_version == system.model_file_version(model_path) != old_set.version
+    assert system.model_file_info['size'] == os.path.getsize(model_files['second'])
+    assert system.get_cache_stats()['size'] == 0
+
+    fresh = AQIPredictionSystem()
+    fresh.load_models(model_files['second'])
+    after = system.predict_aqi_for_dates(DATES, 'rf')
+    assert after == fresh.predict_aqi_for_dates(DATES, 'rf') and after != before
+
+
+def test_a_file_without_models_is_rejected_and_not_retried(system, model_path, monkeypatch):
+    reloader = ModelReloader(system, model_path, watch_seconds=0.001)
+    old_set, old_info = system.model_set, dict(system.model_file_info)
+    before = system.predict_aqi_for_dates(DATES, 'rf')
+
+    tmp = model_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump({}, f)
+    os.replace(tmp, model_path)
+    status = reload(reloader)
+    assert status['last_result'] == 'rejected' and status['reloads'] == 0
+    assert 'no usable models' in status['last_error']
+    assert system.model_set is old_set
+    assert dict(system.model_file_info) == old_info  # the rejected file's summary isn't published
+    assert system.predict_aqi_for_dates(DATES, 'rf') == before
+
+    started = []
+    monkeypatch.setattr(reloader, 'start', lambda trigger='manual': started.append(trigger))
+    reloader._last_check = 0
+    reloader.maybe_check()
+    assert started == []
+
+
+def test_a_file_that_does_not_unpickle_keeps_the_current_set(system, model_path):
+    old_set = system.model_set
+    with open(model_path, 'wb') as f:
+        f.write(b'not a pickle')
+    status = reload(ModelReloader(system, model_path))
+    assert status['last_result'] == 'rejected' and system.model_set is old_set
+
+
+class ConstantModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value, dtype=float)
+
+
+def test_requests_see_one_version_while_a_reload_lands(system, model_path, monkeypatch):
+    expected_old = system.predict_aqi_for_dates(DATES, 'rf')
+    system.clear_caches()
+    current = system.model_set
+    stub = ModelSet(version='stub', trained_models={'rf': ConstantModel(77)}, best_model_name='rf',
+                    model_performances=current.model_performances, feature_columns=current.feature_columns)
+    monkeypatch.setattr(system, 'build_model_set', lambda filename, debug=None: stub)
+
+    # An in-flight request holds the old rf model inside predict()
+    model = current.trained_models['rf']
+    entered, release = threading.Event(), threading.Event()
+
+    def held_predict(X, original=model.predict):
+        entered.set()
+        release.wait(30)
+        return original(X)
+
+    monkeypatch.setattr(model, 'predict', held_predict)
+    in_flight = []
+    request = threading.Thread(target=lambda: in_flight.append(system.predict_aqi_for_dates(DATES, 'rf')))
+    request.start()
+    assert entered.wait(30)
+
+    assert reload(ModelReloader(system, model_path))['last_result'] == 'swapped'
+    assert system.model_version == 'stub'
+    assert system.predict_aqi_for_dates(DATES, 'rf') == [77] * len(DATES)
+
+    release.set()
+    request.join(30)
+    assert in_flight == [expected_old]  # all from the set it started with
+    # What it cached went in under the old version; later requests still get the new set
+    assert system.predict_aqi_for_dates(DATES, 'rf') == [77] * len(DATES)
+    assert [system.predict_aqi_for_date(date, 'rf') for date in DATES] == [77] * len(DATES)
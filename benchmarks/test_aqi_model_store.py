@@ -0,0 +1,131 @@
+"""
+aqi_model_store: the split model file, models loaded on first use and unloaded when idle
+"""
+
+import os
+import shutil
+from datetime import datetime, timedelta
+
+import pytest
+
+import aqi_model_store
+from aqi_bench import write_stand_in_models
+from aqi_model_store import LazyModelRegistry, read_manifest
+from aqi_prediction_system import AQIPredictionSystem
+
+DATES = [datetime(2025, 12, 20) + timedelta(days=i) for i in range(10)]
+MODELS = ['gbr', 'rf', 'et', 'xgboost']
+
+
+@pytest.fixture(scope='module')
+def model_files(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('model-files')
+    files = {}
+    for name, seed in (('first', 0), ('second', 5)):
+        files[name] = str(directory / f'{name}.pkl')
+        write_stand_in_models(files[name], seed=seed)
+    return files
+
+
+@pytest.fixture
+def split_path(tmp_path, model_files):
+    """A copy of the stand-in models, split as startup.sh does"""
+    path = str(tmp_path / 'aqi_4_models.pkl')
+    shutil.copy(model_files['first'], path)
+    AQIPredictionSystem().build_model_set(path, split=True)
+    assert read_manifest(path) is not None
+    return path
+
+
+def eager_predictions(path, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setenv('AQI_LAZY_MODELS', '0')
+        system = AQIPredictionSystem()
+        system.load_models(path)
+        return {name: system.predict_aqi_for_dates(DATES, name) for name in MODELS}
+
+
+def test_split_models_load_on_first_use(split_path, monkeypatch):
+    expected = eager_predictions(split_path, monkeypatch)
+    loads = []
+    original_load = aqi_model_store.pickle.load
+    monkeypatch.setattr(aqi_model_store.pickle, 'load', lambda f: loads.append(os.path.basename(f.name)) or original_load(f))
+
+    system = AQIPredictionSystem()
+    system.load_models(split_path)
+    assert system.model_set.loaded_model_names() == ['gbr'] and len(loads) == 1
+    assert system.model_file_info['type'] == 'split'
+
+    assert system.predict_aqi_for_dates(DATES, 'rf') == expected['rf']
+    assert sorted(system.model_set.loaded_model_names()) == ['gbr', 'rf'] and len(loads) == 2
+    assert {name: system.predict_aqi_for_dates(DATES, name) for name in MODELS} == expected
+    assert len(loads) == len(MODELS)  # each model file read once
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_idle_models_are_unloaded_except_the_pinned_ones(split_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(aqi_model_store.time, 'monotonic', clock)
+    manifest = read_manifest(split_path)
+    registry = LazyModelRegistry(os.path.dirname(split_path), manifest['models'], pinned=['gbr'], idle_seconds=10)
+    assert registry.loaded_names() == [] and list(registry) == MODELS
+
+    gbr, rf = registry['gbr'], registry['rf']
+    clock.now += 4
+    registry['et']
+    assert sorted(registry.loaded_names()) == ['et', 'gbr', 'rf']
+
+    clock.now += 7   # rf and gbr idle for 11s, et for 7s
+    registry['et']
+    assert sorted(registry.loaded_names()) == ['et', 'gbr']
+    assert registry['gbr'] is gbr
+
+    reloaded = registry['rf']  # read from its file again on the next use
+    assert reloaded is not rf and type(reloaded) is type(rf)
+    assert 'rf' in registry.loaded_names()
+
+
+def test_idle_unloading_is_off_by_default(split_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(aqi_model_store.time, 'monotonic', clock)
+    monkeypatch.delenv('AQI_MODEL_IDLE_SECONDS', raising=False)
+    registry = LazyModelRegistry(os.path.dirname(split_path), read_manifest(split_path)['models'])
+    registry['rf']
+    clock.now += 10 ** 6
+    registry['et']
+    assert sorted(registry.loaded_names()) == ['et', 'rf']
+
+
+def test_a_manifest_of_another_file_is_not_used(split_path, model_files, monkeypatch):
+    shutil.copy(model_files['second'], split_path)
+    assert read_manifest(split_path) is None
+
+    system = AQIPredictionSystem()
+    system.load_models(split_path)
+    assert system.model_file_info['type'] == 'dict'  # read whole, not from the old split
+    assert {name: system.predict_aqi_for_dates(DATES, name) for name in MODELS} == eager_predictions(
+        model_files['second'], monkeypatch)
+
+
+def test_a_touched_but_unchanged_file_keeps_its_split(split_path):
+    before = read_manifest(split_path)
+    stat = os.stat(split_path)
+    os.utime(split_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    manifest = read_manifest(split_path)
+    assert manifest is not None and manifest['sha256'] == before['sha256']
+    assert manifest['mtime_ns'] == os.stat(split_path).st_mtime_ns
+    assert read_manifest(split_path)['mtime_ns'] == manifest['mtime_ns']  # written back
+
+
+def test_a_split_with_a_missing_model_file_is_not_used(split_path):
+    manifest = read_manifest(split_path)
+    os.remove(os.path.join(os.path.dirname(split_path), manifest['models'][1]['file']))
+    assert read_manifest(split_path) is None
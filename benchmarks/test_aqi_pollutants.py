@@ -0,0 +1,79 @@
+"""
+/api/pollutants: one batched month gives what the per-day code paths give
+"""
+
+import contextlib
+from datetime import datetime
+
+import pytest
+
+from aqi_prediction_system import ModelSet
+
+YEAR, MONTH = 2025, 11
+DISPLAY_NAMES = {
+    'PM2.5 - Local Conditions': 'PM2.5', 'Ozone': 'O3', 'Nitrogen dioxide (NO2)': 'NO2',
+    'Sulfur dioxide': 'SO2', 'Carbon monoxide': 'CO', 'PM10 Total 0-10um STP': 'PM10',
+}
+
+
+@contextlib.contextmanager
+def best_model(system, name):
+    """The current models with ``name`` as the best one"""
+    current = system.model_set
+    previous = system.swap_model_set(ModelSet(
+        version=f'{current.version}-best-{name}', trained_models=dict(current.trained_models),
+        compiled_models=dict(current.compiled_models), model_performances=current.model_performances,
+        best_model_name=name, feature_columns=current.feature_columns, models=current.models))
+    try:
+        yield
+    finally:
+        system.swap_model_set(previous)
+
+
+@pytest.fixture(params=['gbr', 'rf'])
+def model_system(request, bench_env):
+    with bench_env.mode('model') as system, best_model(system, request.param):
+        bench_env.clear_caches()
+        yield system
+
+
+def per_day(fn):
+    days = range(1, 31)  # November
+    return [fn(f'{YEAR}-{MONTH:02d}-{day:02d}', datetime(YEAR, MONTH, day)) for day in days]
+
+
+def test_month_aqi_equals_the_per_day_values(bench_env, model_system):
+    fb = bench_env.fb
+    month_aqi = fb.compute_month_aqi(YEAR, MONTH)
+    model_system.clear_caches()
+    assert month_aqi == per_day(lambda date_str, _: fb.get_consistent_aqi_for_date(date_str))
+
+    batched = fb.generate_working_chart_data('daily', 'PM2.5', YEAR, MONTH, month_aqi)
+    assert batched == fb.generate_working_chart_data('daily', 'PM2.5', YEAR, MONTH)
+
+
+def test_calendar_and_peaks_match_the_per_day_code_paths(bench_env, model_system):
+    fb = bench_env.fb
+    payload = bench_env.get(f'/api/pollutants?year={YEAR}&month={MONTH}').get_json()
+
+    model_system.clear_caches()
+    # Calendar AQI from the gradient boosting model; main pollutant and peaks from the best model
+    expected_aqi = per_day(lambda date_str, _: fb.get_consistent_aqi_for_date(date_str))
+    expected_main = per_day(lambda _, date: model_system.get_main_pollutant_for_date(date))
+    assert [day['aqi'] for day in payload['calendar_data']] == expected_aqi
+    assert [day['main_pollutant'] for day in payload['calendar_data']] == [
+        DISPLAY_NAMES.get(name, name) for name in expected_main]
+
+    best_aqi = per_day(lambda _, date: model_system.predict_aqi_for_date(date))
+    peaks = model_system.get_highest_concentration_days(YEAR, MONTH, daily_aqi=best_aqi)
+    assert [(peak['pollutant'], peak['day'], peak['concentration']) for peak in payload['highest_concentration']] == [
+        (DISPLAY_NAMES.get(name, name), peak['day'], peak['concentration']) for name, peak in peaks.items()]
+
+
+def test_simulation_mode_calendar_is_the_simulated_aqi(bench_env):
+    with bench_env.mode('simulation'):
+        bench_env.clear_caches()
+        payload = bench_env.get(f'/api/pollutants?year={YEAR}&month={MONTH}').get_json()
+        fb = bench_env.fb
+        assert [day['aqi'] for day in payload['calendar_data']] == per_day(
+            lambda date_str, _: fb.get_consistent_aqi_for_date(date_str))
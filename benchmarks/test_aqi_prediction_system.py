@@ -0,0 +1,215 @@
+"""
+AQIPredictionSystem: batched and per-date predictions, caches and model sets
+"""
+
+import os
+import json
+import pickle
+import signal
+import warnings
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import aqi_prediction_system
+from aqi_bench import write_stand_in_models
+from aqi_prediction_system import AQIPredictionSystem, PredictionCache
+
+MODEL_NAMES = ['gbr', 'rf', 'et', 'xgboost', 'gradient_boosting', 'random_forest', None]
+DATES = [datetime(2025, 12, 20) + timedelta(days=i) for i in range(20)]
+
+
+@pytest.fixture(scope='module')
+def model_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('models') / 'aqi_4_models.pkl')
+    write_stand_in_models(path)
+    return path
+
+
+@pytest.fixture
+def system(model_file):
+    system = AQIPredictionSystem()
+    system.load_models(model_file)
+    assert system.use_trained_models
+    return system
+
+
+@pytest.fixture
+def simulation_system(tmp_path):
+    system = AQIPredictionSystem()
+    system.load_models(str(tmp_path / 'missing.pkl'))
+    return system
+
+
+@pytest.mark.parametrize('model_name', MODEL_NAMES)
+@pytest.mark.parametrize('mode', ['model', 'simulation'])
+def test_batch_equals_per_date_predictions(mode, model_name, request):
+    system = request.getfixturevalue('system' if mode == 'model' else 'simulation_system')
+    batch = system.predict_aqi_for_dates(DATES, model_name)
+    system.clear_caches()
+    assert batch == [system.predict_aqi_for_date(date, model_name) for date in DATES]
+    assert all(value is not None for value in batch)
+
+
+def write_named_column_models(path, feature_columns=None):
+    """The stand-in models refitted on a DataFrame, so they carry feature_names_in_"""
+    write_stand_in_models(path)
+    with open(path, 'rb') as f:
+        data = pickle.load(f)
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(50, 20, (300, len(data['feature_columns']))), columns=data['feature_columns'])
+    y = 0.6 * X['aqi_lag_1'] + 0.3 * X['aqi_ma_7'] + rng.normal(0, 3, len(X))
+    for entry in data['models'].values():
+        entry['model'].fit(X, y)
+    if feature_columns is not None:
+        data['feature_columns'] = feature_columns
+    with open(path, 'wb') as f:
+        pickle.dump(data, f)
+    return data
+
+
+def test_models_fitted_on_named_columns_get_a_dataframe(tmp_path, monkeypatch):
+    monkeypatch.setenv('AQI_COMPILED_TREES', '0')
+    path = str(tmp_path / 'aqi_4_models.pkl')
+    data = write_named_column_models(path)
+    system = AQIPredictionSystem()
+    system.load_models(path)
+
+    features = pd.DataFrame(system._build_feature_matrix(DATES), columns=data['feature_columns'])
+    expected = [max(15, min(150, round(float(p)))) for p in data['models']['rf']['model'].predict(features)]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')  # e.g. "X does not have valid feature names"
+        assert system.predict_aqi_for_dates(DATES, 'rf') == expected
+
+
+def test_mismatched_column_names_fail_without_the_minimal_feature_fallback(tmp_path, monkeypatch):
+    monkeypatch.setenv('AQI_COMPILED_TREES', '0')
+    path = str(tmp_path / 'aqi_4_models.pkl')
+    columns = list(AQIPredictionSystem.EXACT_COLUMN_ORDER)
+    write_named_column_models(path, feature_columns=columns[1:] + columns[:1])
+    system = AQIPredictionSystem()
+    system.load_models(path)
+
+    calls = []
+    model = system.trained_models['gbr']
+    monkeypatch.setattr(model, 'predict', lambda X, original=model.predict: calls.append(X.shape) or original(X))
+    assert system.predict_aqi_for_dates(DATES[:3], 'gbr') == [None] * 3
+    assert calls == [(3, len(columns))]
+
+
+def test_prediction_cache_evicts_the_least_recently_used():
+    cache = PredictionCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1      # 'b' is now the oldest
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1 and len(cache) == 2
+
+    disabled = PredictionCache(max_size=0)
+    disabled.put('a', 1)
+    assert disabled.get('a') is None
+
+
+@pytest.fixture(scope='module')
+def other_model_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('other-models') / 'aqi_4_models.pkl')
+    write_stand_in_models(path, seed=5)
+    return path
+
+
+def test_swapping_the_model_set_drops_cached_predictions(system, other_model_file):
+    before = system.predict_aqi_for_dates(DATES, 'rf')
+    assert system.get_cache_stats()['size'] == len(DATES)
+
+    fresh = AQIPredictionSystem()
+    fresh.load_models(other_model_file)
+    expected = fresh.predict_aqi_for_dates(DATES, 'rf')
+    assert expected != before  # the two stand-ins disagree on some dates
+
+    system.swap_model_set(system.build_model_set(other_model_file))
+    assert system.get_cache_stats()['size'] == 0
+    assert system.predict_aqi_for_dates(DATES, 'rf') == expected
+
+
+def test_main_pollutant_is_predicted_with_the_set_it_is_cached_under(system, other_model_file):
+    old_version = system.model_version
+    new_set = system.build_model_set(other_model_file)
+    cache = system._prediction_cache
+    original_get = cache.get
+
+    def get_then_reload(key, default=None):
+        # A reload landing right after the cache key was taken
+        if key[0] == 'main_pollutant' and system.model_version == old_version:
+            system.swap_model_set(new_set)
+        return original_get(key, default)
+
+    cache.get = get_then_reload
+    system.get_main_pollutant_for_date(DATES[0])
+    cache.get = original_get
+
+    keys = list(cache._data)
+    assert {key[-1] for key in keys} == {old_version}, keys
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_model_file_is_unpickled_once(model_file, monkeypatch, debug):
+    monkeypatch.setenv('AQI_LAZY_MODELS', '0')
+    reads = []
+    original_load = aqi_prediction_system.pickle.load
+    monkeypatch.setattr(aqi_prediction_system.pickle, 'load', lambda f: reads.append(f.name) or original_load(f))
+
+    system = AQIPredictionSystem()
+    system.load_models(model_file, debug=debug)
+    assert reads == [model_file]
+    assert system.use_trained_models
+    # A summary only; the unpickled models aren't kept alive through it
+    assert system.model_file_info == {'exists': True, 'size': os.path.getsize(model_file), 'type': 'dict', 'source': None}
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_preloaded_system_keeps_working_in_a_forked_worker(system):
+    # As under gunicorn --preload: the master loaded the models, and a startup thread
+    # holds the caches' locks at the moment the worker is forked
+    expected = system.predict_aqi_for_dates_by_model(DATES)
+    system.clear_caches()
+    held = [system._prediction_cache._lock, system._yearly_aqi_tables._lock, system._yearly_tables_lock]
+    locked, release = threading.Event(), threading.Event()
+
+    def hold():
+        for lock in held:
+            lock.acquire()
+        locked.set()
+        release.wait()
+        for lock in held:
+            lock.release()
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    locked.wait()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # the worker
+        try:
+            signal.alarm(20)  # a lock still held would hang here
+            os.close(read_end)
+            result = {
+                'by_model': system.predict_aqi_for_dates_by_model(DATES),  # runs on the model pool
+                'table': system.get_yearly_aqi_table(2026, 'rf')[:3].tolist(),
+            }
+            os.write(write_end, json.dumps(result).encode())
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    release.set()
+    holder.join()
+    with os.fdopen(read_end) as f:
+        output = f.read()
+    os.waitpid(pid, 0)
+    result = json.loads(output)
+    assert result['by_model'] == expected
+    assert result['table'] == system.predict_aqi_for_dates(DATES[12:15], 'rf')
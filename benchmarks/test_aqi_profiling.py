@@ -0,0 +1,91 @@
+"""
+aqi_profiling: who may ask for a profile, how many files are kept, and streamed responses
+"""
+
+import os
+import time
+import pstats
+
+import pytest
+
+from aqi_profiling import PROFILE_FILE_HEADER, PROFILE_HEADER, RequestProfiler
+
+
+def make_profiler(tmp_path, **settings):
+    return RequestProfiler({'AQI_PROFILE_DIR': str(tmp_path), **settings})
+
+
+@pytest.fixture
+def profiled_app(bench_env, tmp_path, monkeypatch):
+    """The app profiling header requests from 10.0.0.0/8, writing to tmp_path"""
+    monkeypatch.setattr(bench_env.fb, 'request_profiler', make_profiler(tmp_path, AQI_PROFILE_ALLOWED_IPS='10.0.0.0/8, bogus'))
+    with bench_env.mode('model'):
+        bench_env.clear_caches()
+        yield bench_env.client
+
+
+def get(client, url, remote_addr, profile='1'):
+    headers = {PROFILE_HEADER: profile} if profile else {}
+    return client.get(url, headers=headers, environ_base={'REMOTE_ADDR': remote_addr})
+
+
+def test_header_is_honoured_only_from_allowed_addresses(profiled_app, tmp_path):
+    url = '/api/prediction?date=2025-08-09'
+    response = get(profiled_app, url, '10.1.2.3')
+    name = response.headers[PROFILE_FILE_HEADER]
+    assert name.endswith('.pstats') and 'get_prediction_data' in name
+    assert os.listdir(tmp_path) == [name]
+    pstats.Stats(str(tmp_path / name))  # a readable profile
+
+    for remote_addr, profile in (('192.168.1.5', '1'), ('not-an-address', '1'), ('10.1.2.3', None)):
+        response = get(profiled_app, url, remote_addr, profile)
+        assert response.status_code == 200 and PROFILE_FILE_HEADER not in response.headers
+    assert os.listdir(tmp_path) == [name]
+
+    sampled = get(profiled_app, url, '10.1.2.3', 'sample').headers.get(PROFILE_FILE_HEADER)
+    assert sampled is None or sampled.endswith('.collapsed')  # nothing to write if it beat the first sample
+
+
+def test_nothing_is_allowed_without_the_setting(tmp_path):
+    profiler = make_profiler(tmp_path)
+    assert not profiler.enabled
+    assert profiler.start({PROFILE_HEADER: '1'}, '127.0.0.1') is None
+
+
+def test_only_the_newest_profiles_are_kept(tmp_path):
+    profiler = make_profiler(tmp_path, AQI_PROFILE_ALLOWED_IPS='127.0.0.1', AQI_PROFILE_KEEP='3')
+    names = []
+    for _ in range(5):
+        active = profiler.start({PROFILE_HEADER: '1'}, '127.0.0.1')
+        names.append(profiler.finish(active, 'endpoint'))
+        time.sleep(0.01)  # distinct modification times
+    (tmp_path / 'notes.txt').write_text('not a profile')
+
+    assert sorted(os.listdir(tmp_path)) == sorted(names[2:] + ['notes.txt'])
+
+
+def test_sampled_requests_are_kept_only_when_slow(tmp_path):
+    profiler = make_profiler(tmp_path, AQI_PROFILE_SAMPLE_EVERY='2', AQI_PROFILE_SLOW_MS='50')
+    assert profiler.start({}, '127.0.0.1') is None     # the first of every two
+    active = profiler.start({}, '127.0.0.1')
+    assert profiler.finish(active, 'fast') is None
+    assert profiler.start({}, '127.0.0.1') is None
+    active = profiler.start({}, '127.0.0.1')
+    time.sleep(0.06)
+    assert profiler.finish(active, 'slow') is not None
+
+
+def test_streamed_export_is_profiled_until_the_body_is_closed(profiled_app, tmp_path):
+    response = get(profiled_app, '/api/export?start=2025-08-01&days=45&models=gbr', '10.1.2.3')
+    assert PROFILE_FILE_HEADER not in response.headers  # sent before the body is generated
+    assert os.listdir(tmp_path) == []
+    assert response.get_data()
+    response.close()
+
+    [name] = os.listdir(tmp_path)
+    assert 'export_series' in name
+    functions = {function for _, _, function in pstats.Stats(str(tmp_path / name)).stats}
+    assert {'export_body', 'predict_batch_columns'} <= functions
+
+    # and the profiler is free for the next request
+    assert PROFILE_FILE_HEADER in get(profiled_app, '/api/prediction?date=2025-08-09', '10.1.2.3').headers
@@ -0,0 +1,105 @@
+"""
+aqi_response_cache: ETags and 304s on the cached GET endpoints, and no stale responses after a model swap
+"""
+
+import time
+
+import pytest
+
+from aqi_bench import write_stand_in_models
+from aqi_response_cache import ResponseCache
+
+URL = '/api/prediction?date=2025-08-09&model=rf'
+
+
+@pytest.fixture
+def client(bench_env):
+    with bench_env.mode('model'):
+        bench_env.clear_caches()
+        yield bench_env.client
+
+
+@pytest.fixture(scope='module')
+def other_model_file(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('other-models') / 'aqi_4_models.pkl')
+    write_stand_in_models(path, seed=5)
+    return path
+
+
+def test_repeat_is_served_from_the_cache_with_the_same_etag(client, bench_env):
+    cache = bench_env.fb.response_cache
+    hits = cache.stats()['hits']
+    first = client.get(URL)
+    second = client.get(URL)
+    assert first.status_code == second.status_code == 200
+    assert first.headers['ETag'] and first.headers['ETag'] == second.headers['ETag']
+    assert first.get_data() == second.get_data()
+    assert 'max-age=' in first.headers['Cache-Control']
+    assert cache.stats()['hits'] == hits + 1 and len(cache) == 1
+
+    # Parameter order is not part of the key
+    reordered = client.get('/api/prediction?model=rf&date=2025-08-09')
+    assert reordered.headers['ETag'] == first.headers['ETag'] and len(cache) == 1
+
+
+def test_if_none_match_gets_a_304_without_a_body(client, bench_env):
+    not_modified = bench_env.fb.response_cache.stats()['not_modified']
+    etag = client.get(URL).headers['ETag']
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 304 and response.get_data() == b''
+    assert response.headers['ETag'] == etag
+    assert bench_env.fb.response_cache.stats()['not_modified'] == not_modified + 1
+
+    assert client.get(URL, headers={'If-None-Match': '"something-else"'}).status_code == 200
+
+
+def test_errors_are_not_cached(client, bench_env):
+    assert client.get('/api/prediction?date=not-a-date').status_code != 200
+    assert len(bench_env.fb.response_cache) == 0
+
+
+def test_model_swap_drops_cached_responses(client, bench_env, other_model_file):
+    fb, system = bench_env.fb, bench_env.model_system
+    before = client.get(URL)
+    assert len(fb.response_cache) == 1
+
+    previous = system.swap_model_set(system.build_model_set(other_model_file))
+    try:
+        fb.on_model_swap(previous, system.model_set)
+        assert len(fb.response_cache) == 0
+
+        after = client.get(URL, headers={'If-None-Match': before.headers['ETag']})
+        assert after.status_code == 200 and after.headers['ETag'] != before.headers['ETag']
+        bench_env.clear_caches()
+        assert after.get_data() == client.get(URL).get_data()  # built from the new models
+    finally:
+        fb.on_model_swap(system.swap_model_set(previous), previous)
+    assert client.get(URL).get_data() == before.get_data()
+
+
+def test_model_version_is_part_of_the_key(client, bench_env, other_model_file):
+    # Even without on_model_swap clearing it, an entry built from the old models isn't served
+    system = bench_env.model_system
+    before = client.get(URL)
+    previous = system.swap_model_set(system.build_model_set(other_model_file))
+    try:
+        assert client.get(URL).headers['ETag'] != before.headers['ETag']
+    finally:
+        system.swap_model_set(previous)
+    assert client.get(URL).headers['ETag'] == before.headers['ETag']
+
+
+def test_cache_is_bounded_by_body_bytes_and_drops_expired_entries():
+    cache = ResponseCache(max_bytes=10)
+    cache.put('a', 'etag-a', b'12345')
+    cache.put('b', 'etag-b', b'12345')
+    assert cache.get('a') is not None           # 'b' is now the oldest
+    cache.put('c', 'etag-c', b'123')
+    assert cache.get('b') is None and cache.get('a') and cache.get('c')
+    assert cache.stats()['bytes'] == 8 and cache.stats()['evictions'] == 1
+
+    cache.put('too-big', 'etag', b'x' * 11)
+    assert cache.get('too-big') is None
+
+    cache.put('old', 'etag-old', b'1', expires_at=time.time() - 1)
+    assert cache.get('old') is None and 'old' not in cache._entries
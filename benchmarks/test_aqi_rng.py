@@ -0,0 +1,75 @@
+"""
+Simulated values come from call-local generators: the same on every thread, in any order
+"""
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from aqi_prediction_system import AQIPredictionSystem
+
+DATE_STRS = [(datetime(2025, 1, 1) + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(0, 365, 7)]
+MODEL_NAMES = ['gbr', 'rf', 'et', 'xgboost', None]
+
+
+@pytest.fixture(scope='module')
+def simulation_system(tmp_path_factory):
+    system = AQIPredictionSystem(cache_size=0)  # every call draws again
+    system.load_models(str(tmp_path_factory.mktemp('models') / 'missing.pkl'))
+    return system
+
+
+def run_concurrently(calls, threads=8, rounds=4):
+    """Every call ``rounds`` times, shuffled over a thread pool; [results per round] in ``calls`` order"""
+    jobs = [(index, fn) for index, fn in enumerate(calls)] * rounds
+    random.Random(0).shuffle(jobs)
+
+    def run(job):
+        np.random.seed(job[0])  # global reseeding elsewhere must not leak into the values
+        return job[0], job[1]()
+
+    results = [[] for _ in calls]
+    with ThreadPoolExecutor(threads) as pool:
+        for index, value in pool.map(run, jobs):
+            results[index].append(value)
+    return results
+
+
+def assert_deterministic(calls):
+    expected = [fn() for fn in calls]
+    for index, values in enumerate(run_concurrently(calls)):
+        assert all(value == expected[index] for value in values), index
+
+
+def test_simulated_aqi_is_the_same_on_every_thread(simulation_system):
+    assert_deterministic([
+        lambda date_str=date_str, model=model: simulation_system._predict_with_simulation(date_str, model)
+        for date_str in DATE_STRS for model in MODEL_NAMES
+    ])
+
+
+def test_pollutant_concentrations_are_the_same_on_every_thread(simulation_system):
+    assert_deterministic([
+        lambda date_str=date_str: simulation_system.predict_pollutant_concentrations(date_str, aqi=80)
+        for date_str in DATE_STRS
+    ])
+
+
+def test_api_simulations_are_the_same_on_every_thread(bench_env):
+    fb = bench_env.fb
+    assert_deterministic(
+        [lambda date_str=date_str: fb.simulate_consistent_aqi(date_str, 6) for date_str in DATE_STRS]
+        + [lambda date_str=date_str: fb.simulated_concentrations(date_str) for date_str in DATE_STRS]
+    )
+
+
+def test_global_random_state_is_left_alone(simulation_system, bench_env):
+    np.random.seed(1234)
+    state = np.random.get_state()[1].copy()
+    simulation_system._predict_with_simulation(DATE_STRS[0], 'rf')
+    simulation_system.predict_pollutant_concentrations(DATE_STRS[0], aqi=80)
+    bench_env.fb.simulate_consistent_aqi(DATE_STRS[0])
+    np.testing.assert_array_equal(np.random.get_state()[1], state)
@@ -0,0 +1,49 @@
+"""
+aqi_tree_compiler: compiled ensembles predict exactly what sklearn predicts
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from aqi_tree_compiler import boundary_rows, compile_model, equivalent
+
+N_FEATURES = 6
+
+MODELS = {
+    'gbr': lambda: GradientBoostingRegressor(n_estimators=50, max_depth=3, random_state=0),
+    'gbr_huber': lambda: GradientBoostingRegressor(loss='huber', n_estimators=30, max_depth=4, learning_rate=0.2, random_state=0),
+    'rf': lambda: RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+    'et': lambda: ExtraTreesRegressor(n_estimators=20, max_depth=8, random_state=0),
+}
+
+
+@pytest.fixture(scope='module')
+def training_data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(50, 20, (600, N_FEATURES))
+    y = 0.6 * X[:, 0] + 0.3 * X[:, 1] + 5 * np.sin(X[:, 2]) + rng.normal(0, 3, len(X))
+    return X, y
+
+
+@pytest.mark.parametrize('name', MODELS)
+def test_compiled_predictions_equal_sklearn(name, training_data):
+    X, y = training_data
+    model = MODELS[name]().fit(X, y)
+    compiled = compile_model(model)
+    assert compiled is not None
+
+    rng = np.random.default_rng(1)
+    for rows in (rng.normal(50, 20, (500, N_FEATURES)), boundary_rows(compiled), X[:1]):
+        np.testing.assert_array_equal(compiled.predict(rows), model.predict(rows))
+    assert compiled.predict(X[:0]).shape == (0,)
+    assert equivalent(compiled, model, boundary_rows(compiled, seed=2)) == (True, 0.0)
+
+
+def test_unsupported_models_are_not_compiled(training_data):
+    X, y = training_data
+    assert compile_model(LinearRegression().fit(X, y)) is None
+    assert compile_model(RandomForestRegressor(n_estimators=2)) is None   # not fitted
+    two_outputs = RandomForestRegressor(n_estimators=2, random_state=0).fit(X, np.column_stack([y, y]))
+    assert compile_model(two_outputs) is None
@@ -0,0 +1,97 @@
+"""
+WarmupJob progress reporting, and fresh locks in a forked child (aqi_forksafe)
+"""
+
+import os
+import signal
+import threading
+
+import pytest
+
+import aqi_forksafe
+from aqi_warmup import WarmupJob
+
+
+def wait_until_done(job, timeout=10):
+    job._thread.join(timeout)
+    assert job.state == 'done'
+
+
+def test_status_reports_the_current_and_failed_steps():
+    in_step, release = threading.Event(), threading.Event()
+
+    def slow():
+        in_step.set()
+        release.wait(10)
+
+    def broken():
+        raise RuntimeError('boom')
+
+    job = WarmupJob(lambda: [('slow', slow), ('broken', broken), ('fine', lambda: None)])
+    job.start()
+    in_step.wait(10)
+    status = job.status()
+    assert (status['state'], status['current_step'], status['steps_done'], status['steps_total']) == ('running', 'slow', 0, 3)
+
+    release.set()
+    wait_until_done(job)
+    status = job.status()
+    assert status['ready'] and status['current_step'] is None and status['progress'] == 1.0
+    assert status['failed_steps'] == ['broken']
+
+
+def test_a_superseded_run_leaves_the_new_run_alone():
+    in_step, release = threading.Event(), threading.Event()
+    runs = []
+
+    def first_run_step():
+        in_step.set()
+        release.wait(10)
+        raise RuntimeError('from the old run')
+
+    def build_steps():
+        runs.append(len(runs))
+        return [('step', first_run_step)] if len(runs) == 1 else [('step', lambda: None)]
+
+    job = WarmupJob(build_steps)
+    job.start()
+    in_step.wait(10)
+    old_thread = job._thread
+    job.start()
+    wait_until_done(job)
+    release.set()
+    old_thread.join(10)
+
+    status = job.status()
+    assert status['failed_steps'] == [] and status['steps_done'] == status['steps_total'] == 1
+
+
+class LockOwner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        aqi_forksafe.register(self)
+
+    def _reset_locks(self):
+        self._lock = threading.Lock()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_registered_locks_are_fresh_in_a_forked_child():
+    owner, job = LockOwner(), WarmupJob(lambda: [])
+    held = [owner._lock, job._lock]
+    for lock in held:
+        lock.acquire()
+    try:
+        pid = os.fork()
+        if pid == 0:
+            ok = False
+            try:
+                signal.alarm(10)
+                ok = owner._lock.acquire(timeout=1) and job._lock.acquire(timeout=1)
+            finally:
+                os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+    finally:
+        for lock in held:
+            lock.release()
+    assert os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
@@ -1,25 +1,154 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, g, jsonify, request, send_from_directory, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from datetime import datetime, timedelta
 import json
 import numpy as np
-import random
 import calendar
+import csv
+import gc
 import hashlib
+import hmac
+import io
 import math
 import os
+import time
+import logging
+from functools import lru_cache, partial
+
+from aqi_logging import configure_logging
+from aqi_metrics import REGISTRY as metrics_registry, counter, histogram
+from aqi_profiling import PROFILE_FILE_HEADER, RequestProfiler
+from aqi_history_store import AQI_COLUMN, AQIHistoryStore
+from aqi_model_reload import ModelReloader
+from aqi_response_cache import ResponseCache, cached_response
+from aqi_warmup import WarmupJob
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # Import the FIXED AQI prediction system
 try:
-    from aqi_prediction_system import AQIPredictionSystem
+    from aqi_prediction_system import AQIPredictionSystem, PREDICTION_CALLER, TaskGroup, prediction_caller
     HAS_AQI_SYSTEM = True
 except ImportError:
-    print("AQI System not found. Please run aqi_prediction_system.py first.")
+    logger.warning('AQI System not found. Please run aqi_prediction_system.py first.')
     HAS_AQI_SYSTEM = False
+    PREDICTION_CALLER = None
 
 app = Flask(__name__, static_folder=".", static_url_path="")
 CORS(app)  # Enable CORS for all routes
 
+# Request-level metrics (prediction stages are timed inside AQIPredictionSystem)
+REQUEST_SECONDS = histogram('aqi_http_request_duration_seconds', 'Time to build the response, per endpoint', ['endpoint'])
+REQUESTS_TOTAL = counter('aqi_http_requests_total', 'Requests handled', ['endpoint', 'method', 'status'])
+JSON_ENCODE_TIMER = histogram('aqi_json_encode_seconds', 'Time spent serializing JSON responses')
+SIMULATION_FALLBACKS = counter('aqi_simulation_fallbacks_total',
+                               'Values served from the simulation because the trained model failed', ['site'])
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify() with its serialization time recorded"""
+    def dumps(self, obj, **kwargs):
+        with JSON_ENCODE_TIMER.time():
+            return super().dumps(obj, **kwargs)
+
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.labels(endpoint=endpoint).observe(time.perf_counter() - started)
+        REQUESTS_TOTAL.labels(endpoint=endpoint, method=request.method, status=response.status_code).inc()
+    metrics_registry.maybe_flush()
+    return response
+
+# Opt-in profiling of single API requests (see aqi_profiling for the AQI_PROFILE_* settings)
+request_profiler = RequestProfiler()
+PROFILE_EXCLUDED_ENDPOINTS = {'health_check', 'get_metrics'}
+PROFILES_WRITTEN = counter('aqi_profiles_written_total', 'Request profiles kept on disk', ['trigger'])
+
+@app.before_request
+def start_request_profile():
+    if (request_profiler.enabled and request.path.startswith('/api/')
+            and request.endpoint not in PROFILE_EXCLUDED_ENDPOINTS):
+        g.active_profile = request_profiler.start(request.headers, request.remote_addr)
+
+def record_request_profile(active, endpoint):
+    name = request_profiler.finish(active, endpoint)
+    if name:
+        PROFILES_WRITTEN.labels(trigger=active.trigger).inc()
+    return name
+
+@app.after_request
+def finish_request_profile(response):
+    active = g.pop('active_profile', None)
+    if active is None:
+        return response
+    if response.is_streamed:
+        # The body (/api/export) is generated after this returns; keep profiling until the
+        # server closes it. Its headers are sent by then, so the file name is only logged.
+        endpoint = request.endpoint
+        response.call_on_close(lambda: record_request_profile(active, endpoint))
+        return response
+    name = record_request_profile(active, request.endpoint)
+    if name and active.trigger == 'header':
+        response.headers[PROFILE_FILE_HEADER] = name
+    return response
+
+@app.teardown_request
+def discard_request_profile(exc=None):
+    # after_request didn't run (the request failed before a response existed); free the profiler
+    active = g.pop('active_profile', None)
+    if active is not None:
+        request_profiler.finish(active, request.endpoint)
+
+# Caller tags used to attribute prediction log lines to the endpoint that asked for them
+ENDPOINT_CALLER_TAGS = {
+    'get_dashboard_data': 'DASHBOARD',
+    'get_prediction_data': 'PREDICTION',
+    'get_model_comparison': 'COMPARE',
+    'predict_batch': 'BATCH',
+    'export_series': 'EXPORT',
+    'get_pollutants_data': 'POLLUTANTS',
+    'get_recommendations': 'RECOMMENDATIONS'
+}
+
+@app.before_request
+def tag_prediction_caller():
+    if PREDICTION_CALLER is not None:
+        tag = ENDPOINT_CALLER_TAGS.get(request.endpoint, (request.endpoint or 'UNKNOWN').upper())
+        g.prediction_caller_token = PREDICTION_CALLER.set(tag)
+
+@app.before_request
+def ensure_warmup_started():
+    # A --preload worker inherits an unfinished warmup without its thread; rerun it here
+    if warmup_job is not None:
+        warmup_job.ensure_started()
+
+@app.before_request
+def check_model_file():
+    # AQI_MODEL_WATCH_SECONDS: notice a replaced model file and reload it in the background
+    if model_reloader is not None:
+        model_reloader.maybe_check()
+
+@app.before_request
+def unload_idle_models():
+    # AQI_MODEL_IDLE_SECONDS: drop lazily loaded models nobody asked for in a while
+    if aqi_system is not None:
+        aqi_system.unload_idle_models()
+
+@app.teardown_request
+def reset_prediction_caller(exc=None):
+    token = g.pop('prediction_caller_token', None)
+    if token is not None:
+        PREDICTION_CALLER.reset(token)
+
 # Serve static files
 @app.route('/')
 def home():
@@ -32,22 +161,24 @@ def serve_static(path):
     return "File type not allowed", 403
 
   
-print("🚀 ENHANCED AirSight Flask API with REAL ML Models")
-print("=" * 60)
+logger.info('🚀 ENHANCED AirSight Flask API with REAL ML Models')
+logger.info("=" * 60)
+
+MODEL_FILE = 'aqi_4_models.pkl'
 
 # Initialize the prediction system
 if HAS_AQI_SYSTEM:
-    print("🔧 Initializing AQI Prediction System...")
+    logger.info('🔧 Initializing AQI Prediction System...')
     aqi_system = AQIPredictionSystem()
     
     try:
-        print("📦 Loading your trained ML models from aqi_4_models.pkl...")
-        success = aqi_system.load_models('aqi_4_models.pkl')
+        logger.info('📦 Loading your trained ML models from aqi_4_models.pkl...')
+        success = aqi_system.load_models(MODEL_FILE)
         
         if success and aqi_system.use_trained_models and aqi_system.trained_models_loaded:
             models_trained = True
-            print("✅ REAL ML MODELS LOADED SUCCESSFULLY!")
-            print(f"🏆 Best model: {aqi_system.best_model_name}")
+            logger.info('✅ REAL ML MODELS LOADED SUCCESSFULLY!')
+            logger.info('🏆 Best model: %s', aqi_system.best_model_name)
             
             # Get performance of the best model (use the actual best model name)
             best_model_perf = aqi_system.model_performances.get(aqi_system.best_model_name, {})
@@ -55,47 +186,81 @@ if HAS_AQI_SYSTEM:
             mae_score = best_model_perf.get('mae', 0)
             rmse_score = best_model_perf.get('rmse', 0)
             
-            print(f"📊 Best model performance:")
-            print(f"   R² Score: {r2_score:.4f} ({r2_score*100:.1f}% accuracy)")
-            print(f"   MAE: {mae_score:.4f}")
-            print(f"   RMSE: {rmse_score:.4f}")
-            print(f"🤖 Prediction source: {aqi_system.get_prediction_source()}")
-            print(f"📈 Models available: {list(aqi_system.trained_models.keys())}")
-            print(f"🔢 Feature columns: {len(aqi_system.feature_columns)} features")
+            logger.info('📊 Best model performance:')
+            logger.info('   R² Score: %.4f (%.1f%% accuracy)', r2_score, r2_score*100)
+            logger.info('   MAE: %.4f', mae_score)
+            logger.info('   RMSE: %.4f', rmse_score)
+            logger.info('🤖 Prediction source: %s', aqi_system.get_prediction_source())
+            logger.info('📈 Models available: %s', list(aqi_system.trained_models.keys()))
+            logger.info('🔢 Feature columns: %s features', len(aqi_system.feature_columns))
             
         else:
-            print("⚠️ ML models loading failed, using simulation fallback")
+            logger.warning('⚠️ ML models loading failed, using simulation fallback')
             models_trained = False
             
     except Exception as e:
-        print(f"❌ Error loading models: {e}")
-        print("🔄 Using high-performance simulation as fallback")
+        logger.exception('❌ Error loading models: %s', e)
+        logger.info('🔄 Using high-performance simulation as fallback')
         models_trained = False
         
 else:
-    print("❌ AQI Prediction System not available")
+    logger.error('❌ AQI Prediction System not available')
     models_trained = False
     aqi_system = None
 
 
+# Historical data for the AQI history chart (shared with the prediction system when it loaded)
+history_store = aqi_system.history if aqi_system else AQIHistoryStore.load()
+
+# Serialized responses of the deterministic GET endpoints (see aqi_response_cache)
+response_cache = ResponseCache()
+
+def current_model_version():
+    return aqi_system.model_version if aqi_system else None
+
+def date_defaults_to_today(args):
+    """Views whose ?date= defaults to today"""
+    return 'date' not in args
+
+def is_current_month_view(args):
+    """Pollutants page: year/month default to now, and the current month's charts center on today"""
+    now = datetime.now()
+    try:
+        return int(args.get('year', now.year)) == now.year and int(args.get('month', now.month)) == now.month
+    except ValueError:
+        return False
+
 # Final status
 if models_trained and aqi_system and aqi_system.use_trained_models:
-    print(f"🎯 SYSTEM STATUS: REAL ML MODELS ACTIVE")
-    print(f"   Best Model: {aqi_system.best_model_name}")
-    print(f"   Total Models: {len(aqi_system.trained_models)}")
-    print(f"   Data Quality: REAL_ML")
+    logger.info('🎯 SYSTEM STATUS: REAL ML MODELS ACTIVE')
+    logger.info('   Best Model: %s', aqi_system.best_model_name)
+    logger.info('   Total Models: %s', len(aqi_system.trained_models))
+    logger.info('   Data Quality: REAL_ML')
 else:
-    print(f"🎯 SYSTEM STATUS: SIMULATION FALLBACK")
-    print(f"   Data Quality: HIGH_QUALITY_SIMULATION")
+    logger.info('🎯 SYSTEM STATUS: SIMULATION FALLBACK')
+    logger.info('   Data Quality: HIGH_QUALITY_SIMULATION')
+
+logger.info('🌐 Flask API initializing...')
+logger.info("=" * 60)
 
-print("🌐 Flask API initializing...")
-print("=" * 60)
+# Under `gunicorn --preload` everything above runs once in the master and workers
+# inherit it by fork. Freezing moves the loaded models out of the collector's reach
+# so cyclic GC in a worker doesn't write to (and un-share) their pages.
+gc.freeze()
 
 
 # Update the health check endpoint to show prediction source
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    """Enhanced API health check with prediction source"""
+    """Enhanced API health check with prediction source
+    
+    With ?ready=1 it answers 503 until the startup warmup has finished, so a load
+    balancer can hold traffic until the caches are warm.
+    """
+    warmup = warmup_job.status() if warmup_job is not None else {'state': 'disabled', 'ready': True}
+    if request.args.get('ready') in ('1', 'true') and not warmup['ready']:
+        return jsonify({'status': 'warming_up', 'warmup': warmup}), 503
+    
     prediction_source = "🎲 Simulation"
     model_info = "No models loaded"
     
@@ -115,12 +280,49 @@ def health_check():
         'best_model': aqi_system.best_model_name if models_trained else None,
         'system_type': 'ENHANCED_REAL_ML_SYSTEM',
         'real_models_active': aqi_system.use_trained_models if models_trained else False,
+        'prediction_cache': aqi_system.get_cache_stats() if aqi_system else None,
+        'response_cache': response_cache.stats(),
+        'warmup': warmup,
+        'model_reload': model_reloader.status() if model_reloader is not None else None,
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_models():
+    """🔁 Reload the model file in the background and swap it in (in the worker that answers)
+    
+    Disabled unless AQI_ADMIN_TOKEN is set; send it as "Authorization: Bearer <token>".
+    Answers 202 with the reload status right away, or 200 with the outcome with ?wait=1.
+    """
+    token = os.environ.get('AQI_ADMIN_TOKEN')
+    if not token:
+        return jsonify({'error': 'Admin endpoints are disabled (set AQI_ADMIN_TOKEN)'}), 404
+    supplied = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return jsonify({'error': 'Invalid admin token'}), 401
+    if model_reloader is None:
+        return jsonify({'error': 'AQI Prediction System not available'}), 503
+    
+    started = model_reloader.start('admin')
+    logger.info('🔁 Model reload requested via admin endpoint (started: %s)', started)
+    if request.args.get('wait') in ('1', 'true'):
+        model_reloader.wait()
+        return jsonify(dict(model_reloader.status(), started=started))
+    return jsonify(dict(model_reloader.status(), started=started)), 202
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """📈 Prometheus text exposition, summed over every worker sharing AQI_METRICS_DIR"""
+    return app.response_class(metrics_registry.render_all(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def seeded_rng(seed_string):
+    """🎲 Call-local generator seeded from a string; never touches global RNG state"""
+    seed = int(hashlib.md5(seed_string.encode()).hexdigest()[:8], 16) % (2**32)
+    return np.random.default_rng(seed)
+
 def get_consistent_aqi_for_date(date_str, offset_hours=0, model_name='gradient_boosting'):
     """🔄 ENHANCED: Consistent AQI with REAL ML MODEL PRIORITY"""
-    print(f"🤖 AQI Calculation: date={date_str}, model={model_name}")
+    logger.debug('🤖 AQI Calculation: date=%s, model=%s', date_str, model_name)
     
     # 🎯 PRIORITY 1: Use your trained ML models
     if models_trained and aqi_system and aqi_system.use_trained_models and aqi_system.trained_models_loaded:
@@ -134,22 +336,25 @@ def get_consistent_aqi_for_date(date_str, offset_hours=0, model_name='gradient_b
             
             # Only log occasionally to avoid spam
             if offset_hours == 0 or offset_hours % (24*7) == 0:  # Log weekly
-                print(f"🤖 ML Model: AQI {aqi} for {date_str} using {aqi_system.best_model_name}")
+                logger.debug('🤖 ML Model: AQI %s for %s using %s', aqi, date_str, aqi_system.best_model_name)
             
             return round(aqi)
             
         except Exception as e:
-            print(f"❌ ML prediction failed for {date_str}: {e}")
-            print("🔄 Falling back to simulation for this data point...")
+            logger.warning('❌ ML prediction failed for %s: %s', date_str, e)
+            logger.debug('🔄 Falling back to simulation for this data point...')
+            SIMULATION_FALLBACKS.labels(site='consistent_aqi').inc()
     
     # 🎲 FALLBACK: High-quality simulation (only when ML fails)
+    return simulate_consistent_aqi(date_str, offset_hours)
+
+def simulate_consistent_aqi(date_str, offset_hours=0):
+    """🎲 High-quality, deterministic AQI simulation for one date"""
     date_obj = datetime.strptime(date_str, '%Y-%m-%d')
     day_of_year = date_obj.timetuple().tm_yday
     
     # Create consistent seed
-    seed_string = f"{date_str}-{offset_hours}"
-    date_seed = int(hashlib.md5(seed_string.encode()).hexdigest()[:8], 16) % (2**32)
-    np.random.seed(date_seed)
+    rng = seeded_rng(f"{date_str}-{offset_hours}")
     
     # Enhanced seasonal pattern for better chart visualization
     seasonal_base = 50 + 25 * np.sin(day_of_year * 2 * np.pi / 365)  # 25-75 base range
@@ -164,20 +369,22 @@ def get_consistent_aqi_for_date(date_str, offset_hours=0, model_name='gradient_b
         seasonal_adjustment = 5
     
     # Daily and weekly variation
-    daily_variation = np.random.normal(0, 12)
+    daily_variation = rng.normal(0, 12)
     hour_effect = offset_hours * 0.3 if offset_hours > 0 else 0
     
     # Combine all factors
     aqi = seasonal_base + seasonal_adjustment + daily_variation + hour_effect
     aqi = max(20, min(120, aqi))  # Keep in reasonable bounds
     
-    np.random.seed(None)
-    
     return round(aqi)
 
 def get_model_specific_aqi(date_str, model_name, offset_hours=0):
     """Generate model-specific AQI predictions using your trained models"""
-    print(f"📊 Getting model-specific AQI for {date_str} with model {model_name}")
+    return model_specific_aqi(date_str, model_name, offset_hours)[0]
+
+def model_specific_aqi(date_str, model_name, offset_hours=0):
+    """(AQI, from_model): from_model is False when the value was simulated (no models, or the ML path failed)"""
+    logger.debug('📊 Getting model-specific AQI for %s with model %s', date_str, model_name)
 
         # 🎯 ADD: Model mapping from Function 1
     model_mapping = {
@@ -192,7 +399,7 @@ def get_model_specific_aqi(date_str, model_name, offset_hours=0):
     
     # Map to backend model name
     backend_model = model_mapping.get(model_name, 'gbr')
-    print(f"🔄 Model mapping: '{model_name}' -> '{backend_model}'")
+    logger.debug("🔄 Model mapping: '%s' -> '%s'", model_name, backend_model)
     
     if models_trained and aqi_system:
         try:
@@ -200,16 +407,17 @@ def get_model_specific_aqi(date_str, model_name, offset_hours=0):
             if offset_hours > 0:
                 target_date += timedelta(hours=offset_hours)
             
-            print(f"🎯 Using ML system for prediction...")
+            logger.debug('🎯 Using ML system for prediction...')
             aqi = aqi_system.predict_aqi_for_date(target_date, model_name)
             aqi_value = round(float(aqi))  # ✅ FIXED: Ensure it's a number
             
-            print(f"🤖 ML Model: AQI {aqi_value} for {date_str} using {model_name}")
-            return aqi_value
+            logger.debug('🤖 ML Model: AQI %s for %s using %s', aqi_value, date_str, model_name)
+            return aqi_value, True
             
         except Exception as e:
-            print(f"❌ ML prediction failed for {date_str}: {e}")
-            print(f"🔄 Falling back to simulation for {date_str}...")
+            logger.warning('❌ ML prediction failed for %s: %s', date_str, e)
+            logger.debug('🔄 Falling back to simulation for %s...', date_str)
+            SIMULATION_FALLBACKS.labels(site='model_specific_aqi').inc()
             # Fall through to simulation
     
     # ✅ FIXED: Robust fallback simulation
@@ -237,23 +445,23 @@ def get_model_specific_aqi(date_str, model_name, offset_hours=0):
         }
         
         date_seed += model_seed_base.get(model_name_str, 5000)
-        np.random.seed(date_seed)
+        rng = np.random.default_rng(date_seed)
         
         # Base AQI with seasonal pattern
         base_aqi = 50.0 + 20.0 * np.sin(float(day_of_year) * 2.0 * np.pi / 365.0)  # ✅ FIXED: All floats
         
         # Model-specific accuracy simulation
         model_variations = {
-            'gbr': np.random.normal(0.0, 5.0),
-            'gradient_boosting': np.random.normal(0.0, 5.0),
-            'rf': np.random.normal(0.0, 8.0),
-            'random_forest': np.random.normal(0.0, 8.0),
-            'et': np.random.normal(0.0, 12.0),
-            'extra_trees': np.random.normal(0.0, 12.0),
-            'xgboost': np.random.normal(0.0, 18.0)
+            'gbr': rng.normal(0.0, 5.0),
+            'gradient_boosting': rng.normal(0.0, 5.0),
+            'rf': rng.normal(0.0, 8.0),
+            'random_forest': rng.normal(0.0, 8.0),
+            'et': rng.normal(0.0, 12.0),
+            'extra_trees': rng.normal(0.0, 12.0),
+            'xgboost': rng.normal(0.0, 18.0)
         }
         
-        daily_variation = model_variations.get(model_name_str, np.random.normal(0.0, 10.0))
+        daily_variation = model_variations.get(model_name_str, rng.normal(0.0, 10.0))
         hour_effect = float(offset_hours) * 0.5 if offset_hours > 0 else 0.0  # ✅ FIXED: Ensure float
         
         # Model-specific bias
@@ -273,20 +481,18 @@ def get_model_specific_aqi(date_str, model_name, offset_hours=0):
         aqi = base_aqi + daily_variation + hour_effect + bias
         aqi = max(20.0, min(120.0, aqi))  # ✅ FIXED: Float bounds
         
-        np.random.seed(None)
-        
         final_aqi = round(float(aqi))  # ✅ FIXED: Ensure final result is int
-        print(f"🎲 Simulation: AQI {final_aqi} for {date_str} using {model_name_str}")
-        return final_aqi
+        logger.debug('🎲 Simulation: AQI %s for %s using %s', final_aqi, date_str, model_name_str)
+        return final_aqi, False
         
     except Exception as fallback_error:
-        print(f"❌ Even fallback simulation failed: {fallback_error}")
+        logger.warning('❌ Even fallback simulation failed: %s', fallback_error)
         # Ultimate fallback
-        return 45  # Safe default value
+        return 45, False  # Safe default value
 
 def generate_consistent_chart_data(base_date):
     """🔄 ENHANCED: Generate 48 weekly data points using REAL ML MODELS"""
-    print(f"📊 Generating 48-week chart data using ML system for base date: {base_date.strftime('%Y-%m-%d')}")
+    logger.debug('📊 Generating 48-week chart data using ML system for base date: %s', base_date.strftime('%Y-%m-%d'))
     
     chart_data = []
     year = base_date.year
@@ -305,8 +511,8 @@ def generate_consistent_chart_data(base_date):
     using_ml_models = models_trained and aqi_system and aqi_system.use_trained_models and aqi_system.trained_models_loaded
     data_source = "🤖 Real ML Models" if using_ml_models else "🎲 High-Quality Simulation"
     
-    print(f"📈 Chart data source: {data_source}")
-    print(f"🎯 Current week position: {current_week_position} (AQI: {current_aqi})")
+    logger.debug('📈 Chart data source: %s', data_source)
+    logger.debug('🎯 Current week position: %s (AQI: %s)', current_week_position, current_aqi)
     
     # Generate 48 weeks of data (12 months × 4 weeks)
     for month_offset in range(12):
@@ -325,7 +531,7 @@ def generate_consistent_chart_data(base_date):
             # CRITICAL: Use current AQI for current week position
             if week_position == current_week_position:
                 weekly_aqi = current_aqi  # Use EXACT current AQI value from ML model
-                print(f"🎯 Week {week_position} (CURRENT): AQI {current_aqi} from {data_source}")
+                logger.debug('🎯 Week %s (CURRENT): AQI %s from %s', week_position, current_aqi, data_source)
             else:
                 # Generate date for this week
                 week_day = 1 + (week * 7)
@@ -335,15 +541,17 @@ def generate_consistent_chart_data(base_date):
                     
                     # 🎯 KEY: Use SAME ML system as dashboard for consistency
                     if using_ml_models:
-                        # Use real ML model for this week
-                        weekly_aqi = aqi_system.predict_aqi_for_date(week_date)
+                        # Look the week up in the precomputed yearly ML table
+                        weekly_aqi = int(aqi_system.get_yearly_aqi_table(chart_year)[week_date.timetuple().tm_yday - 1])
+                        if weekly_aqi < 0:
+                            weekly_aqi = get_consistent_aqi_for_date(week_date_str, offset_hours=week*24)
                         if week_position % 12 == 0:  # Log every 12th week
-                            print(f"🤖 Week {week_position}: ML prediction AQI {weekly_aqi} for {week_date_str}")
+                            logger.debug('🤖 Week %s: ML prediction AQI %s for %s', week_position, weekly_aqi, week_date_str)
                     else:
                         # Use consistent simulation
                         weekly_aqi = get_consistent_aqi_for_date(week_date_str, offset_hours=week*24)
                         if week_position % 12 == 0:  # Log every 12th week
-                            print(f"🎲 Week {week_position}: Simulation AQI {weekly_aqi} for {week_date_str}")
+                            logger.debug('🎲 Week %s: Simulation AQI %s for %s', week_position, weekly_aqi, week_date_str)
                     
                 except ValueError:
                     # Handle invalid dates (e.g., Feb 30)
@@ -353,96 +561,57 @@ def generate_consistent_chart_data(base_date):
             chart_data.append(weekly_aqi)
     
     # Enhanced logging
-    print(f"✅ Chart data generated: 48 weeks using {data_source}")
-    print(f"📊 Current week AQI: {current_aqi} at position {current_week_position}")
-    print(f"📈 Chart AQI range: {min(chart_data)} - {max(chart_data)}")
-    print(f"📊 Chart data sample: Week 0: {chart_data[0]}, Week 24: {chart_data[24]}, Week 47: {chart_data[47]}")
-    
-    return chart_data
-
-def generate_daily_chart_data(base_date):
-    """🎯 NEW: Generate 365 daily data points using REAL ML MODELS"""
-    print(f"📊 Generating 365-day chart data using ML system for base date: {base_date.strftime('%Y-%m-%d')}")
-    
-    chart_data = []
-    year = base_date.year
-    
-    # Get the current AQI for today using ML models
-    current_date_str = base_date.strftime('%Y-%m-%d')
-    current_aqi = get_consistent_aqi_for_date(current_date_str)
-    
-    # Calculate current day position (0-364)
-    start_of_year = datetime(year, 1, 1)
-    current_day_position = (base_date - start_of_year).days
-    
-    # Check if we're using real ML models
-    using_ml_models = models_trained and aqi_system and aqi_system.use_trained_models and aqi_system.trained_models_loaded
-    data_source = "🤖 Real ML Models" if using_ml_models else "🎲 High-Quality Simulation"
-    
-    print(f"📈 Daily chart data source: {data_source}")
-    print(f"🎯 Current day position: {current_day_position} (AQI: {current_aqi})")
-    
-    # Generate 365 days of data (full year)
-    for day_offset in range(365):
-        # Calculate the actual date for this day
-        target_date = start_of_year + timedelta(days=day_offset)
-        target_date_str = target_date.strftime('%Y-%m-%d')
-        
-        # CRITICAL: Use current AQI for current day position
-        if day_offset == current_day_position:
-            daily_aqi = current_aqi  # Use EXACT current AQI value from ML model
-            print(f"🎯 Day {day_offset} (TODAY): AQI {current_aqi} from {data_source}")
-        else:
-            # 🎯 KEY: Use SAME ML system as dashboard for consistency
-            if using_ml_models:
-                try:
-                    # Use real ML model for this day
-                    daily_aqi = aqi_system.predict_aqi_for_date(target_date)
-                    daily_aqi = round(daily_aqi)
-                    if day_offset % 30 == 0:  # Log every 30th day
-                        print(f"🤖 Day {day_offset}: ML prediction AQI {daily_aqi} for {target_date_str}")
-                except Exception as e:
-                    print(f"❌ ML prediction failed for day {day_offset}: {e}")
-                    # Fallback to simulation for this specific day
-                    daily_aqi = get_consistent_aqi_for_date(target_date_str)
-            else:
-                # Use consistent simulation
-                daily_aqi = get_consistent_aqi_for_date(target_date_str)
-                if day_offset % 30 == 0:  # Log every 30th day
-                    print(f"🎲 Day {day_offset}: Simulation AQI {daily_aqi} for {target_date_str}")
-        
-        chart_data.append(daily_aqi)
-    
-    # Enhanced logging
-    print(f"✅ Daily chart data generated: 365 days using {data_source}")
-    print(f"📊 Current day AQI: {current_aqi} at position {current_day_position}")
-    print(f"📈 Chart AQI range: {min(chart_data)} - {max(chart_data)}")
-    print(f"📊 Chart data sample: Day 0: {chart_data[0]}, Day 180: {chart_data[180]}, Day 364: {chart_data[364]}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('✅ Chart data generated: 48 weeks using %s', data_source)
+        logger.debug('📊 Current week AQI: %s at position %s', current_aqi, current_week_position)
+        logger.debug('📈 Chart AQI range: %s - %s', min(chart_data), max(chart_data))
+        logger.debug('📊 Chart data sample: Week 0: %s, Week 24: %s, Week 47: %s', chart_data[0], chart_data[24], chart_data[47])
     
     return chart_data
 
 @app.route('/api/dashboard', methods=['GET'])
+@cached_response(response_cache, current_model_version, today_relative=date_defaults_to_today)
 def get_dashboard_data():
-    try:
-        date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-        model_name = request.args.get('model', 'gbr')  # Use same default as recommendations
-        target_date = datetime.strptime(date_str, '%Y-%m-%d')
-        
-        print(f"📅 Dashboard API called for date: {date_str}, model: {model_name}")
-        
-        # ENHANCED: Get AQI with real ML model priority using requested model
-        current_aqi = get_model_specific_aqi(date_str, model_name)
-
-        # ENHANCED: Calculate next day AQI using same ML model system
-        try:
-            next_day_date = target_date + timedelta(days=1)
-            next_day_date_str = next_day_date.strftime('%Y-%m-%d')
-            next_day_aqi = get_model_specific_aqi(next_day_date_str, model_name)
-            print(f"✅ Next day AQI calculated: {next_day_aqi}")
-        except Exception as e:
-            print(f"❌ Next day prediction failed: {e}")
-            next_day_aqi = 45  # Safe fallback
-            print(f"🔄 Using fallback next day AQI: {next_day_aqi}")
+    try:
+        date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+        model_name = request.args.get('model', 'gbr')  # Use same default as recommendations
+        target_date = datetime.strptime(date_str, '%Y-%m-%d')
+        
+        logger.info('📅 Dashboard API called for date: %s, model: %s', date_str, model_name)
+        
+        # ENHANCED: Get AQI with real ML model priority using requested model
+        current_aqi, from_model = model_specific_aqi(date_str, model_name)
+        
+        # Everything else is independent: run it side by side on the model pool, handing
+        # current_aqi to the parts that would otherwise predict the same value again. A value
+        # simulated after a failed ML path isn't handed on; those parts predict their own.
+        using_ml_models = models_trained and aqi_system and aqi_system.use_trained_models and aqi_system.trained_models_loaded
+        requested_model = aqi_system.model_key(model_name) if using_ml_models and from_model else None
+        chart_current_aqi = current_aqi if requested_model and requested_model == aqi_system.model_key('gradient_boosting') else None
+        pollutant_aqi = current_aqi if requested_model and requested_model == aqi_system.model_key() else None
+        next_day_date_str = (target_date + timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        with TaskGroup() as tasks:
+            next_day_task = tasks.submit(get_model_specific_aqi, next_day_date_str, model_name)
+            logger.debug('📊 Generating DAILY chart data for %s...', target_date.year)
+            chart_task = tasks.submit(generate_daily_chart_data, target_date, chart_current_aqi)
+            if models_trained and aqi_system:
+                logger.debug('🌪️ Getting pollutant data from ML system...')
+                pollutants_task = tasks.submit(predict_dashboard_pollutants, target_date, pollutant_aqi)
+            
+            # ENHANCED: Calculate next day AQI using same ML model system
+            try:
+                next_day_aqi = next_day_task.result()
+                logger.debug('✅ Next day AQI calculated: %s', next_day_aqi)
+            except Exception as e:
+                logger.warning('❌ Next day prediction failed: %s', e)
+                next_day_aqi = 45  # Safe fallback
+                logger.debug('🔄 Using fallback next day AQI: %s', next_day_aqi)
+            
+            chart_data = chart_task.result()  # 🎯 365 daily values
+            if models_trained and aqi_system:
+                main_pollutant, concentrations = pollutants_task.result()
+                logger.debug('🎯 Main pollutant: %s', main_pollutant)
                 
         # Get prediction source info for transparency
         prediction_source = "🎲 Mathematical Simulation"
@@ -454,26 +623,20 @@ def get_dashboard_data():
             models_active = aqi_system.use_trained_models
             if models_active:
                 model_info = f"Using real ML models: {list(aqi_system.trained_models.keys())}"
-                print(f"🤖 REAL ML MODELS ACTIVE: {model_info}")
+                logger.debug('🤖 REAL ML MODELS ACTIVE: %s', model_info)
             else:
                 model_info = "High-performance simulation system"
-                print(f"🎲 SIMULATION ACTIVE: {model_info}")
+                logger.debug('🎲 SIMULATION ACTIVE: %s', model_info)
         
         current_month_index = target_date.month - 1  # 0-11
         current_week_in_month = min(3, (target_date.day - 1) // 7)  # 0-3
         current_week_position = current_month_index * 4 + current_week_in_month
         
-        # ENHANCED: Get pollutant data with ML model priority
-        if models_trained and aqi_system:
-            print(f"🌪️ Getting pollutant data from ML system...")
-            main_pollutant = aqi_system.get_main_pollutant_for_date(target_date)
-            concentrations = aqi_system.predict_pollutant_concentrations(target_date)
-            print(f"🎯 Main pollutant: {main_pollutant}")
-        else:
-            print(f"⚠️ Using fallback pollutant calculations...")
+        # ENHANCED: Pollutant data came from the ML system above; otherwise derive it from current_aqi
+        if not (models_trained and aqi_system):
+            logger.debug('⚠️ Using fallback pollutant calculations...')
             # ENHANCED fallback with better consistency
-            date_seed = int(hashlib.md5(date_str.encode()).hexdigest()[:8], 16) % (2**32)
-            np.random.seed(date_seed)
+            rng = seeded_rng(date_str)
             
             # Seasonal pollutant selection
             month = target_date.month
@@ -489,18 +652,13 @@ def get_dashboard_data():
             # AQI-based concentration scaling
             aqi_scale = current_aqi / 50.0
             concentrations = {
-                'PM2.5 - Local Conditions': max(5, 15 * aqi_scale + np.random.normal(0, 6)),
-                'PM10 Total 0-10um STP': max(10, 25 * aqi_scale + np.random.normal(0, 8)),
-                'Ozone': max(0.02, (0.04 + 0.01 * aqi_scale) + np.random.normal(0, 0.015)),
-                'Nitrogen dioxide (NO2)': max(0.01, (0.025 + 0.005 * aqi_scale) + np.random.normal(0, 0.010)),
-                'Carbon monoxide': max(0.3, (1.2 + 0.3 * aqi_scale) + np.random.normal(0, 0.4)),
-                'Sulfur dioxide': max(0.005, (0.015 + 0.005 * aqi_scale) + np.random.normal(0, 0.008))
+                'PM2.5 - Local Conditions': max(5, 15 * aqi_scale + rng.normal(0, 6)),
+                'PM10 Total 0-10um STP': max(10, 25 * aqi_scale + rng.normal(0, 8)),
+                'Ozone': max(0.02, (0.04 + 0.01 * aqi_scale) + rng.normal(0, 0.015)),
+                'Nitrogen dioxide (NO2)': max(0.01, (0.025 + 0.005 * aqi_scale) + rng.normal(0, 0.010)),
+                'Carbon monoxide': max(0.3, (1.2 + 0.3 * aqi_scale) + rng.normal(0, 0.4)),
+                'Sulfur dioxide': max(0.005, (0.015 + 0.005 * aqi_scale) + rng.normal(0, 0.008))
             }
-            np.random.seed(None)
-        
-        # 🎯 CHANGED: Generate DAILY chart data instead of weekly
-        print(f"📊 Generating DAILY chart data for {target_date.year}...")
-        chart_data = generate_daily_chart_data(target_date)  # NEW: Daily instead of weekly
         
         # ENHANCED: Create sensor data with proper scaling
         sensor_data = {
@@ -553,22 +711,21 @@ def get_dashboard_data():
         
         # ENHANCED: Comprehensive logging
         if models_active:
-            print(f"🤖 REAL ML DASHBOARD: AQI {current_aqi} ({aqi_category}) for {date_str}")
-            print(f"   📊 Next Day: AQI {next_day_aqi} ({next_day_category})")
-            print(f"   🌪️ Main Pollutant: {main_pollutant}")
-            print(f"   🎯 Models Used: {list(aqi_system.trained_models.keys()) if aqi_system.trained_models else 'None'}")
-            print(f"   🏆 Best Model: {aqi_system.best_model_name}")
+            logger.debug('🤖 REAL ML DASHBOARD: AQI %s (%s) for %s', current_aqi, aqi_category, date_str)
+            logger.debug('   📊 Next Day: AQI %s (%s)', next_day_aqi, next_day_category)
+            logger.debug('   🌪️ Main Pollutant: %s', main_pollutant)
+            logger.debug('   🎯 Models Used: %s', list(aqi_system.trained_models.keys()) if aqi_system.trained_models else 'None')
+            logger.debug('   🏆 Best Model: %s', aqi_system.best_model_name)
         else:
-            print(f"🎲 SIMULATION DASHBOARD: AQI {current_aqi} ({aqi_category}) for {date_str}")
-            print(f"   📊 Next Day: AQI {next_day_aqi} ({next_day_category})")
-            print(f"   🌪️ Main Pollutant: {main_pollutant}")
-            print(f"   ⚠️ Reason: {model_info}")
+            logger.debug('🎲 SIMULATION DASHBOARD: AQI %s (%s) for %s', current_aqi, aqi_category, date_str)
+            logger.debug('   📊 Next Day: AQI %s (%s)', next_day_aqi, next_day_category)
+            logger.debug('   🌪️ Main Pollutant: %s', main_pollutant)
+            logger.debug('   ⚠️ Reason: %s', model_info)
         
         return jsonify(response_data)
     
     except Exception as e:
-        print(f"❌ Dashboard error: {e}")
-        print(f"❌ Error details: {type(e).__name__}: {str(e)}")
+        logger.exception('❌ Dashboard error: %s: %s', type(e).__name__, e)
         
         # Enhanced error response
         return jsonify({
@@ -580,17 +737,35 @@ def get_dashboard_data():
             'timestamp': datetime.now().isoformat()
         }), 500
 
-# 🎯 ADD THIS NEW FUNCTION (add this anywhere in your file, preferably after the existing generate_consistent_chart_data function)
-def generate_daily_chart_data(base_date):
-    """🎯 NEW: Generate 365 daily data points using REAL ML MODELS"""
-    print(f"📊 Generating 365-day chart data using ML system for base date: {base_date.strftime('%Y-%m-%d')}")
+def predict_dashboard_pollutants(target_date, aqi=None):
+    """🌪️ Main pollutant and concentrations from the ML system, both from one AQI prediction"""
+    if aqi is None:
+        aqi = aqi_system.predict_aqi_for_date(target_date)
+    return (aqi_system.get_main_pollutant_for_date(target_date, aqi),
+            aqi_system.predict_pollutant_concentrations(target_date, aqi=aqi))
+
+@lru_cache(maxsize=8)
+def simulated_year_table(year):
+    """🎲 Simulation AQI for every day of a year; deterministic, so computed once per year"""
+    start_of_year = datetime(year, 1, 1)
+    num_days = (datetime(year + 1, 1, 1) - start_of_year).days
+    return tuple(
+        simulate_consistent_aqi((start_of_year + timedelta(days=i)).strftime('%Y-%m-%d'))
+        for i in range(num_days)
+    )
+
+def generate_daily_chart_data(base_date, current_aqi=None):
+    """🎯 NEW: Generate 365 daily data points using REAL ML MODELS (sliced from the yearly table)
+    
+    ``current_aqi`` is the base date's gradient-boosting AQI when the caller already has it.
+    """
+    logger.debug('📊 Generating 365-day chart data using ML system for base date: %s', base_date.strftime('%Y-%m-%d'))
     
-    chart_data = []
     year = base_date.year
     
     # Get the current AQI for today using ML models
-    current_date_str = base_date.strftime('%Y-%m-%d')
-    current_aqi = get_consistent_aqi_for_date(current_date_str)
+    if current_aqi is None:
+        current_aqi = get_consistent_aqi_for_date(base_date.strftime('%Y-%m-%d'))
     
     # Calculate current day position (0-364)
     start_of_year = datetime(year, 1, 1)
@@ -600,57 +775,74 @@ def generate_daily_chart_data(base_date):
     using_ml_models = models_trained and aqi_system and aqi_system.use_trained_models and aqi_system.trained_models_loaded
     data_source = "🤖 Real ML Models" if using_ml_models else "🎲 High-Quality Simulation"
     
-    print(f"📈 Daily chart data source: {data_source}")
-    print(f"🎯 Current day position: {current_day_position} (AQI: {current_aqi})")
+    logger.debug('📈 Daily chart data source: %s', data_source)
+    logger.debug('🎯 Current day position: %s (AQI: %s)', current_day_position, current_aqi)
     
-    # Generate 365 days of data (full year)
-    for day_offset in range(365):
-        # Calculate the actual date for this day
-        target_date = start_of_year + timedelta(days=day_offset)
-        target_date_str = target_date.strftime('%Y-%m-%d')
-        
-        # CRITICAL: Use current AQI for current day position
-        if day_offset == current_day_position:
-            daily_aqi = current_aqi  # Use EXACT current AQI value from ML model
-            print(f"🎯 Day {day_offset} (TODAY): AQI {current_aqi} from {data_source}")
-        else:
-            # 🎯 KEY: Use SAME ML system as dashboard for consistency
-            if using_ml_models:
-                try:
-                    # Use real ML model for this day
-                    daily_aqi = aqi_system.predict_aqi_for_date(target_date)
-                    daily_aqi = round(daily_aqi)
-                    if day_offset % 50 == 0:  # Log every 50th day to avoid spam
-                        print(f"🤖 Day {day_offset}: ML prediction AQI {daily_aqi} for {target_date_str}")
-                except Exception as e:
-                    if day_offset % 100 == 0:  # Only log errors occasionally
-                        print(f"❌ ML prediction failed for day {day_offset}: {e}")
-                    # Fallback to simulation for this specific day
-                    daily_aqi = get_consistent_aqi_for_date(target_date_str)
-            else:
-                # Use consistent simulation
-                daily_aqi = get_consistent_aqi_for_date(target_date_str)
-                if day_offset % 50 == 0:  # Log every 50th day
-                    print(f"🎲 Day {day_offset}: Simulation AQI {daily_aqi} for {target_date_str}")
-        
-        chart_data.append(daily_aqi)
+    # Generate 365 days of data (full year) by slicing the precomputed yearly table
+    chart_data = None
+    if using_ml_models:
+        try:
+            # 🎯 KEY: Use SAME ML system as dashboard, computed once per year/model
+            chart_data = aqi_system.get_yearly_aqi_table(year)[:365].tolist()
+        except Exception as e:
+            logger.warning('❌ Yearly ML table failed: %s', e)
+            SIMULATION_FALLBACKS.labels(site='yearly_table').inc()
+    if chart_data is None:
+        chart_data = list(simulated_year_table(year)[:365])
+    
+    for day_offset, daily_aqi in enumerate(chart_data):
+        if daily_aqi < 0:
+            # Per-day fallback where the ML model produced no value
+            target_date = start_of_year + timedelta(days=day_offset)
+            chart_data[day_offset] = get_consistent_aqi_for_date(target_date.strftime('%Y-%m-%d'))
+    
+    # CRITICAL: Use current AQI for current day position
+    if 0 <= current_day_position < len(chart_data):
+        chart_data[current_day_position] = current_aqi  # Use EXACT current AQI value from ML model
     
     # Enhanced logging
-    print(f"✅ Daily chart data generated: 365 days using {data_source}")
-    print(f"📊 Current day AQI: {current_aqi} at position {current_day_position}")
-    print(f"📈 Chart AQI range: {min(chart_data)} - {max(chart_data)}")
-    print(f"📊 Chart data sample: Day 0: {chart_data[0]}, Day 180: {chart_data[180]}, Day 364: {chart_data[364]}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('✅ Daily chart data generated: 365 days using %s', data_source)
+        logger.debug('📊 Current day AQI: %s at position %s', current_aqi, current_day_position)
+        logger.debug('📈 Chart AQI range: %s - %s', min(chart_data), max(chart_data))
+        logger.debug('📊 Chart data sample: Day 0: %s, Day 180: %s, Day 364: %s', chart_data[0], chart_data[180], chart_data[364])
     
     return chart_data
 
+POLLUTANT_FORECAST_LABELS = ('PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3')
+
+def simulated_concentrations(date_str):
+    """🎲 Pollutant concentrations for a date without trained models (seeded by the date)"""
+    rng = seeded_rng(date_str)
+    return {
+        'PM2.5 - Local Conditions': 15 + rng.normal(0, 8),
+        'PM10 Total 0-10um STP': 25 + rng.normal(0, 12),
+        'Nitrogen dioxide (NO2)': 0.025 + rng.normal(0, 0.012),
+        'Sulfur dioxide': 0.015 + rng.normal(0, 0.006),
+        'Carbon monoxide': 1.2 + rng.normal(0, 0.5),
+        'Ozone': 0.045 + rng.normal(0, 0.018)
+    }
+
+def pollutant_forecast_values(concentrations):
+    """Concentrations in display units, in POLLUTANT_FORECAST_LABELS order (gases in ppb, CO in ppm)"""
+    return [
+        round(concentrations.get('PM2.5 - Local Conditions', 20)),
+        round(concentrations.get('PM10 Total 0-10um STP', 30)),
+        round(concentrations.get('Nitrogen dioxide (NO2)', 0.03) * 1000),
+        round(concentrations.get('Sulfur dioxide', 0.02) * 1000),
+        round(concentrations.get('Carbon monoxide', 1.5), 1),
+        round(concentrations.get('Ozone', 0.05) * 1000)
+    ]
+
 @app.route('/api/prediction', methods=['GET'])
+@cached_response(response_cache, current_model_version, today_relative=date_defaults_to_today)
 def get_prediction_data():
     try:
         model_name = request.args.get('model', 'gbr')
         date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
         target_date = datetime.strptime(date_str, '%Y-%m-%d')
         
-        print(f"Prediction API called for date: {date_str}, model: {model_name}")
+        logger.info('Prediction API called for date: %s, model: %s', date_str, model_name)
         
         # FIXED: Get proper AQI prediction
         overall_aqi = get_model_specific_aqi(date_str, model_name)
@@ -660,30 +852,11 @@ def get_prediction_data():
         if models_trained and aqi_system:
             concentrations = aqi_system.predict_pollutant_concentrations(target_date, model_name)
         else:
-            # FIXED fallback
-            date_seed = int(hashlib.md5(date_str.encode()).hexdigest()[:8], 16) % (2**32)
-            np.random.seed(date_seed)
-            
-            concentrations = {
-                'PM2.5 - Local Conditions': 15 + np.random.normal(0, 8),
-                'PM10 Total 0-10um STP': 25 + np.random.normal(0, 12),
-                'Nitrogen dioxide (NO2)': 0.025 + np.random.normal(0, 0.012),
-                'Sulfur dioxide': 0.015 + np.random.normal(0, 0.006),
-                'Carbon monoxide': 1.2 + np.random.normal(0, 0.5),
-                'Ozone': 0.045 + np.random.normal(0, 0.018)
-            }
-            np.random.seed(None)
+            concentrations = simulated_concentrations(date_str)
         
         pollutant_forecast = {
-            'labels': ['PM2.5', 'PM10', 'NO2', 'SO2', 'CO', 'O3'],
-            'data': [
-                round(concentrations.get('PM2.5 - Local Conditions', 20)),
-                round(concentrations.get('PM10 Total 0-10um STP', 30)),
-                round(concentrations.get('Nitrogen dioxide (NO2)', 0.03) * 1000),
-                round(concentrations.get('Sulfur dioxide', 0.02) * 1000),
-                round(concentrations.get('Carbon monoxide', 1.5), 1),
-                round(concentrations.get('Ozone', 0.05) * 1000)
-            ]
+            'labels': list(POLLUTANT_FORECAST_LABELS),
+            'data': pollutant_forecast_values(concentrations)
         }
         
         # FIXED: Generate 7-day trend with model-specific values
@@ -707,7 +880,7 @@ def get_prediction_data():
         if models_trained and aqi_system and hasattr(aqi_system, 'model_performances'):
             # Use your actual model performances
             actual_performances = aqi_system.model_performances
-            print(f"🔍 Actual model performances from system: {actual_performances}")
+            logger.debug('🔍 Actual model performances from system: %s', actual_performances)
             
             # Create comprehensive mapping for all possible model names
             model_performances = {}
@@ -732,7 +905,7 @@ def get_prediction_data():
                 })
             })
             
-            print(f"🔍 Model performances prepared: {list(model_performances.keys())}")
+            logger.debug('🔍 Model performances prepared: %s', list(model_performances.keys()))
             
             # Update accuracy comparison chart data
             accuracy_data = {
@@ -746,7 +919,7 @@ def get_prediction_data():
             }
             
         else:
-            print(f"🔄 Using fallback model performances")
+            logger.debug('🔄 Using fallback model performances')
             
             # ✅ FIXED: Fallback performances with proper MAPE values for all model name variations
             model_performances = {
@@ -766,12 +939,12 @@ def get_prediction_data():
 
         # ✅ CRITICAL DEBUG: Log what model performance data is being sent
         selected_performance = model_performances.get(model_name, {})
-        print(f"🎯 Selected model: {model_name}")
-        print(f"🎯 Performance data for {model_name}: {selected_performance}")
-        print(f"🎯 MAPE value being sent: {selected_performance.get('mape', 'NOT FOUND')}")
-        print(f"🎯 All model performances being sent: {model_performances}")
+        logger.debug('🎯 Selected model: %s', model_name)
+        logger.debug('🎯 Performance data for %s: %s', model_name, selected_performance)
+        logger.debug('🎯 MAPE value being sent: %s', selected_performance.get('mape', 'NOT FOUND'))
+        logger.debug('🎯 All model performances being sent: %s', model_performances)
         
-        print(f"🎯 Prediction returning: AQI {overall_aqi} ({aqi_category}) for {date_str}")
+        logger.debug('🎯 Prediction returning: AQI %s (%s) for %s', overall_aqi, aqi_category, date_str)
         
         return jsonify({
             'overall_aqi': overall_aqi,
@@ -785,15 +958,352 @@ def get_prediction_data():
         })
     
     except Exception as e:
-        print(f"❌ Prediction error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('❌ Prediction error: %s', e)
         return jsonify({
             'error': f'Failed to get prediction data: {str(e)}'
         }), 500
 
+# Longest date range /api/compare will score in one request
+MAX_COMPARE_DAYS = 366
+
+@app.route('/api/compare', methods=['GET'])
+@cached_response(response_cache, current_model_version, today_relative=lambda args: 'start' not in args)
+def get_model_comparison():
+    """🤝 Every model's AQI over a date range, plus ensemble mean and spread
+    
+    ?start=YYYY-MM-DD (default today) and either &end=YYYY-MM-DD or &days=N (default 7).
+    The frontend can switch models from this one response without further requests.
+    """
+    try:
+        start = datetime.strptime(request.args.get('start', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d')
+        if 'end' in request.args:
+            days = (datetime.strptime(request.args['end'], '%Y-%m-%d') - start).days + 1
+        else:
+            days = int(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD and days an integer'}), 400
+    if not 1 <= days <= MAX_COMPARE_DAYS:
+        return jsonify({'error': f'Date range must be 1-{MAX_COMPARE_DAYS} days'}), 400
+    
+    try:
+        dates = [start + timedelta(days=i) for i in range(days)]
+        date_strs = [d.strftime('%Y-%m-%d') for d in dates]
+        logger.info('🤝 Compare API called: %s, %s days', date_strs[0], days)
+        
+        series = {}
+        if models_trained and aqi_system:
+            series = aqi_system.predict_aqi_for_dates_by_model(dates)
+        if not series:
+            # Simulation: same per-model fallback /api/prediction uses
+            series = {
+                model: [get_model_specific_aqi(date_str, model) for date_str in date_strs]
+                for model in ('gbr', 'rf', 'et', 'xgboost')
+            }
+        
+        # Models x dates, NaN where a model had no prediction
+        matrix = np.array([[np.nan if v is None else v for v in values] for values in series.values()], dtype=float)
+        # The nan-reductions warn on all-NaN columns, so those are left out and stay NaN
+        has_value = ~np.isnan(matrix).all(axis=0)
+        mean, std, low, high = (np.full(matrix.shape[1], np.nan) for _ in range(4))
+        if has_value.any():
+            scored = matrix[:, has_value]
+            mean[has_value] = np.nanmean(scored, axis=0)
+            std[has_value] = np.nanstd(scored, axis=0)
+            low[has_value] = np.nanmin(scored, axis=0)
+            high[has_value] = np.nanmax(scored, axis=0)
+        
+        def to_json(values, digits=1):
+            return [None if math.isnan(v) else round(v, digits) for v in values.tolist()]
+        
+        return jsonify({
+            'dates': date_strs,
+            'labels': [d.strftime('%m-%d') for d in dates],
+            'models': {
+                model: [None if v is None else round(float(v)) for v in values]
+                for model, values in series.items()
+            },
+            'ensemble': {
+                'mean': to_json(mean),
+                'std': to_json(std),
+                'min': to_json(low, None),
+                'max': to_json(high, None)
+            },
+            'best_model': aqi_system.best_model_name if models_trained and aqi_system else None,
+            'prediction_source': aqi_system.get_prediction_source() if models_trained and aqi_system else '🎲 Simulation'
+        })
+    
+    except Exception as e:
+        logger.exception('❌ Compare API error: %s', e)
+        return jsonify({
+            'error': f'Failed to compare models: {str(e)}'
+        }), 500
+
+MAX_BATCH_PREDICTIONS = 5000
+BATCH_MODEL_NAMES = ('gbr', 'gradient_boosting', 'rf', 'random_forest', 'et', 'extra_trees', 'xgboost')
+BATCH_POLLUTANT_COLUMNS = ('pm25', 'pm10', 'no2', 'so2', 'co', 'o3')  # POLLUTANT_FORECAST_LABELS order
+BATCH_POLLUTANT_UNITS = {'pm25': 'µg/m³', 'pm10': 'µg/m³', 'no2': 'ppb', 'so2': 'ppb', 'co': 'ppm', 'o3': 'ppb'}
+
+def parse_batch_pairs(payload):
+    """[(date, model)] from a /api/predict/batch body; ValueError saying what is wrong otherwise"""
+    if isinstance(payload, dict) and 'items' in payload:
+        payload = payload['items']
+    
+    if isinstance(payload, list):
+        if len(payload) > MAX_BATCH_PREDICTIONS:
+            raise ValueError(f'At most {MAX_BATCH_PREDICTIONS} predictions per request')
+        raw_pairs = []
+        for item in payload:
+            if not isinstance(item, dict) or 'date' not in item:
+                raise ValueError('Every item needs a "date" (and optionally a "model")')
+            raw_pairs.append((item['date'], item.get('model', 'gbr')))
+    elif isinstance(payload, dict):
+        models = payload.get('models', ['gbr'])
+        if isinstance(models, str):
+            models = [models]
+        if not isinstance(models, list) or not models:
+            raise ValueError('"models" must be a non-empty list')
+        
+        if 'dates' in payload:
+            dates = payload['dates']
+            if not isinstance(dates, list):
+                raise ValueError('"dates" must be a list of YYYY-MM-DD strings')
+        elif 'start' in payload:
+            try:
+                start = datetime.strptime(str(payload['start']), '%Y-%m-%d')
+                if 'end' in payload:
+                    days = (datetime.strptime(str(payload['end']), '%Y-%m-%d') - start).days + 1
+                else:
+                    days = int(payload.get('days', 7))
+            except (TypeError, ValueError):
+                raise ValueError('start/end must be YYYY-MM-DD and days an integer')
+            if not 1 <= days <= MAX_BATCH_PREDICTIONS:
+                raise ValueError(f'Date range must be 1-{MAX_BATCH_PREDICTIONS} days')
+            dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+        else:
+            raise ValueError('Send a list of {"date", "model"} items, "dates" or a "start" date')
+        
+        if len(dates) * len(models) > MAX_BATCH_PREDICTIONS:
+            raise ValueError(f'At most {MAX_BATCH_PREDICTIONS} predictions per request')
+        raw_pairs = [(date, model) for date in dates for model in models]
+    else:
+        raise ValueError('The body must be a JSON object or list')
+    
+    if not raw_pairs:
+        raise ValueError('Nothing to predict')
+    
+    pairs = []
+    for date, model in raw_pairs:
+        try:
+            pairs.append((datetime.strptime(str(date), '%Y-%m-%d'), model))
+        except ValueError:
+            raise ValueError(f'Invalid date {date!r}, expected YYYY-MM-DD')
+        if model not in BATCH_MODEL_NAMES:
+            raise ValueError(f'Unknown model {model!r}, expected one of {", ".join(BATCH_MODEL_NAMES)}')
+    return pairs
+
+def predict_batch_pairs(pairs, include_pollutants=True):
+    """📦 AQI and pollutant values per (date, model) pair: one batched predict per model
+    
+    Models are grouped by the trained model that answers for them, and all groups go
+    through predict_aqi_for_dates_by_model, so the feature matrix is built once and
+    each model predicts every requested date in one call. Values match /api/prediction.
+    """
+    date_strs = [date.strftime('%Y-%m-%d') for date, _ in pairs]
+    
+    if models_trained and aqi_system:
+        keys = [aqi_system.model_key(model) for _, model in pairs]
+        dates = sorted({date for date, _ in pairs})
+        row_of = {date: row for row, date in enumerate(dates)}
+        series = aqi_system.predict_aqi_for_dates_by_model(dates, list(dict.fromkeys(keys)))
+        raw = [series[key][row_of[date]] for (date, _), key in zip(pairs, keys)]
+        aqi_values = [None if value is None else round(float(value)) for value in raw]
+        
+        pollutants = None
+        if include_pollutants:
+            pollutants = [
+                None if value is None else pollutant_forecast_values(
+                    aqi_system.predict_pollutant_concentrations(date, key, aqi=value))
+                for (date, _), key, value in zip(pairs, keys, raw)
+            ]
+        return date_strs, aqi_values, pollutants
+    
+    # Simulation: the same per-model fallback /api/prediction uses
+    aqi_values = [get_model_specific_aqi(date_str, model) for date_str, (_, model) in zip(date_strs, pairs)]
+    pollutants = None
+    if include_pollutants:
+        by_date = {}
+        for date_str in date_strs:
+            if date_str not in by_date:
+                by_date[date_str] = pollutant_forecast_values(simulated_concentrations(date_str))
+        pollutants = [by_date[date_str] for date_str in date_strs]
+    return date_strs, aqi_values, pollutants
+
+def predict_batch_columns(pairs, include_pollutants=True):
+    """Columns (date, model, aqi, category and the pollutants) aligned with ``pairs``"""
+    date_strs, aqi_values, pollutants = predict_batch_pairs(pairs, include_pollutants)
+    columns = {
+        'date': date_strs,
+        'model': [model for _, model in pairs],
+        'aqi': aqi_values,
+        'category': [None if aqi is None else get_aqi_category(aqi) for aqi in aqi_values]
+    }
+    if pollutants is not None:
+        for index, name in enumerate(BATCH_POLLUTANT_COLUMNS):
+            columns[name] = [None if values is None else values[index] for values in pollutants]
+    return columns
+
+def ndjson_lines(columns):
+    """One JSON object per row of a columns dict, as a single string"""
+    names = list(columns)
+    return ''.join(json.dumps(dict(zip(names, row))) + '\n' for row in zip(*columns.values()))
+
+@app.route('/api/predict/batch', methods=['POST'])
+def predict_batch():
+    """📦 Many (date, model) predictions in one request
+    
+    JSON body, either a list of {"date": "YYYY-MM-DD", "model": "gbr"} items (or
+    {"items": [...]}), or {"dates": [...]} / {"start", "end" or "days"} with
+    "models": [...] for every date x every model. "pollutants": false leaves out the
+    concentration columns. The answer has one column per field, aligned with the
+    requested pairs; ?format=ndjson (or Accept: application/x-ndjson) returns one
+    JSON object per line instead. At most MAX_BATCH_PREDICTIONS pairs per request.
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return jsonify({'error': 'Expected a JSON body'}), 400
+    try:
+        pairs = parse_batch_pairs(payload)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    include_pollutants = not (isinstance(payload, dict) and payload.get('pollutants') is False)
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    
+    try:
+        logger.info('📦 Batch prediction API called: %s predictions', len(pairs))
+        columns = predict_batch_columns(pairs, include_pollutants)
+        
+        if ndjson:
+            return app.response_class(ndjson_lines(columns), mimetype='application/x-ndjson')
+        
+        return jsonify({
+            'count': len(pairs),
+            'columns': columns,
+            'units': {'aqi': 'AQI', **(BATCH_POLLUTANT_UNITS if include_pollutants else {})},
+            'prediction_source': aqi_system.get_prediction_source() if models_trained and aqi_system else '🎲 Simulation'
+        })
+    
+    except Exception as e:
+        logger.exception('❌ Batch prediction API error: %s', e)
+        return jsonify({
+            'error': f'Failed to run batch prediction: {str(e)}'
+        }), 500
+
+EXPORT_CHUNK_DAYS = 30
+MAX_EXPORT_DAYS = 366 * 30
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def export_prediction_chunks(first, last, models, include_pollutants):
+    """Predicted columns for first..last, EXPORT_CHUNK_DAYS days (one batched predict per model) at a time"""
+    day = first
+    while day <= last:
+        days = min(EXPORT_CHUNK_DAYS, (last - day).days + 1)
+        pairs = [(day + timedelta(days=i), model) for i in range(days) for model in models]
+        yield predict_batch_columns(pairs, include_pollutants)
+        day += timedelta(days=days)
+
+def export_history_chunks(first_row, stop_row):
+    """History columns for rows first_row..stop_row of the history store, EXPORT_CHUNK_DAYS rows at a time"""
+    for row in range(first_row, stop_row, EXPORT_CHUNK_DAYS):
+        yield history_store.export_columns(row, min(row + EXPORT_CHUNK_DAYS, stop_row))
+
+def export_body(chunks, export_format):
+    """📤 Serialize column chunks as they come: NDJSON lines, or CSV with one header row"""
+    header_written = False
+    try:
+        for columns in chunks:
+            if export_format == 'ndjson':
+                yield ndjson_lines(columns)
+                continue
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if not header_written:
+                writer.writerow(columns.keys())
+                header_written = True
+            writer.writerows(zip(*columns.values()))
+            yield buffer.getvalue()
+    except Exception as e:
+        # Headers are long gone; end the stream with an error record instead
+        logger.exception('❌ Export stream error: %s', e)
+        if export_format == 'ndjson':
+            yield json.dumps({'error': f'Export failed: {str(e)}'}) + '\n'
+        else:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerow(['# error', f'Export failed: {str(e)}'])
+            yield buffer.getvalue()
+
+@app.route('/api/export', methods=['GET'])
+def export_series():
+    """📤 Stream a long date range as NDJSON or CSV, computed EXPORT_CHUNK_DAYS days at a time
+    
+    ?source=prediction (default) or history (prepared_aqi_data.csv), &format=ndjson
+    (default) or csv, &start=YYYY-MM-DD and &end=YYYY-MM-DD or &days=N. Predictions
+    default to 365 days from today for &models=gbr (comma separated, every date x every
+    model) and include the pollutant columns unless &pollutants=0; history defaults to
+    its whole range. Memory stays flat however long the range is, and the first rows
+    go out before the later ones are computed. Up to MAX_EXPORT_DAYS days. A failure
+    mid-stream ends the body with an {"error": ...} line, or a "# error" row in CSV.
+    """
+    source = request.args.get('source', 'prediction')
+    export_format = request.args.get('format', 'ndjson')
+    if source not in ('prediction', 'history'):
+        return jsonify({'error': 'source must be prediction or history'}), 400
+    if export_format not in EXPORT_MIMETYPES:
+        return jsonify({'error': f'format must be one of {", ".join(EXPORT_MIMETYPES)}'}), 400
+    if source == 'history' and history_store is None:
+        return jsonify({'error': 'AQI history not available'}), 503
+    
+    if source == 'history':
+        default_start, default_end = history_store.meta['start_date'], history_store.meta['end_date']
+    else:
+        default_start, default_end = datetime.now().strftime('%Y-%m-%d'), None
+    try:
+        start = datetime.strptime(request.args.get('start', default_start), '%Y-%m-%d')
+        if 'end' in request.args or ('days' not in request.args and default_end):
+            end = datetime.strptime(request.args.get('end', default_end), '%Y-%m-%d')
+        else:
+            end = start + timedelta(days=int(request.args.get('days', 365)) - 1)
+    except ValueError:
+        return jsonify({'error': 'start/end must be YYYY-MM-DD and days an integer'}), 400
+    if not 1 <= (end - start).days + 1 <= MAX_EXPORT_DAYS:
+        return jsonify({'error': f'Date range must be 1-{MAX_EXPORT_DAYS} days'}), 400
+    
+    if source == 'history':
+        first_row, stop_row = history_store.day_rows(start, end)
+        if first_row == stop_row:
+            meta = history_store.meta
+            return jsonify({'error': f"No history between {start:%Y-%m-%d} and {end:%Y-%m-%d} "
+                                     f"(available {meta['start_date']} to {meta['end_date']})"}), 404
+        chunks = export_history_chunks(first_row, stop_row)
+    else:
+        models = [model for model in request.args.get('models', 'gbr').split(',') if model]
+        unknown = [model for model in models if model not in BATCH_MODEL_NAMES]
+        if not models or unknown:
+            return jsonify({'error': f'models must be a comma separated subset of {", ".join(BATCH_MODEL_NAMES)}'}), 400
+        include_pollutants = request.args.get('pollutants', '1') not in ('0', 'false')
+        chunks = export_prediction_chunks(start, end, models, include_pollutants)
+    
+    logger.info('📤 Export API called: %s %s to %s as %s', source, start.date(), end.date(), export_format)
+    filename = f'aqi-{source}-{start:%Y%m%d}-{end:%Y%m%d}.{export_format}'
+    response = app.response_class(stream_with_context(export_body(chunks, export_format)),
+                                  mimetype=EXPORT_MIMETYPES[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'  # let a buffering proxy pass chunks straight through
+    return response
+
 # FIXED: Single unified pollutants endpoint (removed duplicates)
 @app.route('/api/pollutants', methods=['GET'])
+@cached_response(response_cache, current_model_version, today_relative=is_current_month_view)
 def get_pollutants_data():
     try:
         year = int(request.args.get('year', datetime.now().year))
@@ -801,18 +1311,26 @@ def get_pollutants_data():
         filter_type = request.args.get('filter', 'daily').lower()
         pollutant = request.args.get('pollutant', 'PM2.5')
 
-        print(f"🌪️ Pollutants API called: {year}-{month:02d}, filter={filter_type}, pollutant={pollutant}")
+        logger.info('🌪️ Pollutants API called: %s-%02d, filter=%s, pollutant=%s', year, month, filter_type, pollutant)
+
+        # Predict every day of the month once; the chart and the calendar read from it
+        month_aqi = compute_month_aqi(year, month)
+        best_model_aqi = None
+        if models_trained and aqi_system:
+            # The peaks and main pollutants come from the best model, without the simulation fallback
+            best_model_aqi = aqi_system.predict_aqi_for_dates(
+                [datetime(year, month, day) for day in range(1, len(month_aqi) + 1)])
 
         # FIXED: Generate chart data with proper structure
-        chart_data = generate_working_chart_data(filter_type, pollutant, year, month)
+        chart_data = generate_working_chart_data(filter_type, pollutant, year, month, month_aqi)
         
         if not chart_data or not chart_data.get('labels') or not chart_data.get('data'):
-            print("Chart data generation failed, using emergency fallback")
+            logger.warning('Chart data generation failed, using emergency fallback')
             chart_data = get_emergency_chart_data(filter_type)
 
         # Generate highest concentration days
         if models_trained and aqi_system:
-            highest_days = aqi_system.get_highest_concentration_days(year, month)
+            highest_days = aqi_system.get_highest_concentration_days(year, month, daily_aqi=best_model_aqi)
         else:
             highest_days = get_fallback_highest_days(month, year)
 
@@ -838,24 +1356,18 @@ def get_pollutants_data():
 
         # FIXED: Generate monthly calendar with PROPER AQI values (15-150)
         calendar_data = []
-        from calendar import monthrange
-        _, num_days = monthrange(year, month)
         
-        for day in range(1, num_days + 1):
+        for day, daily_aqi in enumerate(month_aqi, start=1):
             date_str = f"{year}-{month:02d}-{day:02d}"
-            daily_aqi = get_consistent_aqi_for_date(date_str)  # FIXED: Proper AQI
             
-            # Get main pollutant for this date
+            # Get main pollutant for this date (from the best model's AQI predicted above)
             if models_trained and aqi_system:
-                date_obj = datetime(year, month, day)
-                main_pollutant = aqi_system.get_main_pollutant_for_date(date_obj)
+                main_pollutant = aqi_system.get_main_pollutant_for_date(datetime(year, month, day),
+                                                                        aqi=best_model_aqi[day - 1])
             else:
                 # FIXED fallback
-                day_seed = int(hashlib.md5(date_str.encode()).hexdigest()[:8], 16) % (2**32)
-                np.random.seed(day_seed)
                 pollutants = ['PM2.5', 'O3', 'NO2', 'PM10']
-                main_pollutant = np.random.choice(pollutants)
-                np.random.seed(None)
+                main_pollutant = str(seeded_rng(date_str).choice(pollutants))
             
             calendar_data.append({
                 'day': day,
@@ -873,25 +1385,55 @@ def get_pollutants_data():
             'selected_pollutant': pollutant
         }
 
-        print(f"✅ Pollutants returning data for {year}-{month:02d}")
-        print(f"📊 Chart data: {len(chart_data.get('labels', []))} points")
-        print(f"📅 Calendar data: {len(calendar_data)} days")
-        print(f"🏆 Highest concentration: {len(highest_concentration)} pollutants")
+        logger.debug('✅ Pollutants returning data for %s-%02d', year, month)
+        logger.debug('📊 Chart data: %s points', len(chart_data.get('labels', [])))
+        logger.debug('📅 Calendar data: %s days', len(calendar_data))
+        logger.debug('🏆 Highest concentration: %s pollutants', len(highest_concentration))
         
         return jsonify(response_data)
 
     except Exception as e:
-        print(f"❌ Pollutants API error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception('❌ Pollutants API error: %s', e)
         return jsonify({
             'error': f'Failed to get pollutants data: {str(e)}'
         }), 500
 
-def generate_working_chart_data(filter_type, pollutant, year, month):
-    """FIXED: Generate working chart data with proper AQI ranges (15-120)"""
+def compute_month_aqi(year, month):
+    """📅 AQI for every day of a month (index = day - 1), predicted in one batch
+    
+    The values get_consistent_aqi_for_date gives per day: the gradient boosting model,
+    simulated where it has no prediction.
+    """
+    _, num_days = calendar.monthrange(year, month)
+    dates = [datetime(year, month, day) for day in range(1, num_days + 1)]
+    
+    # Same model and fallback as get_consistent_aqi_for_date, but one model call for the month
+    predicted = [None] * num_days
+    if models_trained and aqi_system and aqi_system.use_trained_models and aqi_system.trained_models_loaded:
+        try:
+            predicted = aqi_system.predict_aqi_for_dates(dates, 'gradient_boosting')
+        except Exception as e:
+            logger.warning('❌ Monthly ML prediction failed for %s-%02d: %s', year, month, e)
+        SIMULATION_FALLBACKS.labels(site='month_aqi').inc(predicted.count(None))
+    
+    return [
+        round(aqi) if aqi is not None else simulate_consistent_aqi(date.strftime('%Y-%m-%d'))
+        for date, aqi in zip(dates, predicted)
+    ]
+
+def generate_working_chart_data(filter_type, pollutant, year, month, month_aqi=None):
+    """FIXED: Generate working chart data with proper AQI ranges (15-120)
+    
+    month_aqi, when given, is compute_month_aqi(year, month) and is used instead of
+    predicting each charted day again.
+    """
+    def day_aqi(day):
+        if month_aqi is not None:
+            return month_aqi[day - 1]
+        return get_consistent_aqi_for_date(f"{year}-{month:02d}-{day:02d}")
+    
     try:
-        print(f"Generating {filter_type} data for {pollutant} in {year}-{month}")
+        logger.debug('Generating %s data for %s in %s-%s', filter_type, pollutant, year, month)
 
         labels = []
         data = []
@@ -899,13 +1441,14 @@ def generate_working_chart_data(filter_type, pollutant, year, month):
         if filter_type == 'hourly':
             today = datetime.now()
             if year == today.year and month == today.month:
-                current_day = today.day
-                base_date_str = f"{year}-{month:02d}-{current_day:02d}"
+                base_day = today.day
             else:
-                base_date_str = f"{year}-{month:02d}-15"
+                base_day = 15
+            base_date_str = f"{year}-{month:02d}-{base_day:02d}"
             
             base_hours = [0, 3, 6, 9, 12, 15, 18, 21]
-            base_aqi = get_consistent_aqi_for_date(base_date_str)
+            base_aqi = day_aqi(base_day)
+            rng = seeded_rng(f"{base_date_str}-hourly")
 
             for hour in base_hours:
                 time_label = f"{hour:02d}:00"
@@ -922,7 +1465,7 @@ def generate_working_chart_data(filter_type, pollutant, year, month):
                 elif hour == 18:      # Evening rush
                     hour_multiplier = 1.10
                 
-                hourly_aqi = base_aqi * hour_multiplier * np.random.uniform(0.9, 1.1)
+                hourly_aqi = base_aqi * hour_multiplier * rng.uniform(0.9, 1.1)
                 hourly_aqi = max(20, min(110, hourly_aqi))  # FIXED: Proper bounds
                 data.append(round(hourly_aqi))
                 
@@ -932,13 +1475,10 @@ def generate_working_chart_data(filter_type, pollutant, year, month):
             for i, week_label in enumerate(week_labels):
                 labels.append(week_label)
                 week_day = min(7 + i * 7, 28)
-                week_date_str = f"{year}-{month:02d}-{week_day:02d}"
-                weekly_aqi = get_consistent_aqi_for_date(week_date_str)
-                data.append(weekly_aqi)
+                data.append(day_aqi(week_day))
                 
         else:  # daily
-            from calendar import monthrange
-            _, num_days = monthrange(year, month)
+            _, num_days = calendar.monthrange(year, month)
             
             today = datetime.now()
             if year == today.year and month == today.month:
@@ -958,10 +1498,7 @@ def generate_working_chart_data(filter_type, pollutant, year, month):
                 date_obj = datetime(year, month, day)
                 day_label = date_obj.strftime('%b %d')
                 labels.append(day_label)
-                
-                date_str = f"{year}-{month:02d}-{day:02d}"
-                daily_aqi = get_consistent_aqi_for_date(date_str)
-                data.append(daily_aqi)
+                data.append(day_aqi(day))
         
         if not labels or not data or len(labels) != len(data):
             return get_emergency_chart_data(filter_type)
@@ -971,16 +1508,16 @@ def generate_working_chart_data(filter_type, pollutant, year, month):
             'data': data
         }
         
-        print(f"✅ Chart data: {len(labels)} points, AQI range {min(data)}-{max(data)}")
+        logger.debug('✅ Chart data: %s points, AQI range %s-%s', len(labels), min(data), max(data))
         return result
         
     except Exception as e:
-        print(f"Chart data generation error: {e}")
+        logger.warning('Chart data generation error: %s', e)
         return get_emergency_chart_data(filter_type)
 
 def get_emergency_chart_data(filter_type):
     """FIXED: Emergency fallback chart data with proper AQI ranges"""
-    print(f"Using emergency chart data for {filter_type}")
+    logger.debug('Using emergency chart data for %s', filter_type)
     
     if filter_type == 'hourly':
         result = {
@@ -998,7 +1535,7 @@ def get_emergency_chart_data(filter_type):
             'data': [42, 48, 35, 58, 46, 53, 40]  # FIXED: 35-60 range
         }
     
-    print(f"Emergency chart data: {result}")
+    logger.debug('Emergency chart data: %s', result)
     return result
 
 def get_fallback_highest_days(month, year):
@@ -1017,16 +1554,15 @@ def get_fallback_highest_days(month, year):
     
     for i, (pollutant, unit, base, std) in enumerate(pollutants_info):
         pollutant_seed = month_seed + i * 1000
-        np.random.seed(pollutant_seed)
-        random.seed(pollutant_seed)
+        rng = np.random.default_rng(pollutant_seed)
         
-        day = random.randint(1, 28)
+        day = int(rng.integers(1, 29))
         
         # FIXED: Proper concentration ranges
         if unit == 'ppm':
-            concentration = max(0.3, min(2.5, base + np.random.normal(0, std)))
+            concentration = max(0.3, min(2.5, base + rng.normal(0, std)))
         else:
-            concentration = max(base * 0.5, min(base * 1.8, base + np.random.normal(0, std)))
+            concentration = max(base * 0.5, min(base * 1.8, base + rng.normal(0, std)))
         
         pollutants_data[pollutant] = {
             'day': day,
@@ -1034,19 +1570,17 @@ def get_fallback_highest_days(month, year):
             'unit': unit
         }
     
-    np.random.seed(None) 
-    random.seed(None)
-    
     return pollutants_data
 
-@app.route('/api/recommendations', methods=['GET'])
-def get_recommendations():
-    """Get health recommendations based on AQI"""
-    try:
-        date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
-        model_name = request.args.get('model', 'gbr')  # Use same model as dashboard
-        
-        # FIXED: Use same AQI calculation as dashboard for consistency
+@app.route('/api/recommendations', methods=['GET'])
+@cached_response(response_cache, current_model_version, today_relative=date_defaults_to_today)
+def get_recommendations():
+    """Get health recommendations based on AQI"""
+    try:
+        date_str = request.args.get('date', datetime.now().strftime('%Y-%m-%d'))
+        model_name = request.args.get('model', 'gbr')  # Use same model as dashboard
+        
+        # FIXED: Use same AQI calculation as dashboard for consistency
         aqi = get_model_specific_aqi(date_str, model_name)
         
         if aqi <= 50:
@@ -1115,6 +1649,92 @@ def get_aqi_category(aqi):
     else:
         return 'Hazardous'
 
+@app.route('/api/aqi_history_meta', methods=['GET'])
+def get_aqi_history_meta():
+    """📚 Date range, years and per-pollutant min/max of prepared_aqi_data.csv (precomputed)"""
+    if history_store is None:
+        return jsonify({'error': 'AQI history not available'}), 503
+    return jsonify(history_store.meta)
+
+@app.route('/api/aqi_history_daily', methods=['GET'])
+def get_aqi_history_daily():
+    """📈 Historical daily max AQI for one month; days without a reading are null"""
+    if history_store is None:
+        return jsonify({'error': 'AQI history not available'}), 503
+    
+    meta = history_store.meta
+    try:
+        year = int(request.args.get('year', meta['latest_year']))
+        month = int(request.args.get('month', meta['latest_month']))
+    except ValueError:
+        return jsonify({'error': 'year and month must be integers'}), 400
+    if not 1 <= month <= 12:
+        return jsonify({'error': 'month must be between 1 and 12'}), 400
+    
+    month_slice = history_store.month_slice(year, month)
+    if month_slice is None:
+        return jsonify({'error': f"No history for {year}-{month:02d} "
+                                 f"(available {meta['start_date']} to {meta['end_date']})"}), 404
+    
+    first_day, rows = month_slice
+    start, stop = history_store.month_rows(year, month)
+    first = first_day.item().day
+    month_name = calendar.month_abbr[month]
+    aqi = rows[:, history_store.columns.index(AQI_COLUMN)].tolist()
+    epa_aqi = history_store.epa['aqi'][start:stop].tolist()
+    
+    return jsonify({
+        'labels': [f"{month_name} {day:02d}" for day in range(first, first + len(aqi))],
+        'data': [None if math.isnan(value) else int(value) for value in aqi],
+        # AQI recomputed from the day's concentrations with the EPA breakpoints
+        'epa_aqi': [None if math.isnan(value) else int(value) for value in epa_aqi],
+        'dominant_pollutant': history_store.epa['dominant'][start:stop].tolist(),
+        'month_year': f"{calendar.month_name[month]} {year}"
+    })
+
+def warm_month_aqi(year, month):
+    """🔥 Pollutants page calendar for a month (lands in the prediction cache)"""
+    with prediction_caller('WARMUP'):
+        compute_month_aqi(year, month)
+
+def warm_yearly_table(year, model):
+    """🔥 Dashboard daily series for a year and model"""
+    with prediction_caller('WARMUP'):
+        aqi_system.get_yearly_aqi_table(year, model)
+
+def build_warmup_steps():
+    """This year's daily series for every loaded model, then this and next month's calendars"""
+    if not (models_trained and aqi_system):
+        return []  # simulation is cheap and not cached; nothing to warm
+    
+    today = datetime.now()
+    next_year, next_month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+    
+    steps = [(f'yearly_aqi:{today.year}:{model}', partial(warm_yearly_table, today.year, model))
+             for model in aqi_system.loaded_model_names()]  # lazily loaded models stay unloaded
+    steps += [(f'month_aqi:{year}-{month:02d}', partial(warm_month_aqi, year, month))
+              for year, month in ((today.year, today.month), (next_year, next_month))]
+    return steps
+
+# Background warmup after startup (AQI_WARMUP=0 disables it)
+if os.environ.get('AQI_WARMUP', '1') != '0':
+    warmup_job = WarmupJob(build_warmup_steps)
+    warmup_job.start()
+else:
+    warmup_job = None
+
+def on_model_swap(previous, model_set):
+    """🔁 New models are live: drop responses built from the old ones and warm up again"""
+    global models_trained
+    models_trained = model_set.has_trained_models
+    # Prediction caches are cleared by the swap; responses are keyed by the version too
+    response_cache.clear()
+    if warmup_job is not None:
+        warmup_job.start()
+
+# Hot model reload (see aqi_model_reload): AQI_MODEL_WATCH_SECONDS and POST /api/admin/reload
+model_reloader = ModelReloader(aqi_system, MODEL_FILE, on_swap=on_model_swap) if aqi_system else None
+
 if __name__ == '__main__':
     print("Starting AirSight API Server - COMPLETELY FIXED!")
     print("Model Status:", "FIXED_HIGH_PERFORMANCE")
@@ -1128,10 +1748,17 @@ if __name__ == '__main__':
     
     print("\nAvailable endpoints:")
     print("  GET  /api/health - Health check")
+    print("  GET  /api/metrics - Prometheus metrics (latency, predictions, caches)")
     print("  GET  /api/dashboard - Dashboard data (FIXED AQI ranges)")
     print("  GET  /api/prediction - Prediction page data (FIXED performance)")
     print("  GET  /api/pollutants - Pollutants page data (FIXED calendar)")
     print("  GET  /api/recommendations - Health recommendations")
+    print("  GET  /api/compare - All models over a date range + ensemble")
+    print("  POST /api/predict/batch - Many (date, model) predictions in one request")
+    print("  GET  /api/export - Streaming NDJSON/CSV export of predictions or history")
+    print("  POST /api/admin/reload - Reload aqi_4_models.pkl without a restart (AQI_ADMIN_TOKEN)")
+    print("  GET  /api/aqi_history_meta - Historical data range")
+    print("  GET  /api/aqi_history_daily - Historical daily AQI for a month")
     
     print(f"\n🚀 FIXED Server running at: http://127.0.0.1:5000")
     print("✅ AQI values now properly range from 15-150 (not 500!)")
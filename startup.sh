@@ -1,5 +1,12 @@
 #!/bin/bash
-echo "Starting AQI Prediction System initialization..."
-python aqi_prediction_system.py
+echo "Converting prepared_aqi_data.csv to its binary cache..."
+python aqi_history_store.py || echo "History cache conversion failed; workers will parse the CSV"
+echo "Splitting aqi_4_models.pkl into per-model files..."
+python aqi_model_store.py || echo "Model split failed; workers will unpickle every model from aqi_4_models.pkl"
+# Workers share /api/metrics through per-process snapshot files; start from zero
+export AQI_METRICS_DIR="${AQI_METRICS_DIR:-/tmp/aqi-metrics}"
+mkdir -p "$AQI_METRICS_DIR" && rm -f "$AQI_METRICS_DIR"/aqi-metrics-*.json
 echo "Starting Flask backend server..."
-gunicorn --bind=0.0.0.0 --timeout 600 flask_api_backend:app
+# --preload imports the app (and loads the best model) once in the master;
+# forked workers share it copy-on-write and load the other models on first use.
+gunicorn --bind=0.0.0.0 --timeout 600 --preload --workers "${GUNICORN_WORKERS:-1}" --threads "${GUNICORN_THREADS:-4}" flask_api_backend:app